@@ -0,0 +1,103 @@
+"""
+Pure Python vs NumPy LCS rows, in the table engine and in the default engine.
+
+Builds one synthetic staff per size with an edited copy, times building the
+table both ways (`compute_diff.lcs` / `lcs_kernel.lcs_table`, best of --repeat)
+plus the backtrack on each, then the default Myers engine with the kernel off
+and on. Myers only regenerates table rows when its trace outgrows the budget
+(very different staves, e.g. a high --edit-rate); "myers_rows" tells whether
+it did. Every run must give the same diff.
+
+Usage: python benchmarks/lcs_kernel.py [--measures 250 500 1000 2000] [--edit-rate 0.05] [--repeat 3]
+"""
+import argparse
+import json
+import random
+import time
+
+from musescore_score_diff import diff_engine, lcs_kernel
+from musescore_score_diff.compute_diff import backtrack, lcs
+
+
+def _edited(hashes: list[str], edit_rate: float, rng: random.Random) -> list[str]:
+    out = []
+    for h in hashes:
+        r = rng.random()
+        if r < edit_rate / 3:
+            continue  # removed
+        out.append(f"new-{rng.random()}" if r < 2 * edit_rate / 3 else h)
+        if rng.random() < edit_rate / 3:
+            out.append(f"ins-{rng.random()}")  # inserted
+    return out
+
+
+def _best(fn, repeat: int) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return round(best, 4), result
+
+
+def _uses_rows(engine, m1, m2) -> bool:
+    """Whether the Myers engine falls back to table rows on this pair."""
+    oracle = diff_engine._RowsOracle
+    used = False
+
+    def spy(*args, **kwargs):
+        nonlocal used
+        used = True
+        return oracle(*args, **kwargs)
+
+    diff_engine._RowsOracle = spy
+    try:
+        engine.align(m1, m2)
+    finally:
+        diff_engine._RowsOracle = oracle
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--measures", type=int, nargs="+", default=[250, 500, 1000, 2000])
+    parser.add_argument("--edit-rate", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    if lcs_kernel.np is None:
+        raise SystemExit("NumPy is not installed")
+
+    rng = random.Random(0)
+    for measures in args.measures:
+        old = [str(rng.randrange(50)) for _ in range(measures)]
+        new = _edited(old, args.edit_rate, rng)
+        m1 = [(i + 1, h, None) for i, h in enumerate(old)]
+        m2 = [(i + 1, h, None) for i, h in enumerate(new)]
+
+        lcs_kernel.ENABLED = False
+        python_seconds, python_table = _best(lambda: lcs(old, new), args.repeat)
+        python_backtrack, expected = _best(lambda: backtrack(python_table, m1, m2), args.repeat)
+        numpy_seconds, numpy_table = _best(lambda: lcs_kernel.lcs_table(old, new), args.repeat)
+        numpy_backtrack, result = _best(lambda: backtrack(numpy_table, m1, m2), args.repeat)
+
+        engine = diff_engine.get_engine()
+        myers_python, python_diff = _best(lambda: engine.diff(m1, m2), args.repeat)
+        lcs_kernel.ENABLED = True
+        myers_numpy, numpy_diff = _best(lambda: engine.diff(m1, m2), args.repeat)
+        print(json.dumps({
+            "measures": measures,
+            "python_table": python_seconds,
+            "numpy_table": numpy_seconds,
+            "python_backtrack": python_backtrack,
+            "numpy_backtrack": numpy_backtrack,
+            "speedup": round((python_seconds + python_backtrack) / (numpy_seconds + numpy_backtrack), 1),
+            "myers_python": myers_python,
+            "myers_numpy": myers_numpy,
+            "myers_speedup": round(myers_python / myers_numpy, 1),
+            "myers_rows": _uses_rows(engine, m1, m2),
+            "identical": result == expected and python_diff == numpy_diff == expected,
+        }))
+
+
+if __name__ == "__main__":
+    main()
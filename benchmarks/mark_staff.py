@@ -0,0 +1,72 @@
+"""
+Scaling of `mark_diffs_in_staff_pair` on synthetic staves.
+
+Marks a staff pair of N measures (2,000 by default, plus smaller sizes to show
+the scaling) with a few percent of modified/inserted/removed measures and
+reports the time per measure, which should stay flat as N grows.
+
+Usage: python benchmarks/mark_staff.py [--sizes 250 500 1000 2000] [--edit-rate 0.05]
+"""
+import argparse
+import json
+import random
+import time
+import xml.etree.ElementTree as ET
+
+from musescore_score_diff.display_diff import mark_diffs_in_staff_pair
+from musescore_score_diff.utils import State
+
+
+def _staff(num_measures: int) -> ET.Element:
+    staff = ET.Element("Staff", id="1")
+    for i in range(num_measures):
+        measure = ET.SubElement(staff, "Measure")
+        voice = ET.SubElement(measure, "voice")
+        chord = ET.SubElement(voice, "Chord")
+        ET.SubElement(chord, "durationType").text = "whole"
+        note = ET.SubElement(chord, "Note")
+        ET.SubElement(note, "pitch").text = str(60 + i % 12)
+    return staff
+
+
+def _alignment(num_measures: int, edit_rate: float, rng: random.Random) -> tuple[list, int, int]:
+    """An alignment of num_measures steps and the staff lengths it needs."""
+    steps = []
+    len1 = len2 = 0
+    for _ in range(num_measures):
+        r = rng.random()
+        if r < edit_rate / 3:
+            len2 += 1
+            steps.append((State.INSERTED, None, len2))
+        elif r < 2 * edit_rate / 3:
+            len1 += 1
+            steps.append((State.REMOVED, len1, None))
+        else:
+            len1 += 1
+            len2 += 1
+            steps.append((State.MODIFIED if r < edit_rate else State.UNCHANGED, len1, len2))
+    return steps, len1, len2
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 500, 1000, 2000])
+    parser.add_argument("--edit-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for size in args.sizes:
+        alignment, len1, len2 = _alignment(size, args.edit_rate, rng)
+        staff1, staff2 = _staff(len1), _staff(len2)
+        start = time.perf_counter()
+        mark_diffs_in_staff_pair(staff1, staff2, alignment)
+        elapsed = time.perf_counter() - start
+        print(json.dumps({
+            "measures": size,
+            "seconds": round(elapsed, 5),
+            "us_per_measure": round(elapsed / size * 1e6, 2),
+        }))
+
+
+if __name__ == "__main__":
+    main()
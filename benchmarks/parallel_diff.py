@@ -0,0 +1,71 @@
+"""
+Scaling of `compute_diff(..., workers=N)` on synthetic staves.
+
+Builds ScoreHashes with random measure hashes (so no parsing is timed) and
+diffs them serially and with 2/4/8 workers, checking the results match.
+
+Usage: python benchmarks/parallel_diff.py [--staves 40] [--measures 2000] [--edit-rate 0.05] [--engine myers]
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from musescore_score_diff.compute_diff import compute_diff
+from musescore_score_diff.score import ScoreHashes
+
+
+def _edited(hashes: list[str], edit_rate: float, rng: random.Random) -> list[str]:
+    out = []
+    for h in hashes:
+        r = rng.random()
+        if r < edit_rate / 3:
+            continue  # removed
+        if r < 2 * edit_rate / 3:
+            out.append(f"new-{rng.random()}")  # modified
+        else:
+            out.append(h)
+        if rng.random() < edit_rate / 3:
+            out.append(f"ins-{rng.random()}")  # inserted
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--staves", type=int, default=40)
+    parser.add_argument("--measures", type=int, default=2000)
+    parser.add_argument("--edit-rate", type=float, default=0.05)
+    parser.add_argument("--engine", default="myers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    old, new = [], []
+    for _ in range(args.staves):
+        # a small alphabet, like the many identical rest measures of real parts
+        staff = [str(rng.randrange(50)) for _ in range(args.measures)]
+        old.append(staff)
+        new.append(_edited(staff, args.edit_rate, rng))
+    old, new = ScoreHashes(old), ScoreHashes(new)
+
+    expected = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        res = compute_diff(old, new, engine=args.engine, workers=workers)
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            expected = res
+        print(json.dumps({
+            "workers": workers,
+            "cpus": os.cpu_count(),
+            "staves": args.staves,
+            "measures": args.measures,
+            "engine": args.engine,
+            "seconds": round(elapsed, 4),
+            "identical": res == expected,
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Per-stage timings and peak memory of the whole pipeline on synthetic scores.
+
+For every combination of the given parameters a score pair is generated (see
+`synthetic.py`) and each stage is run and timed on its own:
+
+    parse      get_staves on both files (.mscz members are read in memory)
+    hash       extract_measures on every staff
+    lcs        lcs + backtrack on every staff pair (the reference engine)
+    myers      the default diff engine on every staff pair
+    merge      new_merge_musescore_files on already loaded scores
+    mark       mark_diffs on the merged score, walking the myers (else lcs) alignments
+    write      writing the diff score (.mscx, or the .mscz archive)
+
+By default only "modify" edits are generated. --structural also inserts and
+removes measures, which the marking lays out side by side from the alignments
+(so every stage runs on them too).
+
+Each stage is run once untraced for its time, then once more under tracemalloc
+for its peak memory (pass --no-memory to skip that second run). One JSON line
+is printed per case, or a JSON list is written to --output.
+
+Usage:
+    python benchmarks/pipeline.py --staves 4 16 --measures 100 1000 \
+        [--notes 4] [--edit-rate 0.05] [--mscz] [--structural] [--skip lcs] [--output results.json]
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import EDIT_KINDS, write_pair  # noqa: E402
+
+from musescore_score_diff.compute_diff import backtrack_alignment, lcs  # noqa: E402
+from musescore_score_diff.diff_engine import get_engine  # noqa: E402
+from musescore_score_diff.display_diff import mark_diffs, new_merge_musescore_files, write_mscz  # noqa: E402
+from musescore_score_diff.mscz import mscx_members  # noqa: E402
+from musescore_score_diff.score import LoadedScore  # noqa: E402
+from musescore_score_diff.utils import extract_measures, get_staves  # noqa: E402
+
+STAGES = ("parse", "hash", "lcs", "myers", "merge", "mark", "write")
+
+
+def _read_mscx(path: str) -> bytes:
+    with zipfile.ZipFile(path, "r") as archive:
+        return archive.read(mscx_members(archive)[0])
+
+
+def _stage_functions(path1: str, path2: str, work_dir: str) -> dict:
+    """One function per stage; they share `state` and must run in STAGES order."""
+    mscz = path1.endswith(".mscz")
+    state = {}
+
+    def source(path):
+        return io.BytesIO(_read_mscx(path)) if mscz else path
+
+    def parse():
+        state["staves"] = (get_staves(source(path1)), get_staves(source(path2)))
+
+    def hash_():
+        staves1, staves2 = state["staves"]
+        state["measures"] = [
+            (extract_measures(s1), extract_measures(s2)) for s1, s2 in zip(staves1, staves2)
+        ]
+
+    def lcs_():
+        diffs = {}
+        for i, (measures1, measures2) in enumerate(state["measures"], start=1):
+            L = lcs([h for (_, h, _) in measures1], [h for (_, h, _) in measures2])
+            diffs[i] = backtrack_alignment(L, measures1, measures2)
+        state["diffs"] = diffs
+
+    def myers():
+        engine = get_engine("myers")
+        state["diffs"] = {
+            i: engine.align(measures1, measures2)
+            for i, (measures1, measures2) in enumerate(state["measures"], start=1)
+        }
+
+    def merge():
+        # loaded outside of the stage, the merge is what is measured
+        score1, score2 = state.pop("loaded")
+        state["tree"], _, state["marked"] = new_merge_musescore_files(score1, score2)
+
+    def mark():
+        mark_diffs(state["marked"], state["diffs"])
+
+    def write():
+        output_path = os.path.join(work_dir, "diff" + os.path.splitext(path1)[1])
+        if mscz:
+            with zipfile.ZipFile(path1, "r") as archive:
+                write_mscz(archive, {mscx_members(archive)[0].filename: state["tree"]}, output_path)
+        else:
+            state["tree"].write(output_path, encoding="UTF-8", xml_declaration=True)
+
+    def load():
+        if mscz:
+            state["loaded"] = (LoadedScore.from_bytes(_read_mscx(path1)), LoadedScore.from_bytes(_read_mscx(path2)))
+        else:
+            state["loaded"] = (LoadedScore.from_file(path1), LoadedScore.from_file(path2))
+
+    return {
+        "parse": parse, "hash": hash_, "lcs": lcs_, "myers": myers,
+        "merge": merge, "mark": mark, "write": write, "_load": load,
+    }
+
+
+def _run_stages(path1: str, path2: str, work_dir: str, skip: set[str], traced: bool) -> dict[str, float]:
+    """Seconds (or peak traced bytes when `traced`) of each stage."""
+    functions = _stage_functions(path1, path2, work_dir)
+    results = {}
+    for stage in STAGES:
+        if stage in skip:
+            continue
+        if stage == "merge":
+            functions["_load"]()
+        if traced:
+            tracemalloc.start()
+            functions[stage]()
+            results[stage] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            start = time.perf_counter()
+            functions[stage]()
+            results[stage] = time.perf_counter() - start
+    return results
+
+
+def run_case(staves: int, measures: int, notes_per_measure: int, edit_rate: float,
+             mscz: bool = False, structural: bool = False, skip: set[str] = frozenset(),
+             memory: bool = True, seed: int = 0) -> dict:
+    """Generate one score pair and benchmark every stage on it."""
+    kinds = EDIT_KINDS if structural else ("modify",)
+    with tempfile.TemporaryDirectory() as work_dir:
+        start = time.perf_counter()
+        path1, path2 = write_pair(work_dir, staves, measures, notes_per_measure, edit_rate, seed, mscz, kinds)
+        generate_seconds = time.perf_counter() - start
+        sizes = (os.path.getsize(path1), os.path.getsize(path2))
+
+        seconds = _run_stages(path1, path2, work_dir, skip, traced=False)
+        peaks = _run_stages(path1, path2, work_dir, skip, traced=True) if memory else {}
+
+    stages = {}
+    for stage, elapsed in seconds.items():
+        stages[stage] = {"seconds": round(elapsed, 5)}
+        if stage in peaks:
+            stages[stage]["peak_kib"] = round(peaks[stage] / 1024, 1)
+    return {
+        "params": {
+            "staves": staves,
+            "measures": measures,
+            "notes_per_measure": notes_per_measure,
+            "edit_rate": edit_rate,
+            "format": "mscz" if mscz else "mscx",
+            "edits": list(kinds),
+            "seed": seed,
+        },
+        "file_bytes": sizes,
+        "generate_seconds": round(generate_seconds, 5),
+        "stages": stages,
+        "total_seconds": round(sum(seconds.values()), 5),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic scores")
+    parser.add_argument("--staves", type=int, nargs="+", default=[4])
+    parser.add_argument("--measures", type=int, nargs="+", default=[200])
+    parser.add_argument("--notes", type=int, nargs="+", default=[4], help="notes per measure")
+    parser.add_argument("--edit-rate", type=float, nargs="+", default=[0.05])
+    parser.add_argument("--mscz", action="store_true", help="generate .mscz archives instead of .mscx files")
+    parser.add_argument("--structural", action="store_true",
+                        help="also insert/remove measures")
+    parser.add_argument("--skip", nargs="*", default=[], choices=("lcs", "myers"),
+                        help="diff engine not to run (e.g. lcs on big scores)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write all results as a JSON list to this file")
+    args = parser.parse_args(argv)
+    if set(args.skip) == {"lcs", "myers"}:
+        parser.error("the mark stage needs the diffs of at least one engine")
+
+    results = []
+    for staves, measures, notes, edit_rate in itertools.product(args.staves, args.measures, args.notes, args.edit_rate):
+        result = run_case(staves, measures, notes, edit_rate, mscz=args.mscz, structural=args.structural,
+                          skip=set(args.skip), memory=not args.no_memory, seed=args.seed)
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Parse count and peak memory of one .mscx comparison.
+
+Compares the old flow (compute_diff and the merge each parse both files) with
+the shared `LoadedScore` flow used by `compare_musescore_files`. Each mode runs
+in a fresh subprocess so peak RSS is not polluted by the other mode.
+
+Usage: python benchmarks/single_parse.py [old.mscx new.mscx]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+DEFAULT_FILES = (
+    "tests/fixtures/Test-Score/Test-Score.mscx",
+    "tests/fixtures/Test-Score-2/Test-Score-2.mscx",
+)
+MODES = ("separate", "shared")
+
+
+def _run(mode: str, file1: str, file2: str) -> dict:
+    from musescore_score_diff import score, utils, xmlbackend
+    from musescore_score_diff.compute_diff import compute_staff_alignment
+    from musescore_score_diff.display_diff import compare_musescore_files, mark_diffs, new_merge_musescore_files
+
+    parses = 0
+    real_parse = xmlbackend.parse
+
+    def counting_parse(*args, **kwargs):
+        nonlocal parses
+        parses += 1
+        return real_parse(*args, **kwargs)
+
+    # the package parses through xmlbackend.parse, which its modules import by name
+    for module in (xmlbackend, score, utils):
+        module.parse = counting_parse
+    tracemalloc.start()
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as work_dir:
+        output_path = os.path.join(work_dir, "diff.mscx")
+        if mode == "separate":
+            _, alignments = compute_staff_alignment(file1, file2)
+            tree, _, staves = new_merge_musescore_files(file1, file2)
+            mark_diffs(staves, alignments)
+            tree.write(output_path, encoding="UTF-8", xml_declaration=True)
+        else:
+            compare_musescore_files(file1, file2, output_path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "parses": parses,
+        "seconds": round(elapsed, 4),
+        "peak_traced_kib": peak // 1024,
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] in MODES:
+        print(json.dumps(_run(*sys.argv[1:])))
+        return
+
+    file1, file2 = sys.argv[1:3] if len(sys.argv) == 3 else DEFAULT_FILES
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, __file__, mode, file1, file2],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        print(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Synthetic MuseScore score generator for benchmarks.
+
+`make_score` builds an .mscx tree with the structure the diff pipeline relies on
+(Parts with a trackName and a Staff, then the Staff elements with Measures),
+`edit_score` returns an edited copy (modified, inserted and removed measures)
+and `write_pair` writes both versions as .mscx or .mscz files.
+"""
+import copy
+import io
+import os
+import random
+import xml.etree.ElementTree as ET
+import zipfile
+
+_DURATIONS = {1: "whole", 2: "half", 4: "quarter", 8: "eighth", 16: "16th", 32: "32nd"}
+
+EDIT_KINDS = ("modify", "insert", "remove")
+
+_CONTAINER = """<?xml version="1.0" encoding="UTF-8"?>
+<container>
+  <rootfiles>
+    <rootfile full-path="{name}"/>
+  </rootfiles>
+</container>
+"""
+
+
+def _eid(rng: random.Random) -> str:
+    return "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789") for _ in range(23))
+
+
+def make_measure(notes_per_measure: int, rng: random.Random) -> ET.Element:
+    measure = ET.Element("Measure")
+    voice = ET.SubElement(measure, "voice")
+    duration = _DURATIONS.get(notes_per_measure, "quarter")
+    for _ in range(notes_per_measure):
+        chord = ET.SubElement(voice, "Chord")
+        ET.SubElement(chord, "eid").text = _eid(rng)
+        ET.SubElement(chord, "durationType").text = duration
+        note = ET.SubElement(chord, "Note")
+        ET.SubElement(note, "eid").text = _eid(rng)
+        pitch = rng.randrange(48, 84)
+        ET.SubElement(note, "pitch").text = str(pitch)
+        ET.SubElement(note, "tpc").text = str(14 + (pitch * 7) % 12)
+    return measure
+
+
+def make_score(staves: int = 4, measures: int = 100, notes_per_measure: int = 4, seed: int = 0) -> ET.ElementTree:
+    """A score with `staves` single-staff parts of `measures` measures each."""
+    rng = random.Random(seed)
+    root = ET.Element("museScore", version="4.50")
+    ET.SubElement(root, "programVersion").text = "4.5.2"
+    score = ET.SubElement(root, "Score")
+    ET.SubElement(score, "Division").text = "480"
+    ET.SubElement(score, "metaTag", name="workTitle").text = "Synthetic Score"
+
+    for i in range(1, staves + 1):
+        part = ET.SubElement(score, "Part", id=str(i))
+        part_staff = ET.SubElement(part, "Staff", id=str(i))
+        ET.SubElement(ET.SubElement(part_staff, "StaffType", group="pitched"), "name").text = "stdNormal"
+        ET.SubElement(part, "trackName").text = f"Instrument {i}"
+        instrument = ET.SubElement(part, "Instrument", id=f"instrument-{i}")
+        ET.SubElement(instrument, "trackName").text = f"Instrument {i}"
+
+    for i in range(1, staves + 1):
+        staff = ET.SubElement(score, "Staff", id=str(i))
+        for _ in range(measures):
+            staff.append(make_measure(notes_per_measure, rng))
+
+    return ET.ElementTree(root)
+
+
+def edit_score(tree: ET.ElementTree, edit_rate: float = 0.05, seed: int = 1,
+               kinds: tuple[str, ...] = EDIT_KINDS) -> ET.ElementTree:
+    """
+    An edited copy of `tree`: each measure position is, with probability
+    `edit_rate`, edited with one of `kinds`: "modify" (a pitch change in one
+    staff), "insert" or "remove" (a measure in every staff, so the staves keep
+    the same length).
+    """
+    rng = random.Random(seed)
+    edited = copy.deepcopy(tree)
+    staves = edited.getroot().find("Score").findall("Staff")
+    columns = [staff.findall("Measure") for staff in staves]
+    notes_per_measure = max(1, len(columns[0][0].find("voice"))) if columns and columns[0] else 4
+
+    new_columns: list[list[ET.Element]] = [[] for _ in staves]
+    for position in range(len(columns[0]) if columns else 0):
+        kind = rng.choice(kinds) if rng.random() < edit_rate else None
+        if kind == "remove":
+            continue
+        for column, new_column in zip(columns, new_columns):
+            new_column.append(column[position])
+        if kind == "modify":
+            staff = rng.randrange(len(staves))
+            measure = new_columns[staff][-1] = copy.deepcopy(new_columns[staff][-1])
+            pitch = measure.find("voice/Chord/Note/pitch")
+            pitch.text = str(int(pitch.text) + 1)
+        elif kind == "insert":
+            for new_column in new_columns:
+                new_column.append(make_measure(notes_per_measure, rng))
+
+    for staff, new_column in zip(staves, new_columns):
+        staff[:] = [child for child in staff if child.tag != "Measure"] + new_column
+    return edited
+
+
+def _mscx_bytes(tree: ET.ElementTree) -> bytes:
+    out = io.BytesIO()
+    tree.write(out, encoding="UTF-8", xml_declaration=True)
+    return out.getvalue()
+
+
+def write_score(tree: ET.ElementTree, path: str) -> str:
+    """Write `tree` as .mscx, or as a minimal .mscz if `path` ends with .mscz."""
+    if not path.endswith(".mscz"):
+        tree.write(path, encoding="UTF-8", xml_declaration=True)
+        return path
+
+    name = os.path.splitext(os.path.basename(path))[0] + ".mscx"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(name, _mscx_bytes(tree))
+        archive.writestr("META-INF/container.xml", _CONTAINER.format(name=name))
+    return path
+
+
+def write_pair(directory: str, staves: int = 4, measures: int = 100, notes_per_measure: int = 4,
+               edit_rate: float = 0.05, seed: int = 0, mscz: bool = False,
+               kinds: tuple[str, ...] = EDIT_KINDS) -> tuple[str, str]:
+    """Write an original and an edited score to `directory`, returning both paths."""
+    ext = ".mscz" if mscz else ".mscx"
+    old = make_score(staves, measures, notes_per_measure, seed)
+    new = edit_score(old, edit_rate, seed + 1, kinds)
+    return (
+        write_score(old, os.path.join(directory, f"synthetic-old{ext}")),
+        write_score(new, os.path.join(directory, f"synthetic-new{ext}")),
+    )
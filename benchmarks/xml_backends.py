@@ -0,0 +1,77 @@
+"""
+stdlib vs lxml XML backend on the fixture scores (or any .mscx pair).
+
+Each backend runs in a fresh subprocess (the backend is picked at import time
+from MUSESCORE_DIFF_XML) and reports the best of --repeat runs for parsing,
+hashing, streamed hashing, the full diff score build and writing it.
+
+Usage: python benchmarks/xml_backends.py [old.mscx new.mscx] [--repeat 5]
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+DEFAULT_FILES = (
+    "tests/fixtures/Test-Score/Test-Score.mscx",
+    "tests/fixtures/Test-Score-2/Test-Score-2.mscx",
+)
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return round(best, 5)
+
+
+def _run(file1: str, file2: str, repeat: int) -> dict:
+    from musescore_score_diff.display_diff import build_diff_score
+    from musescore_score_diff.score import LoadedScore
+    from musescore_score_diff.utils import stream_measure_hashes
+    from musescore_score_diff.xmlbackend import BACKEND
+
+    loaded = [LoadedScore.from_file(file1), LoadedScore.from_file(file2)]
+    tree, _ = build_diff_score(file1, file2)
+    return {
+        "backend": BACKEND,
+        "parse": _best(lambda: (LoadedScore.from_file(file1), LoadedScore.from_file(file2)), repeat),
+        # a fresh LoadedScore each time, its measures are hashed on first use
+        "hash": _best(lambda: [LoadedScore(score.tree).hashes for score in loaded], repeat),
+        "stream_hash": _best(lambda: (stream_measure_hashes(file1), stream_measure_hashes(file2)), repeat),
+        "build_diff_score": _best(lambda: build_diff_score(file1, file2), repeat),
+        "write": _best(lambda: tree.write(io.BytesIO(), encoding="UTF-8", xml_declaration=True), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", default=list(DEFAULT_FILES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    file1, file2 = args.files
+
+    if args.child:
+        print(json.dumps(_run(file1, file2, args.repeat)))
+        return
+
+    for backend in ("stdlib", "lxml"):
+        env = dict(os.environ, MUSESCORE_DIFF_XML=backend)
+        result = subprocess.run(
+            [sys.executable, __file__, file1, file2, "--repeat", str(args.repeat), "--child"],
+            env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            print(json.dumps({"backend": backend, "error": result.stderr.strip().splitlines()[-1]}))
+            continue
+        print(result.stdout.strip())
+
+
+if __name__ == "__main__":
+    main()
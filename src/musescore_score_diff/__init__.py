@@ -1,2 +1,5 @@
 from .compute_diff import compute_diff
-from .display_diff import compare_mscz_files, compare_musescore_files
\ No newline at end of file
+from .display_diff import compare_mscz_files, compare_musescore_files
+from .batch import compare_pairs, compare_revisions
+from .profiling import Profiler
+from .service import compare_async
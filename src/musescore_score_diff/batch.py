@@ -0,0 +1,199 @@
+"""
+Batch mode: diff a whole revision history (or a manifest of pairs) in one go.
+
+Each revision is parsed and hashed once and reused for both of its neighbouring
+diffs: the merge only copies from the new side of a pair, so a revision stays
+usable until it is the old side of a pair (which consumes it). Pairs are split
+into contiguous chunks that run in separate processes, so only the revisions
+on chunk boundaries are parsed twice.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .cache import MeasureHashCache, default_cache_dir
+from .compute_diff import count_states
+from .display_diff import build_diff_score, write_mscz
+from .mscz import mscx_members, pair_members
+from .score import LoadedScore
+
+logger = logging.getLogger(__name__)
+
+
+def _load_revision(path: str) -> dict[str, LoadedScore]:
+    """All scores of a revision, by .mscx member name (the path itself for .mscx files)."""
+    if path.endswith(".mscz"):
+        with zipfile.ZipFile(path, "r") as archive:
+            return {
+                info.filename: LoadedScore.from_bytes(archive.read(info), info.filename)
+                for info in mscx_members(archive)
+            }
+    return {path: LoadedScore.from_file(path)}
+
+
+def _output_path(output_dir: str, index: int, old: str, new: str) -> str:
+    stem1 = os.path.splitext(os.path.basename(old))[0]
+    stem2 = os.path.splitext(os.path.basename(new))[0]
+    return os.path.join(output_dir, f"{index:03d}-diff-{stem1}-{stem2}{os.path.splitext(old)[1]}")
+
+
+class _Revisions:
+    """The revisions loaded by one worker, each parsed at most once while still usable."""
+
+    def __init__(self):
+        self.loaded: dict[str, dict[str, LoadedScore]] = {}
+        self.loads = 0
+
+    def _load(self, path: str) -> dict[str, LoadedScore]:
+        self.loads += 1
+        return _load_revision(path)
+
+    def new_side(self, path: str) -> dict[str, LoadedScore]:
+        if path not in self.loaded:
+            self.loaded[path] = self._load(path)
+        return self.loaded[path]
+
+    def old_side(self, path: str) -> dict[str, LoadedScore]:
+        # the merge moves the old side's staves into the diff score, so it can't be reused
+        return self.loaded.pop(path, None) or self._load(path)
+
+
+def _run_pair(index: int, old: str, new: str, output_dir: str, cache: MeasureHashCache|None,
+              revisions: _Revisions) -> dict:
+    result = {"index": index, "old": old, "new": new}
+    start = time.perf_counter()
+    try:
+        if old.endswith(".mscz") != new.endswith(".mscz"):
+            raise ValueError("Both files must be of the same type (.mscx or .mscz)")
+        revision1 = revisions.old_side(old)
+        revision2 = revisions.new_side(new)
+        result["load_seconds"] = round(time.perf_counter() - start, 4)
+
+        counts = {}
+        diffed = {}
+        for name1, name2 in pair_members(list(revision1), list(revision2)):
+            diffed[name1], diffs = build_diff_score(revision1[name1], revision2[name2], cache=cache)
+            for state, count in count_states(diffs).items():
+                counts[state] = counts.get(state, 0) + count
+
+        output_path = _output_path(output_dir, index, old, new)
+        if old.endswith(".mscz"):
+            with zipfile.ZipFile(old, "r") as archive:
+                write_mscz(archive, diffed, output_path)
+        else:
+            diffed[old].write(output_path, encoding="UTF-8", xml_declaration=True)
+
+        result["output"] = output_path
+        result["states"] = counts
+        result["changed_measures"] = counts["modified"] + counts["inserted"] + counts["removed"] + counts["moved"]
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    logger.info("Processed: %s -> %s", old, new)
+    return result
+
+
+def _run_chunk(chunk: list[tuple[int, str, str]], output_dir: str, cache: MeasureHashCache|None) -> dict:
+    revisions = _Revisions()
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    results = [_run_pair(index, old, new, output_dir, cache, revisions) for index, old, new in chunk]
+    return {
+        "pairs": results,
+        "loads": revisions.loads,
+        # workers count on their own copy of the cache, so report what this chunk added
+        "cache_hits": cache.hits - hits if cache is not None else 0,
+        "cache_misses": cache.misses - misses if cache is not None else 0,
+    }
+
+
+def compare_pairs(pairs: list[tuple[str, str]], output_dir: str, workers: int|None = None,
+                  cache: MeasureHashCache|None = None) -> dict:
+    """
+    Diff every (old, new) pair, writing one diff file per pair into `output_dir`.
+
+    Pairs are processed in order in `workers` processes (contiguous chunks, so
+    consecutive pairs sharing a revision reuse it). Returns a JSON-able summary
+    with the changed measure counts and timings of each pair; a pair that fails
+    gets an "error" entry instead of stopping the batch.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    indexed = [(index, old, new) for index, (old, new) in enumerate(pairs, start=1)]
+
+    workers = max(1, min(workers or 1, len(indexed)))
+    size = math.ceil(len(indexed) / workers) if indexed else 1
+    chunks = [indexed[i:i + size] for i in range(0, len(indexed), size)]
+    if workers == 1:
+        chunk_results = [_run_chunk(chunk, output_dir, cache) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunk_results = list(executor.map(_run_chunk, chunks, [output_dir] * len(chunks), [cache] * len(chunks)))
+
+    summary = {
+        "pairs": [result for chunk in chunk_results for result in chunk["pairs"]],
+        "revisions_loaded": sum(chunk["loads"] for chunk in chunk_results),
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+    if cache is not None:
+        summary["cache"] = {
+            "hits": sum(chunk["cache_hits"] for chunk in chunk_results),
+            "misses": sum(chunk["cache_misses"] for chunk in chunk_results),
+        }
+    return summary
+
+
+def compare_revisions(revisions: list[str], output_dir: str, workers: int|None = None,
+                      cache: MeasureHashCache|None = None) -> dict:
+    """Diff each revision against the previous one (ordered oldest first), see `compare_pairs`."""
+    return compare_pairs(list(zip(revisions, revisions[1:])), output_dir, workers=workers, cache=cache)
+
+
+def _read_manifest(path: str) -> list[tuple[str, str]]:
+    """A JSON list of [old, new] pairs; relative paths are relative to the manifest."""
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    base = os.path.dirname(path)
+    return [(os.path.join(base, old), os.path.join(base, new)) for old, new in entries]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Diff a list of revisions (each against the previous one) or a manifest of pairs",
+    )
+    parser.add_argument("revisions", nargs="*", help="revisions, oldest first (.mscx or .mscz)")
+    parser.add_argument("--manifest", help="JSON file with a list of [old, new] pairs")
+    parser.add_argument("-o", "--output-dir", required=True)
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="pairs processed in parallel")
+    parser.add_argument("--summary", help="where to write the JSON summary (default: <output-dir>/summary.json)")
+    parser.add_argument("--cache-dir", default=default_cache_dir(), help="measure hash cache directory (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the measure hash cache")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not log each processed pair")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(message)s")
+
+    if args.manifest and args.revisions:
+        parser.error("give either revisions or --manifest, not both")
+    pairs = _read_manifest(args.manifest) if args.manifest else list(zip(args.revisions, args.revisions[1:]))
+    if not pairs:
+        parser.error("nothing to compare: give at least two revisions or a manifest")
+
+    cache = None if args.no_cache else MeasureHashCache(args.cache_dir)
+    summary = compare_pairs(pairs, args.output_dir, workers=args.jobs, cache=cache)
+
+    summary_path = args.summary or os.path.join(args.output_dir, "summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(json.dumps(summary, indent=2))
+
+    if any("error" in result for result in summary["pairs"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
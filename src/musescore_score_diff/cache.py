@@ -0,0 +1,185 @@
+"""
+On-disk, content-addressed cache of per-staff measure hashes (with the
+similarity features of the measures, see `fingerprints`).
+
+Entries are keyed by the SHA-256 of the .mscx file content, so a revision that
+has been diffed before is never parsed or hashed again, whatever its path.
+The directory is kept under `max_bytes` by evicting the least recently used
+entries (an entry's mtime is bumped on every hit).
+"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+from .score import LoadedScore, ScoreHashes
+
+# bump when the measure hash (see utils.canonical_measure_bytes) or the entries change
+CACHE_VERSION = 3
+
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "musescore-score-diff")
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MeasureHashCache:
+    """Size-bounded LRU cache of `ScoreHashes`, keyed by file content digest."""
+
+    def __init__(self, directory: str|None = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _entry_path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, digest: str) -> list[list[str]]|None:
+        entry = self._read(digest)
+        return entry["hashes"] if entry is not None else None
+
+    def _read(self, digest: str) -> dict|None:
+        path = self._entry_path(digest)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("version") != CACHE_VERSION:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, digest: str, hashes: list[list[str]], staff_keys: list[str|None]|None = None,
+            features: dict[str, list[int]]|None = None) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "hashes": hashes, "staff_keys": staff_keys, "features": features},
+                      f, separators=(",", ":"))
+        os.replace(tmp_path, self._entry_path(digest))
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def load(self, source: "str|LoadedScore") -> ScoreHashes:
+        """
+        Measure hashes for a path (or a LoadedScore read from a path or bytes).
+
+        On a miss the hashes are computed (from the already parsed tree if
+        there is one, otherwise streamed) and stored.
+        """
+        if isinstance(source, LoadedScore):
+            path = source.path
+            digest = source.digest or file_digest(path)
+        else:
+            path = source
+            digest = file_digest(path)
+        entry = self._read(digest)
+        if entry is not None:
+            self.hits += 1
+            return ScoreHashes(entry["hashes"], path, entry["staff_keys"], entry["features"])
+
+        self.misses += 1
+        if isinstance(source, LoadedScore):
+            scored = ScoreHashes(source.fingerprints, path, source.staff_keys)
+        else:
+            scored = ScoreHashes.from_file(path)
+        self.put(digest, scored.hashes, scored.staff_keys, scored.features)
+        return scored
+
+    def load_bytes(self, data: bytes) -> ScoreHashes:
+        """Measure hashes of an in-memory .mscx (e.g. an .mscz member), streamed on a miss."""
+        digest = hashlib.sha256(data).hexdigest()
+        entry = self._read(digest)
+        if entry is not None:
+            self.hits += 1
+            return ScoreHashes(entry["hashes"], staff_keys=entry["staff_keys"], features=entry["features"])
+
+        self.misses += 1
+        scored = ScoreHashes.from_file(io.BytesIO(data))
+        self.put(digest, scored.hashes, scored.staff_keys, scored.features)
+        return scored
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class SharedHashes:
+    """
+    In-memory `MeasureHashCache` stand-in for one diff pass (e.g. all members
+    of two .mscz files): each distinct file content is hashed once, however
+    many times it comes up. Misses go to `cache` if given. `entries` are
+    hashes already known, by content digest (e.g. hashed by a parent process).
+    """
+
+    def __init__(self, cache: MeasureHashCache|None = None, entries: dict[str, ScoreHashes]|None = None):
+        self.cache = cache
+        self.entries: dict[str, ScoreHashes] = dict(entries or {})
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, source: "str|LoadedScore") -> ScoreHashes:
+        if isinstance(source, LoadedScore):
+            digest = source.digest or file_digest(source.path)
+        else:
+            digest = file_digest(source)
+        if digest in self.entries:
+            self.hits += 1
+            return self.entries[digest]
+        self.misses += 1
+        if self.cache is not None:
+            scored = self.cache.load(source)
+        elif isinstance(source, LoadedScore):
+            scored = ScoreHashes(source.fingerprints, source.path, source.staff_keys)
+        else:
+            scored = ScoreHashes.from_file(source)
+        self.entries[digest] = scored
+        return scored
+
+    def load_bytes(self, data: bytes) -> ScoreHashes:
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self.entries:
+            self.hits += 1
+            return self.entries[digest]
+        self.misses += 1
+        if self.cache is not None:
+            scored = self.cache.load_bytes(data)
+        else:
+            scored = ScoreHashes.from_file(io.BytesIO(data))
+        self.entries[digest] = scored
+        return scored
@@ -1,12 +1,24 @@
-import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 
-from .utils import get_staves, extract_measures
 from .utils import State
+from .diff_engine import DiffEngine, alignment_diff, get_engine
+from .fingerprints import shared_ids
+from .lcs_kernel import lcs_table, use_numpy
+from .merkle import MIN_MEASURES, ScoreTree, changed_ranges
+from .moves import mark_moves
+from .similarity import mark_similar
+from .score import LoadedScore, ScoreHashes, load_score
+from .cache import MeasureHashCache
+from .profiling import Profiler, stage
+from .signature import Signature
+from .staff_match import StaffMatch, match_staves
 
 
 def lcs(seq1: list[str], seq2: list[str]) -> list[list[int]]:
-    """Compute LCS DP table."""
+    """Compute LCS DP table (a NumPy array for large tables when NumPy is installed, see `lcs_kernel`)."""
     n, m = len(seq1), len(seq2)
+    if use_numpy(n, m):
+        return lcs_table(seq1, seq2)
     L = [[0] * (m + 1) for _ in range(n + 1)]
     for i in range(n):
         for j in range(m):
@@ -16,49 +28,232 @@ def lcs(seq1: list[str], seq2: list[str]) -> list[list[int]]:
                 L[i+1][j+1] = max(L[i][j+1], L[i+1][j])
     return L
 
-def backtrack(L: list[list[int]], measures1, measures2)-> dict[int, State]:
-    """Backtrack through LCS to reconstruct diff."""
-    diffs = {}
+def backtrack_alignment(L: list[list[int]], measures1, measures2) -> list[tuple[State, int|None, int|None]]:
+    """
+    Backtrack through LCS to align the measures: (state, old number, new number)
+    steps in staff order, the number of the missing side None (see `diff_engine`).
+    """
+    steps = []
     i, j = len(measures1), len(measures2)
 
     while i > 0 or j > 0:
         # Case 1: identical hash (unchanged)
         if i > 0 and j > 0 and measures1[i-1][1] == measures2[j-1][1]:
-            diffs[measures1[i-1][0]] = State.UNCHANGED
+            steps.append((State.UNCHANGED, measures1[i-1][0], measures2[j-1][0]))
             i -= 1
             j -= 1
 
         # Case 2: both measures exist, same number but different hash (modified)
         elif i > 0 and j > 0 and measures1[i-1][0] == measures2[j-1][0]:
-            diffs[measures1[i-1][0]] = State.MODIFIED
+            steps.append((State.MODIFIED, measures1[i-1][0], measures2[j-1][0]))
             i -= 1
             j -= 1
 
         # Case 3: added
         elif j > 0 and (i == 0 or L[i][j-1] >= L[i-1][j]):
-            diffs[measures2[j-1][0]] = State.INSERTED
+            steps.append((State.INSERTED, None, measures2[j-1][0]))
             j -= 1
 
         # Case 4: removed
         elif i > 0 and (j == 0 or L[i][j-1] < L[i-1][j]):
-            diffs[measures1[i-1][0]] = State.REMOVED
+            steps.append((State.REMOVED, measures1[i-1][0], None))
             i -= 1
 
-    return diffs
+    steps.reverse()
+    return steps
+
+def backtrack(L: list[list[int]], measures1, measures2)-> dict[int, State]:
+    """Backtrack through LCS to reconstruct diff."""
+    return alignment_diff(backtrack_alignment(L, measures1, measures2))
+
+def _hashed(source, streaming: bool, cache=None):
+    if isinstance(source, ScoreHashes):
+        return source
+    if isinstance(source, Signature):
+        return source.single()
+    if cache is not None and (isinstance(source, str) or (isinstance(source, LoadedScore) and (source.path or source.digest))):
+        return cache.load(source)
+    if isinstance(source, LoadedScore):
+        return source
+    if streaming:
+        return ScoreHashes.from_file(source)
+    return load_score(source)
+
+def _measure_tuples(ids) -> list[tuple[int, int, None]]:
+    # the (number, hash, element) shape the engines take, with measure ids as hashes
+    return [(i + 1, h, None) for i, h in enumerate(ids)]
+
+def _unchanged(start1: int, start2: int, length: int) -> list[tuple[State, int, int]]:
+    # `length` unchanged steps after the 0-based positions start1/start2
+    return [(State.UNCHANGED, start1 + k + 1, start2 + k + 1) for k in range(length)]
+
+def _diff_staff_hashes(engine: DiffEngine, hashes1, hashes2,
+                       ranges: list[tuple[int, int, int, int]]|None = None) -> list[tuple[State, int|None, int|None]]:
+    """
+    Process pool task: only the measure id arrays are pickled, not the measure elements.
+    Returns the staff alignment (see `diff_engine`).
+
+    With `ranges` (see `merkle.changed_ranges`), only the measures in the ranges
+    go through the engine, the ones between them are unchanged.
+    """
+    measures1, measures2 = _measure_tuples(hashes1), _measure_tuples(hashes2)
+    if ranges is None:
+        return engine.align(measures1, measures2)
+    steps = []
+    end1 = end2 = 0
+    for start1, stop1, start2, stop2 in ranges:
+        steps += _unchanged(end1, end2, start1 - end1)
+        steps += engine.align(measures1[start1:stop1], measures2[start2:stop2])
+        end1, end2 = stop1, stop2
+    steps += _unchanged(end1, end2, len(measures1) - end1)
+    return steps
+
+def compute_diff(file1: str|LoadedScore|ScoreHashes|Signature,
+                 file2: str|LoadedScore|ScoreHashes|Signature,
+                 engine: str|DiffEngine|None = None, streaming: bool = False,
+                 cache: MeasureHashCache|None = None, workers: int|None = None,
+                 profiler: Profiler|None = None, detect_moves: bool = True,
+                 pair_similar: bool = True, narrow: bool = False) -> dict[int, dict[int, State]]:
+    """
+    Compute per-staff measure diffs between two .mscx files.
 
-def compute_diff(file1: str, file2: str) -> dict[int, dict[int, State]]:
+    Either side can be a path, an already parsed `LoadedScore`, precomputed
+    `ScoreHashes` or a loaded `Signature` (see `signature`), which are
+    then not parsed again. With `streaming`, paths are
+    hashed with iterparse instead of being parsed into a tree, so memory stays
+    bounded on huge scores. With a `cache` (see `cache.MeasureHashCache`, or
+    `cache.SharedHashes` for one pass), hashes of already seen file contents
+    are read from it instead.
+    `engine` selects the sequence diff (see `diff_engine`), defaults to Myers.
+
+    Staves are matched between the versions by instrument (see `staff_match`).
+    The result is keyed by old staff number; a removed staff has all its
+    measures REMOVED, added staves are only in `compute_staff_diff`'s match.
+
+    With `workers` > 1, staff pairs are diffed in a process pool of that size
+    (the result is the same as the serial one).
+
+    With a `profiler` (see `profiling`), hashing and diffing are recorded as
+    "hash" and "diff" stages, with one "diff_staff" stage per changed staff
+    when diffing serially.
+
+    Staves are compared through Merkle trees of their measure hashes (see
+    `merkle`): identical staves are found by their roots and skipped. With
+    `narrow`, on staves of at least `merkle.MIN_MEASURES` measures only the
+    measure ranges outside matching blocks go through the engine: much faster
+    on long staves with few edits, but the blocks are matched on their own, so
+    the alignment can differ from the engine's over the whole staff (e.g. a
+    block repeated elsewhere, or an edit the engine lines up across a block
+    boundary). Without it every changed staff is diffed whole.
+
+    With `detect_moves`, changed measures that only hold a block of measures
+    relocated from elsewhere in the staff are reported as MOVED (see `moves`).
+    With `pair_similar`, a removed and an inserted measure with similar notes
+    are both reported as MODIFIED (see `similarity`), from the measure
+    features kept with the hashes: a side given as hashes without them (e.g.
+    a `ScoreHashes` built from bare hash lists) is not paired.
+    """
+    return compute_staff_diff(file1, file2, engine=engine, streaming=streaming, cache=cache, workers=workers,
+                              profiler=profiler, detect_moves=detect_moves, pair_similar=pair_similar,
+                              narrow=narrow)[1]
+
+def compute_staff_diff(file1: str|LoadedScore|ScoreHashes|Signature,
+                       file2: str|LoadedScore|ScoreHashes|Signature,
+                       engine: str|DiffEngine|None = None, streaming: bool = False,
+                       cache: MeasureHashCache|None = None, workers: int|None = None,
+                       profiler: Profiler|None = None, detect_moves: bool = True,
+                       pair_similar: bool = True, narrow: bool = False) -> tuple[StaffMatch, dict[int, dict[int, State]]]:
+    """`compute_diff`, also returning how the staves were matched (pairs, added and removed staves)."""
+    match, alignments = compute_staff_alignment(file1, file2, engine=engine, streaming=streaming, cache=cache,
+                                                workers=workers, profiler=profiler, detect_moves=detect_moves,
+                                                pair_similar=pair_similar, narrow=narrow)
+    return match, {staff: alignment_diff(alignment) for staff, alignment in alignments.items()}
+
+def compute_staff_alignment(file1: str|LoadedScore|ScoreHashes|Signature,
+                            file2: str|LoadedScore|ScoreHashes|Signature,
+                            engine: str|DiffEngine|None = None, streaming: bool = False,
+                            cache: MeasureHashCache|None = None, workers: int|None = None,
+                            profiler: Profiler|None = None, detect_moves: bool = True,
+                            pair_similar: bool = True, narrow: bool = False) -> tuple[StaffMatch, dict[int, list[tuple[State, int|None, int|None]]]]:
+    """
+    `compute_staff_diff` with each staff's alignment, the (state, old number,
+    new number) steps in staff order (see `diff_engine`), instead of its states
+    keyed by measure number. The diff score is marked by walking these.
+    """
+    engine = get_engine(engine)
+    with stage(profiler, "hash", side="old"):
+        score1 = _hashed(file1, streaming, cache)
+        fingerprints1 = score1.fingerprints
+    with stage(profiler, "hash", side="new"):
+        score2 = _hashed(file2, streaming, cache)
+        fingerprints2 = score2.fingerprints
+
+    # equal measures get equal integer ids, compared instead of the hex hashes
+    hashes1, hashes2 = shared_ids(fingerprints1, fingerprints2)
+    with stage(profiler, "tree"):
+        tree1 = ScoreTree.from_fingerprints(fingerprints1)
+        tree2 = ScoreTree.from_fingerprints(fingerprints2)
+    with stage(profiler, "match_staves", staves_old=len(hashes1), staves_new=len(hashes2)) as record:
+        match = match_staves(hashes1, hashes2, score1.staff_keys, score2.staff_keys)
+        record.update(added=len(match.added), removed=len(match.removed))
 
-    staves1, staves2 = get_staves(file1), get_staves(file2)
-    assert len(staves1) == len(staves2), "Currently, only supported on files that have the same # of instruments"
-    i = 1
     res = {}
-    for staff1, staff2 in zip(staves1, staves2):
-        measures1, measures2 = extract_measures(staff1), extract_measures(staff2)
+    changed = []
+    ranges = {}
+    for old, new in match.pairs:
+        staff_tree1, staff_tree2 = tree1.staves[old - 1], tree2.staves[new - 1]
+        if staff_tree1.root == staff_tree2.root:
+            # same as the backtrack would give, without running the engine
+            res[old] = _unchanged(0, 0, len(hashes1[old - 1]))
+            continue
+        changed.append((old - 1, new - 1))
+        if narrow and min(len(staff_tree1), len(staff_tree2)) >= MIN_MEASURES:
+            ranges[old - 1] = changed_ranges(staff_tree1, staff_tree2)
+    for old in match.removed:
+        res[old] = [(State.REMOVED, num, None) for num in range(1, len(hashes1[old - 1]) + 1)]
+
+    parallel = workers is not None and workers > 1 and len(changed) > 1
+    with stage(profiler, "diff", engine=engine.name, staves=len(match.pairs), changed_staves=len(changed),
+               workers=workers if parallel else 1,
+               # LCS table size of the changed staves (the work of the "lcs" engine)
+               lcs_cells=sum(len(hashes1[i]) * len(hashes2[j]) for i, j in changed)):
+        if parallel:
+            chunksize = max(1, len(changed) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                alignments = executor.map(
+                    _diff_staff_hashes,
+                    [engine] * len(changed),
+                    [hashes1[i] for i, _ in changed],
+                    [hashes2[j] for _, j in changed],
+                    [ranges.get(i) for i, _ in changed],
+                    chunksize=chunksize,
+                )
+                for (i, _), alignment in zip(changed, alignments):
+                    res[i + 1] = alignment
+        else:
+            for i, j in changed:
+                with stage(profiler, "diff_staff", staff=i + 1, measures_old=len(hashes1[i]),
+                           measures_new=len(hashes2[j]), lcs_cells=len(hashes1[i]) * len(hashes2[j]),
+                           ranges=len(ranges[i]) if i in ranges else None):
+                    res[i + 1] = _diff_staff_hashes(engine, hashes1[i], hashes2[j], ranges.get(i))
+
+    if detect_moves and changed:
+        with stage(profiler, "moves", changed_staves=len(changed)):
+            for i, j in changed:
+                res[i + 1] = mark_moves(res[i + 1], hashes1[i], hashes2[j])
+
+    if pair_similar and changed and fingerprints1.features is not None and fingerprints2.features is not None:
+        with stage(profiler, "similar", changed_staves=len(changed)):
+            for i, j in changed:
+                res[i + 1] = mark_similar(res[i + 1], fingerprints1.staff_features(i),
+                                          fingerprints2.staff_features(j))
 
-        seq1 = [h for (_, h, _) in measures1]
-        seq2 = [h for (_, h, _) in measures2]
+    return match, {i: res[i] for i in sorted(res)}
 
-        L = lcs(seq1, seq2)
-        res[i] = backtrack(L, measures1, measures2)
-        i += 1
-    return res
+def count_states(diffs: dict[int, dict[int, State]]) -> dict[str, int]:
+    """Number of measures in each state over all staves, e.g. {"unchanged": 10, "modified": 1, ...}."""
+    counts = {state.name.lower(): 0 for state in State}
+    for staff_diff in diffs.values():
+        for state in staff_diff.values():
+            counts[state.name.lower()] += 1
+    return counts
@@ -0,0 +1,124 @@
+"""
+Changes-only diff scores: keep the changed measures plus some context.
+
+After `mark_diffs`, measure i of each staff of the diff score holds step i of
+its staff pair's alignment (an added or removed staff: its measure i), so the measures to keep are computed once for all staves: each
+position changed in any staff pair, `context` measures on either side of it,
+and the measure after it (it holds the end of the highlight). The kept runs
+are the hunks; the other measures are dropped from every staff, so the diff
+score grows with the number of changes instead of the length of the score.
+
+Each hunk starts with a "@@ measures a-b @@" staff text on the top staff (a-b
+being its measure positions in the full diff) and ends with a line break. The
+clef, key and time signatures in effect where a hunk starts are copied into it
+when they were set in a dropped measure.
+
+Other spanners (slurs, hairpins, ...) reaching across dropped measures are left
+as they are and may end in another measure.
+"""
+from copy import deepcopy
+
+from .utils import State
+from .xmlbackend import ET
+
+DEFAULT_CONTEXT = 2
+# voice children that set up the measures after them
+CARRIED_TAGS = ("Clef", "KeySig", "TimeSig")
+# left out of the copies: element ids must stay unique, and the copies are not linked to excerpts
+STRIPPED_TAGS = ("eid", "linked", "linkedMain")
+
+
+def hunks(alignments: list[list[tuple[State, int|None, int|None]]], measure_count: int,
+          context: int = DEFAULT_CONTEXT) -> list[tuple[int, int]]:
+    """
+    The (first, last) measure positions (1-based, inclusive) to keep for
+    the alignments of the marked staves over `measure_count` measures, see the module docstring.
+    """
+    keep = [False] * (measure_count + 2)
+    for alignment in alignments:
+        # `mark_diffs_in_staff_pair` makes position i from step i of the alignment
+        for position, (state, _, _) in enumerate(alignment, start=1):
+            if state == State.UNCHANGED:
+                continue
+            for k in range(max(1, position - context), min(measure_count, position + max(context, 1)) + 1):
+                keep[k] = True
+
+    result = []
+    start = None
+    for k in range(1, measure_count + 2):
+        if keep[k] and start is None:
+            start = k
+        elif not keep[k] and start is not None:
+            result.append((start, k - 1))
+            start = None
+    return result
+
+
+def _strip_ids(elem: ET.Element) -> ET.Element:
+    for child in list(elem):
+        if child.tag in STRIPPED_TAGS:
+            elem.remove(child)
+        else:
+            _strip_ids(child)
+    return elem
+
+
+def _carry_signatures(measures: list[ET.Element], starts: set[int]) -> None:
+    """Copy the clef/key/time signatures in effect at each measure in `starts` (0-based) into it."""
+    carried = {}
+    for k, measure in enumerate(measures):
+        voice = measure.find("voice")
+        if voice is None:
+            continue
+        if k in starts:
+            present = {child.tag for child in voice}
+            for tag in reversed(CARRIED_TAGS):
+                if tag in carried and tag not in present:
+                    voice.insert(0, _strip_ids(deepcopy(carried[tag])))
+        for child in voice:
+            if child.tag in CARRIED_TAGS:
+                carried[child.tag] = child
+
+
+def _make_hunk_marker(first: int, last: int) -> ET.Element:
+    text = ET.Element("StaffText")
+    ET.SubElement(text, "text").text = f"@@ measures {first}-{last} @@"
+    return text
+
+
+def _make_line_break() -> ET.Element:
+    layout_break = ET.Element("LayoutBreak")
+    ET.SubElement(layout_break, "subtype").text = "line"
+    return layout_break
+
+
+def condense_diff_score(diff_score: ET.Element, alignments: list[list[tuple[State, int|None, int|None]]],
+                        context: int = DEFAULT_CONTEXT) -> list[tuple[int, int]]:
+    """
+    Drop the measures of the marked `diff_score` (its <Score>) outside the
+    hunks of `alignments` from every staff. Returns the hunks. A diff without
+    changes keeps its first measure.
+    """
+    staves = diff_score.findall("Staff")
+    if not staves:
+        return []
+    staff_measures = [staff.findall("Measure") for staff in staves]
+    measure_count = min(len(measures) for measures in staff_measures)
+    kept_hunks = hunks(alignments, measure_count, context)
+    positions = [k for first, last in kept_hunks for k in range(first, last + 1)] or [1]
+
+    for s, (staff, measures) in enumerate(zip(staves, staff_measures)):
+        if not measures:
+            continue
+        _carry_signatures(measures, {first - 1 for first, _ in kept_hunks if first > 1})
+        if s == 0:
+            for first, last in kept_hunks:
+                voice = measures[first - 1].find("voice")
+                if voice is not None:
+                    voice.insert(0, _make_hunk_marker(first, last))
+                last_measure = measures[last - 1]
+                index = 1 if len(last_measure) and last_measure[0].tag == "eid" else 0
+                last_measure.insert(index, _make_line_break())
+        kept = [measures[k - 1] for k in positions if k <= len(measures)]
+        staff[:] = [child for child in staff if child.tag != "Measure"] + kept
+    return kept_hunks
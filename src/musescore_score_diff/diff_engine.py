@@ -0,0 +1,310 @@
+"""
+Pluggable sequence diff engines used by `compute_diff`.
+
+Every engine takes two lists of `(number, hash, element)` measure tuples (as
+returned by `extract_measures`) and aligns them the way
+`backtrack_alignment(lcs(...), ...)` does: a list of (state, old number, new
+number) steps in staff order, one per measure pair walked together (UNCHANGED,
+MODIFIED) or per measure only on one side (REMOVED: new number None, INSERTED:
+old number None). `diff` keys the states by measure number instead (see
+`alignment_diff`). Hashes are only compared for equality,
+`compute_diff` passes interned integer ids (see `fingerprints`). The table engine is kept around as the
+reference implementation; `MyersEngine` is the default.
+"""
+from . import lcs_kernel
+from .utils import State
+
+
+def alignment_diff(alignment: list[tuple[State, int|None, int|None]]) -> dict[int, State]:
+    """
+    The states of an alignment keyed by measure number: the old number, or the
+    new one for a step without an old measure. Where an old and a new number
+    collide, the step nearest the start of the staff wins, as in the backtrack.
+    """
+    diffs = {}
+    for state, old, new in reversed(alignment):
+        diffs[old if old is not None else new] = state
+    return diffs
+
+
+class DiffEngine:
+    """Base class for diff engines."""
+
+    name = "base"
+
+    def align(self, measures1: list[tuple], measures2: list[tuple]) -> list[tuple[State, int|None, int|None]]:
+        raise NotImplementedError
+
+    def diff(self, measures1: list[tuple], measures2: list[tuple]) -> dict[int, State]:
+        return alignment_diff(self.align(measures1, measures2))
+
+
+class LCSTableEngine(DiffEngine):
+    """The original full (n+1)x(m+1) LCS table + backtrack. Quadratic memory."""
+
+    name = "lcs"
+
+    def align(self, measures1, measures2):
+        # imported here, compute_diff imports this module
+        from .compute_diff import lcs, backtrack_alignment
+
+        seq1 = [h for (_, h, _) in measures1]
+        seq2 = [h for (_, h, _) in measures2]
+        return backtrack_alignment(lcs(seq1, seq2), measures1, measures2)
+
+
+class _FallbackRequired(Exception):
+    """Raised when the Myers trace grows past its memory budget."""
+
+
+class _MyersOracle:
+    """
+    Answers LCS length queries for prefixes of (a, b) from a lazily grown Myers trace.
+
+    trace[d][(k + d) // 2] is the furthest x reachable on diagonal k = x - y with
+    at most d insertions/deletions (None if the diagonal is not reachable).
+    Since the edit distance D(x, y) never decreases along a diagonal,
+    D(x, y) is the smallest d with trace[d][k] >= x.
+    """
+
+    def __init__(self, a: list[str], b: list[str], budget: int):
+        self.a, self.b = a, b
+        self.n, self.m = len(a), len(b)
+        self.budget = budget
+        self.cells = 0
+        self.trace: list[list[int | None]] = []
+
+    def _extend(self) -> None:
+        a, b, n, m = self.a, self.b, self.n, self.m
+        d = len(self.trace)
+        self.cells += d + 1
+        if self.cells > self.budget:
+            raise _FallbackRequired()
+
+        prev = self.trace[d - 1] if d >= 1 else None
+        prev2 = self.trace[d - 2] if d >= 2 else None
+        cur: list[int | None] = [None] * (d + 1)
+        for idx, k in enumerate(range(-d, d + 1, 2)):
+            if k < -m or k > n:
+                continue
+            if d == 0:
+                x = 0
+            else:
+                x = -1
+                # move down from diagonal k+1
+                if k + 1 <= d - 1:
+                    v = prev[(k + 1 + d - 1) // 2]
+                    if v is not None:
+                        cand = min(v, m + k)
+                        if cand >= max(k + 1, 0):
+                            x = max(x, cand)
+                # move right from diagonal k-1
+                if k - 1 >= -(d - 1):
+                    v = prev[(k - 1 + d - 1) // 2]
+                    if v is not None:
+                        cand = min(v, n - 1)
+                        if cand >= max(k - 1, 0):
+                            x = max(x, cand + 1)
+                # anything reachable with d-2 edits is reachable with d
+                if prev2 is not None and -(d - 2) <= k <= d - 2:
+                    v = prev2[(k + d - 2) // 2]
+                    if v is not None:
+                        x = max(x, v)
+                if x < 0:
+                    continue
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            cur[idx] = x
+        self.trace.append(cur)
+
+    def _reaches(self, d: int, k: int, x: int) -> bool:
+        while len(self.trace) <= d:
+            self._extend()
+        v = self.trace[d][(k + d) // 2]
+        return v is not None and v >= x
+
+    def distance(self, x: int, y: int) -> int:
+        k = x - y
+        lo = abs(k)
+        # highest level already in the trace with the right parity
+        hi = len(self.trace) - 1
+        if (hi - lo) % 2:
+            hi -= 1
+        if hi < lo or not self._reaches(hi, k, x):
+            # grow the trace one level at a time until (x, y) is reached
+            d = max(lo, hi + 2)
+            while not self._reaches(d, k, x):
+                d += 2
+            return d
+        while lo < hi:
+            mid = lo + ((hi - lo) // 2) // 2 * 2
+            if self._reaches(mid, k, x):
+                hi = mid
+            else:
+                lo = mid + 2
+        return lo
+
+    def length(self, x: int, y: int) -> int:
+        return (x + y - self.distance(x, y)) // 2
+
+
+def _next_row(row: list[int], item: str, seq2: list[str]) -> list[int]:
+    new = [0] * len(row)
+    for j in range(len(seq2)):
+        if item == seq2[j]:
+            new[j + 1] = row[j] + 1
+        else:
+            new[j + 1] = max(row[j + 1], new[j])
+    return new
+
+
+def _reverse_rows(seq1, seq2, lo: int, first_row: list[int], hi: int, leaf: int, next_row=_next_row):
+    """
+    Yield (i, row i of the LCS table) for i = hi down to lo, given row lo.
+
+    Halves the row range recursively so only O(log n) checkpoint rows plus one
+    leaf block are alive at a time.
+    """
+    if hi - lo < leaf:
+        rows = [first_row]
+        for i in range(lo, hi):
+            rows.append(next_row(rows[-1], seq1[i], seq2))
+        for offset in range(len(rows) - 1, -1, -1):
+            yield lo + offset, rows[offset]
+        return
+
+    mid = (lo + hi + 1) // 2
+    row = first_row
+    for i in range(lo, mid):
+        row = next_row(row, seq1[i], seq2)
+    yield from _reverse_rows(seq1, seq2, mid, row, hi, leaf, next_row)
+    yield from _reverse_rows(seq1, seq2, lo, first_row, mid - 1, leaf, next_row)
+
+
+class _RowsOracle:
+    """
+    Answers LCS length queries from table rows regenerated in reverse order.
+
+    Queries must walk upwards through the table (as the backtrack does):
+    only the two most recent rows are kept. Large tables get their rows from
+    the NumPy kernel when it is available (see `lcs_kernel`).
+    """
+
+    def __init__(self, a: list[str], b: list[str], leaf: int = 64):
+        if lcs_kernel.use_numpy(len(a), len(b)):
+            a, b = lcs_kernel.encode(a, b)
+            first_row = lcs_kernel.np.zeros(len(b) + 1, dtype=lcs_kernel.row_dtype(len(a), len(b)))
+            self._rows = _reverse_rows(a, b, 0, first_row, len(a), leaf, lcs_kernel.next_row)
+        else:
+            self._rows = _reverse_rows(a, b, 0, [0] * (len(b) + 1), len(a), leaf)
+        self._cache: dict[int, list[int]] = {}
+        self._lowest = len(a) + 1
+
+    def length(self, x: int, y: int) -> int:
+        while x < self._lowest:
+            i, row = next(self._rows)
+            self._cache[i] = row
+            self._cache.pop(i + 2, None)
+            self._lowest = i
+        return int(self._cache[x][y])
+
+
+def _walk(measures1, measures2, length) -> list[tuple[State, int|None, int|None]]:
+    """
+    Same case analysis as `backtrack_alignment`, reading LCS lengths from `length(i, j)`.
+    """
+    steps = []
+    i, j = len(measures1), len(measures2)
+
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and measures1[i-1][1] == measures2[j-1][1]:
+            steps.append((State.UNCHANGED, measures1[i-1][0], measures2[j-1][0]))
+            i -= 1
+            j -= 1
+        elif i > 0 and j > 0 and measures1[i-1][0] == measures2[j-1][0]:
+            steps.append((State.MODIFIED, measures1[i-1][0], measures2[j-1][0]))
+            i -= 1
+            j -= 1
+        elif j > 0 and (i == 0 or length(i, j-1) >= length(i-1, j)):
+            steps.append((State.INSERTED, None, measures2[j-1][0]))
+            j -= 1
+        else:
+            steps.append((State.REMOVED, measures1[i-1][0], None))
+            i -= 1
+
+    steps.reverse()
+    return steps
+
+
+class MyersEngine(DiffEngine):
+    """
+    Myers O(ND) diff with common prefix/suffix trimming.
+
+    The backtrack walk only ever needs LCS lengths of prefixes next to its path:
+    - inside the common suffix it only takes the "identical hash" branch,
+    - inside the common prefix (length p) the length of (a[:i], b[:j]) is min(i, j),
+    - everywhere else it is p + the LCS length of the trimmed middle sequences,
+      which the Myers trace gives us without a table.
+    If the trace outgrows `trace_budget` cells (very different staves) the middle
+    is handled by regenerating table rows in reverse instead (O(m log n) memory,
+    rows computed by the NumPy kernel when it is available, see `lcs_kernel`).
+    """
+
+    name = "myers"
+
+    def __init__(self, trace_budget: int = 1 << 16, leaf_rows: int = 64):
+        self.trace_budget = trace_budget
+        self.leaf_rows = leaf_rows
+
+    def align(self, measures1, measures2):
+        seq1 = [h for (_, h, _) in measures1]
+        seq2 = [h for (_, h, _) in measures2]
+        n, m = len(seq1), len(seq2)
+
+        suffix = 0
+        while suffix < min(n, m) and seq1[n - 1 - suffix] == seq2[m - 1 - suffix]:
+            suffix += 1
+        end1, end2 = n - suffix, m - suffix
+
+        prefix = 0
+        while prefix < min(end1, end2) and seq1[prefix] == seq2[prefix]:
+            prefix += 1
+
+        if prefix == end1 or prefix == end2:
+            return _walk(measures1, measures2, lambda i, j: min(i, j))
+
+        middle1, middle2 = seq1[prefix:end1], seq2[prefix:end2]
+        oracle = _MyersOracle(middle1, middle2, self.trace_budget)
+        try:
+            return _walk(measures1, measures2, self._length(oracle, prefix))
+        except _FallbackRequired:
+            oracle = _RowsOracle(middle1, middle2, self.leaf_rows)
+            return _walk(measures1, measures2, self._length(oracle, prefix))
+
+    @staticmethod
+    def _length(oracle, prefix: int):
+        def length(i: int, j: int) -> int:
+            if i <= prefix or j <= prefix:
+                return min(i, j)
+            return prefix + oracle.length(i - prefix, j - prefix)
+        return length
+
+
+ENGINES: dict[str, type[DiffEngine]] = {
+    LCSTableEngine.name: LCSTableEngine,
+    MyersEngine.name: MyersEngine,
+}
+
+
+def get_engine(engine: "str | DiffEngine | None" = None) -> DiffEngine:
+    """Resolve an engine name (or instance) to an engine; defaults to Myers."""
+    if engine is None:
+        return MyersEngine()
+    if isinstance(engine, DiffEngine):
+        return engine
+    try:
+        return ENGINES[engine]()
+    except KeyError:
+        raise ValueError(f"Unknown diff engine: {engine}") from None
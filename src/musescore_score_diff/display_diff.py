@@ -1,88 +1,115 @@
+import argparse
+import hashlib
+import json
+import logging
 import sys
-import xml.etree.ElementTree as ET
 import zipfile
+import io
 import os
-import shutil
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
 from typing import List, Tuple
-import tempfile
 
 # Assuming these are imported from your utils
-from .utils import extract_measures, State, _make_cutaway, _make_empty_measure, highlight_measure, make_highlight_end_empty_measure
-from .compute_diff import compute_diff
-
-def new_merge_musescore_files(f1_path, f2_path, output_path=None):
+from .condense import condense_diff_score
+from .element_diff import color_measure_changes
+from .utils import extract_measures, State, _make_cutaway, _make_empty_measure, highlight_runs
+from .compute_diff import compute_staff_alignment
+from .staff_match import StaffMatch, match_staves
+from .diff_engine import alignment_diff
+from .score import LoadedScore, ScoreHashes, load_score
+from .cache import MeasureHashCache, SharedHashes, default_cache_dir
+from .mscz import copy_member, pair_mscx_members
+from .summary import summarize_diff
+from .profiling import Profiler, stage
+from .signature import SIGNATURE_SUFFIX, Signature
+from .xmlbackend import ET
+
+logger = logging.getLogger(__name__)
+
+def _part_staves(loaded: LoadedScore) -> list[tuple[ET.Element, list[int]]]:
+    # each <Part> with the numbers of its staves, through the ids of its <Staff> children
+    positions = {staff.get("id"): s for s, staff in enumerate(loaded.staves, start=1)}
+    return [(part, [positions[staff.get("id")] for staff in part.findall("Staff") if staff.get("id") in positions])
+            for part in loaded.parts]
+
+def new_merge_musescore_files(f1_path: str|LoadedScore, f2_path: str|LoadedScore, output_path=None,
+                              match: StaffMatch|None = None):
     """
-    read in f1 and f2, create diff_score that is union of both scores
-
-    make list of all parts in f1
-    and all staves in f1
-        Note that their IDs line up!
+    read in f1 and f2 (paths or already loaded scores), create diff_score that is union of both scores
 
-    make diff_score a deep_copy of score 1
+    make diff_score a shallow copy of score 1 (its staves and parts are reused, so f1 is consumed)
+    score 2 is only copied from, so it can still be used afterwards
 
-    then, copy over all parts and scores from staff 2 into diff_score
-    create list union_part_list and union_staff_list
-    when adding a part to the part list:
-        - simultaneously add the staff to the staff list
-        - Need to insert it in the correct position
-            - so, if the staff name exists in the list, name staff "<name>-1"
-            - set all IDs by their position in the list afterwards,
+    the staves are placed by `match` (see `staff_match`, matched from the scores' measures if not given):
+        - a part of score 2 goes right after the part of score 1 holding its first paired staff
+          (a part keeps its staves together, so a multi-staff part stays whole)
+        - a part with no paired staff (an added instrument) goes after the part before it in score 2
+        - copied parts of paired staves get a cutaway
+        - staves and parts are renumbered by their position, the <Staff> ids of the parts with them
 
-    then, once lists are creatd
-    overwrite all parts in diff_score with the parts (in order) from part_list
-    and overwrite all staves in diff_score with the scores (in order) from score_list
+    returns the diff score, its part names, and the staves to mark: (old staff
+    number, its staff, the copy of its partner) per pair, None on the missing
+    side of a removed or an added staff
     """
-    tree1 = ET.parse(f1_path)
-    tree2 = ET.parse(f2_path)
-
-    root1 = tree1.getroot()
-    root2 = tree2.getroot()
-
-    score1 = root1.find("Score")
-    score2 = root2.find("Score")
-    if score1 is None or score2 is None:
-        raise ValueError("Both files must contain a <Score> element.")
-
-    union_part_list = [part for part in score1.findall("Part")]
-    part_names = [part.find("trackName").text for part in score1.findall("Part")]
-    union_staff_list = [staff for staff in score1.findall("Staff")]
+    loaded1, loaded2 = load_score(f1_path), load_score(f2_path)
+    if match is None:
+        match = match_staves(loaded1.hashes, loaded2.hashes, loaded1.staff_keys, loaded2.staff_keys)
+    partners = {new: old for old, new in match.pairs}
+
+    parts1 = _part_staves(loaded1)
+    part_of = {s: k for k, (_, staves) in enumerate(parts1) for s in staves}
+    # new parts after each old part (-1: before the first one)
+    following = defaultdict(list)
+    anchor = -1
+    for part, staves in _part_staves(loaded2):
+        paired = [partners[s] for s in staves if s in partners]
+        if paired:
+            anchor = part_of.get(paired[0], anchor)
+        following[anchor].append((part, staves, bool(paired)))
 
     def _make_cutaway() -> ET.Element:
         return ET.fromstring("<cutaway>1</cutaway>")
 
-    for part, staff in zip(score2.findall("Part"), score2.findall("Staff")):
-        # This assertion check only works for the score, not for parts !!
-        # assert part.attrib["id"] == staff.attrib["id"], (
-        #     f"ERROR: part id {part.attrib["id"]} not matching staff id {staff.attrib["id"]}"
-        # )
-        staff_name = part.find("trackName").text
-        assert staff_name is not None
-        try:
-            index = part_names.index(staff_name)
+    #(part, its score staves) in diff score order
+    union = []
+    copies = {}
+    for k in range(-1, len(parts1)):
+        if k >= 0:
+            part, staves = parts1[k]
+            union.append((part, [loaded1.staves[s - 1] for s in staves]))
+        for part, staves, paired in following[k]:
+            # copied, so score2 can be reused afterwards
             p = deepcopy(part)
-            s = p.find("Staff")
-            s.append(_make_cutaway())
-            union_part_list.insert(index +1, p)
-            part_names.insert(index +1, staff_name)
-            union_staff_list.insert(index, deepcopy(staff))
-        except ValueError:
-            # append to end of list
-            print(f"ValueError: {staff_name}")
-            union_part_list.append(part)
-            part_names.append(staff_name)
-            union_staff_list.append(staff)
-            continue
-        #TODO: Piano staves get added wrong, should be added after the second staff, not the first staff
-        
-
-    diff_score_tree = deepcopy(tree1)
+            if paired:
+                for s in p.findall("Staff"):
+                    s.append(_make_cutaway())
+            else:
+                logger.debug("New part found: %s", part.findtext("trackName"))
+            for s in staves:
+                copies[s] = deepcopy(loaded2.staves[s - 1])
+            union.append((p, [copies[s] for s in staves]))
+
+    union_part_list = [part for part, _ in union]
+    part_names = [part.findtext("trackName") for part in union_part_list]
+    union_staff_list = [staff for _, staves in union for staff in staves]
+    num_staves = 0
+    for part, staves in union:
+        for part_staff, staff in zip(part.findall("Staff"), staves):
+            num_staves += 1
+            part_staff.attrib["id"] = staff.attrib["id"] = f"{num_staves}"
+
+    marked = [(old, loaded1.staves[old - 1], copies[new]) for old, new in match.pairs]
+    marked += [(old, loaded1.staves[old - 1], None) for old in match.removed]
+    marked += [(None, None, copies[new]) for new in match.added]
+
+    # the staves/parts of score1 are moved over as-is anyway, so only the
+    # root and <Score> need to be new elements
+    diff_score_tree, diff_score = loaded1.shallow_copy()
 
     # remove all parts, and add back all parts from union_part_list (update IDs as they are inserted)
 
-    diff_root = diff_score_tree.getroot()
-    diff_score = diff_root.find("Score")
-
     list_score = list(diff_score)
     part_first_index = -1
     staff_first_index = -1
@@ -101,23 +128,15 @@ def new_merge_musescore_files(f1_path, f2_path, output_path=None):
     assert part_first_index != -1, "Could not find any parts in diff-score..."
     assert staff_first_index != -1, "Could not find any staves in diff-score..."
 
-    num_staves = len(union_staff_list)
-    num_parts = len(union_part_list)
-    # TODO: Something here is messing up -- drum staff not being copied correctly, eveyrhting works tho
-    # assert num_staves == num_parts, f"Num staves: {num_staves}, num parts: {num_parts}\n {[staff.attrib['id'] for staff in union_staff_list]}\n{[staff.attrib['id'] for staff in union_part_list]}"
-    #Why are there 11 staves? thats an odd umber ??
-
-    # all staves removed, add back new staves 
+    # all staves removed, add back new staves (numbered above, with their parts)
     for staff in reversed(union_staff_list):
-        staff.attrib["id"] = f"{num_staves}"
-        num_staves -= 1
         diff_score.insert(staff_first_index, staff)
 
     #remove parts:
     for part in parts_to_delete:
         diff_score.remove(part)
 
-    
+    num_parts = len(union_part_list)
     for part in reversed(union_part_list):
         part.attrib["id"] = f"{num_parts}"
         num_parts -= 1
@@ -125,30 +144,21 @@ def new_merge_musescore_files(f1_path, f2_path, output_path=None):
 
     if output_path:
         diff_score_tree.write(output_path, encoding="UTF-8", xml_declaration=True)
-    return (diff_score_tree, part_names)
+    return (diff_score_tree, part_names, marked)
 
-def merge_musescore_files_for_diff(f1_path: str, f2_path: str) -> Tuple[ET.ElementTree, List[str]]:
+def merge_musescore_files_for_diff(f1_path: str|LoadedScore, f2_path: str|LoadedScore) -> Tuple[ET.ElementTree, List[str]]:
     """
     Merge two MuseScore files for diff display (adapted from your new_merge_musescore_files).
     """
-    tree1 = ET.parse(f1_path)
-    tree2 = ET.parse(f2_path)
-
-    root1 = tree1.getroot()
-    root2 = tree2.getroot()
-
-    score1 = root1.find("Score")
-    score2 = root2.find("Score")
-    if score1 is None or score2 is None:
-        raise ValueError("Both files must contain a <Score> element.")
+    loaded1, loaded2 = load_score(f1_path), load_score(f2_path)
 
     # Get parts and create union lists
-    union_part_list = [part for part in score1.findall("Part")]
-    part_names = [part.find("trackName").text for part in score1.findall("Part")]
-    union_staff_list = [staff for staff in score1.findall("Staff")]
+    union_part_list = list(loaded1.parts)
+    part_names = loaded1.part_names
+    union_staff_list = list(loaded1.staves)
 
     # Process parts from score2
-    for part, staff in zip(score2.findall("Part"), score2.findall("Staff")):
+    for part, staff in zip(loaded2.parts, loaded2.staves):
         assert part.attrib["id"] == staff.attrib["id"], (
             "ERROR: Part and staff IDs got out of sync"
         )
@@ -172,7 +182,7 @@ def merge_musescore_files_for_diff(f1_path: str, f2_path: str) -> Tuple[ET.Eleme
             union_staff_list.insert(index + 1, s)
         except ValueError:
             # Part doesn't exist in score1, append to end
-            print(f"New part found: {staff_name}")
+            logger.debug("New part found: %s", staff_name)
             p = deepcopy(part)
             track_name_elem = p.find("trackName")
             if track_name_elem is not None:
@@ -183,9 +193,7 @@ def merge_musescore_files_for_diff(f1_path: str, f2_path: str) -> Tuple[ET.Eleme
             union_staff_list.append(deepcopy(staff))
 
     # Create diff score tree
-    diff_score_tree = deepcopy(tree1)
-    diff_root = diff_score_tree.getroot()
-    diff_score = diff_root.find("Score")
+    diff_score_tree, diff_score = loaded1.shallow_copy()
 
     # Remove existing parts and staves
     list_score = list(diff_score)
@@ -227,97 +235,141 @@ def merge_musescore_files_for_diff(f1_path: str, f2_path: str) -> Tuple[ET.Eleme
 
     return (diff_score_tree, part_names)
 
-def mark_diffs_in_staff_pair(staff1, staff2, measures_to_mark) -> None:
+def mark_diffs_in_staff_pair(staff1, staff2, alignment, element_diff: bool = True) -> None:
     """
     Fn that goes through diff score, iterates over each staff.
     for each (staff, staff-1) pairing, and applies the selected diff
+    `alignment` is the staff pair's (state, old number, new number) steps (see `diff_engine`),
+    a step without an old/new measure gets a measure of rest on that side
     if measure is unchanged, set the measure in staff-1 to be unchanged
         (NOTE: Potentially both? so it only shows the different measures) (maybe a toggleable option)
     if measure is modified, highlight staff red, and staff1 green
     if measure is added, add a measure of rest to staff, and highlight it red, highlight staff1 green
     if measure removed, add measue of rest to staff1, and highlight it in red, highlight staff red too
+    if measure moved (a block relocated from elsewhere), highlight it blue on the side(s) holding it
+    with `element_diff`, the changed notes/rests of a modified measure are also colored (see `element_diff`)
+    consecutive measures highlighted in the same color share one spanner (see `highlight_runs`)
 
     """
 
-    #process measures in a list so we can modify it, then add them all back afterwards
-    measures1 = list(staff1.findall("Measure"))
-    measures2 = list(staff2.findall("Measure"))
+    #walk the alignment, then swap all the measures in at once
+    measures1 = staff1.findall("Measure")
+    measures2 = staff2.findall("Measure")
 
     m1_processed = []
     m2_processed = []
-    # upper_bound = max(len(measures1), len(measures2))
-    prev_measure_highlighted = False
-    upper_bound = len(measures_to_mark.keys()) +1
-    for i in range(1, upper_bound):
-        #pop from m1 and m2, and add to m1/m2 pocessed
-        m1 = measures1.pop(0)
-        m2 = measures2.pop(0)
-
-        m1_next = measures1[0] if measures1 else None
-        m2_next = measures2[0] if measures2 else None
-        match measures_to_mark[i]:
+    #highlight color of each processed measure, runs of one color share a spanner
+    colors1 = []
+    colors2 = []
+    for state, old, new in alignment:
+        #each measure is used by exactly one step, a missing side is a measure of rest
+        m1 = measures1[old - 1] if old is not None else _make_empty_measure()
+        m2 = measures2[new - 1] if new is not None else _make_empty_measure()
+
+        match state:
             case State.UNCHANGED:
                 #clear staff2 (remove old measure)
-                m1_processed.append(m1)
-                if prev_measure_highlighted:
-                    m2_processed.append(make_highlight_end_empty_measure())
-                    prev_measure_highlighted = False
-                else:
-                    m2_processed.append(_make_empty_measure())
-                # m2_processed.append(m2)   # <-- For testing
+                m2 = _make_empty_measure()
+                # m2 = measures2[new - 1]   # <-- For testing
+                color1 = color2 = None
             case State.MODIFIED:
                 #highlight staff1 red and staff2 green
-                m1_processed.append(highlight_measure((200, 0, 0), m1, m1_next))
-                m2_processed.append(highlight_measure((0, 200, 0), m2, m2_next))
-                prev_measure_highlighted = True
-                continue
+                if element_diff and old is not None and new is not None:
+                    # before the highlight spanners go in
+                    color_measure_changes(m1, m2, (200, 0, 0), (0, 200, 0))
+                color1, color2 = (200, 0, 0), (0, 200, 0)
+            case State.MOVED:
+                #relocated content, not an edit: highlight blue
+                color1 = color2 = (0, 0, 200)
             case State.INSERTED:
-                #add measure of rest to staff1
-                m1_processed.append(_make_empty_measure())
-                measures1.insert(0, m1)
                 #highlight staff green
-                m2_processed.append(highlight_measure((0, 200, 0), m2, m2_next))
-                continue
+                color1, color2 = None, (0, 200, 0)
             case State.REMOVED:
-                #add measure of rest to staff2, 
-                m2_processed.append(_make_empty_measure())
-                measures2.insert(0, m2)
                 # highlight staff1 red
-                m1_processed.append(highlight_measure((200, 0, 0), m1, m1_next))
-                continue
-        
-    
-    
-    #remove the old measures set
-    for m1 in staff1.findall("Measure"):
-        staff1.remove(m1)
+                color1, color2 = (200, 0, 0), None
 
-    for m2 in staff2.findall("Measure"):
-        staff2.remove(m2)
-    
-    #add in all the new measures
-    assert len(m1_processed) == len(m2_processed)
-    for m1, m2 in zip(m1_processed, m2_processed):
-        staff1.append(m1)
-        staff2.append(m2)
+        m1_processed.append(m1)
+        m2_processed.append(m2)
+        #the rest standing in for a missing measure is not highlighted
+        colors1.append(color1 if old is not None else None)
+        colors2.append(color2 if new is not None else None)
+
+    highlight_runs(m1_processed, colors1)
+    highlight_runs(m2_processed, colors2)
 
-def mark_diffs(diff_score, diffs) -> None:
+    #replace the old measures set (other children keep their order, before the measures)
+    staff1[:] = [child for child in staff1 if child.tag != "Measure"] + m1_processed
+    staff2[:] = [child for child in staff2 if child.tag != "Measure"] + m2_processed
+
+def mark_diffs(staves, alignments, element_diff: bool = True) -> None:
     """
-    Create staff pairs to be sent to `mark_diffs_in_staff_pair`
-    
+    Mark the staves of the diff score, as returned by `new_merge_musescore_files`:
+    each staff pair through `mark_diffs_in_staff_pair` with its alignment (by old staff number),
+    a removed staff highlighted red and an added one green from end to end
+    """
+    for old, staff1, staff2 in staves:
+        if staff1 is None:
+            measures = staff2.findall("Measure")
+            highlight_runs(measures, [(0, 200, 0)] * len(measures))
+        elif staff2 is None:
+            measures = staff1.findall("Measure")
+            highlight_runs(measures, [(200, 0, 0)] * len(measures))
+        else:
+            mark_diffs_in_staff_pair(staff1, staff2, alignments[old], element_diff)
+
+def build_diff_score(file1: str|LoadedScore, file2: str|LoadedScore, cache: MeasureHashCache|None = None,
+                     workers: int|None = None, profiler: Profiler|None = None,
+                     element_diff: bool = True, context: int|None = None) -> tuple[ET.ElementTree, dict[int, dict[int, State]]]:
+    """
+    Diff, merge and mark two scores (paths or loaded scores).
+    Returns the diff score tree and the per-staff diffs (see `compute_diff`).
+
+    `workers` > 1 diffs the staves in a process pool (see `compute_diff`).
+    Staves are matched by instrument (see `staff_match`) and the diff score is
+    laid out from that match: each new staff next to its partner, a removed
+    staff all red, an added one all green.
+    `profiler` records the load, hash, diff, merge and mark stages (see `profiling`).
+    `element_diff` also colors the changed notes/rests inside modified measures.
+    With `context`, only the changed measures and `context` measures around
+    them are kept (see `condense`).
     """
-    staves = diff_score.findall("Staff")
-    i = 0
-    j = 1
-    while i < len(staves):
-        if (i +1) >= len(staves):
-            break
-        mark_diffs_in_staff_pair(staves[i], staves[i +1], diffs[j])
-        i += 2
-        j += 1
-
-
-def compare_musescore_files(file1_path: str, file2_path: str, output_path: str|None = None) -> str:
+    # Parse each file once, shared by the diff and merge phases
+    score1 = _load(file1, profiler)
+    score2 = _load(file2, profiler)
+
+    # Hash measures before the merge moves score1's staves into the diff score
+    match, alignments = compute_staff_alignment(score1, score2, cache=cache, workers=workers, profiler=profiler)
+
+    # Create merged score with both versions
+    with stage(profiler, "merge"):
+        diff_score_tree, _, staves = new_merge_musescore_files(score1, score2, match=match)
+    
+    # Get the score element
+    diff_root = diff_score_tree.getroot()
+    diff_score = diff_root.find("Score")
+
+    with stage(profiler, "mark", staves=len(staves),
+               measures=sum(len(alignment) for alignment in alignments.values())):
+        mark_diffs(staves, alignments, element_diff)
+    if context is not None:
+        # every measure of an added staff is inserted
+        added = [[(State.INSERTED, None, num) for num in range(1, len(score2.fingerprints.staves[new - 1]) + 1)]
+                 for new in match.added]
+        with stage(profiler, "condense", context=context) as record:
+            record["hunks"] = len(condense_diff_score(diff_score, list(alignments.values()) + added, context))
+    return diff_score_tree, {staff: alignment_diff(alignment) for staff, alignment in alignments.items()}
+
+def _load(source: str|LoadedScore, profiler: Profiler|None) -> LoadedScore:
+    # a loaded score was recorded by whoever loaded it
+    if isinstance(source, LoadedScore):
+        return source
+    with stage(profiler, "load", file=source):
+        return load_score(source)
+
+def compare_musescore_files(file1_path: str, file2_path: str, output_path: str|None = None,
+                            cache: MeasureHashCache|None = None, workers: int|None = None,
+                            profiler: Profiler|None = None, element_diff: bool = True,
+                            context: int|None = None) -> str:
     """
     Main function to compare two MuseScore files and create a diff score.
     
@@ -325,6 +377,11 @@ def compare_musescore_files(file1_path: str, file2_path: str, output_path: str|N
         file1_path: Path to the old version (score1)
         file2_path: Path to the new version (score2)
         output_path: Optional output path for the diff file
+        cache: Optional measure hash cache, skips hashing already seen files
+        workers: Number of processes used to diff staves (default: serial)
+        profiler: Optional `profiling.Profiler` recording each stage
+        element_diff: Color the changed notes/rests inside modified measures
+        context: Only keep the changes and this many measures around them
     
     Returns:
         Path to the generated diff file
@@ -334,103 +391,249 @@ def compare_musescore_files(file1_path: str, file2_path: str, output_path: str|N
         base_name = os.path.splitext(os.path.basename(file1_path))[0]
         output_path = f"diff-{base_name}.mscx"
 
-    print(f"Comparing {file1_path} and {file2_path}")
-    
-    # Create merged score with both versions
-    diff_score_tree, part_names = new_merge_musescore_files(file1_path, file2_path)
-    
-    # Get the score element
-    diff_root = diff_score_tree.getroot()
-    diff_score = diff_root.find("Score")
-    
-    diffs = compute_diff(file1_path, file2_path)
-
-    mark_diffs(diff_score, diffs)
+    logger.info("Comparing %s and %s", file1_path, file2_path)
 
+    diff_score_tree, _ = build_diff_score(file1_path, file2_path, cache=cache, workers=workers, profiler=profiler,
+                                          element_diff=element_diff, context=context)
     
     # Save the diff score
-    diff_score_tree.write(output_path, encoding="UTF-8", xml_declaration=True)
+    with stage(profiler, "write", file=output_path):
+        diff_score_tree.write(output_path, encoding="UTF-8", xml_declaration=True)
     
-    print(f"Diff score saved as: {output_path}")
+    logger.info("Diff score saved as: %s", output_path)
     return output_path
 
-def compare_mscz_files(file1_path: str, file2_path: str, output_path: str|None = None) -> str:
+def write_mscz(source: zipfile.ZipFile, diffed: dict[str, ET.ElementTree|bytes], output_path: str) -> None:
     """
-    Compare two .mscz files by extracting and processing their .mscx contents.
-
-    Should only process the main mscx file, no parts
+    Write `source` to `output_path` with the .mscx members named in `diffed`
+    replaced by the given trees (or already serialized .mscx), dropping the other .mscx members.
+    The archive is assembled in memory and other members are copied with their compression method.
     """
-    both_mscx_files = []
-
-    with tempfile.TemporaryDirectory() as work_dir: 
-        # Extract .mscx files from both .mscz files
-        for input_path in [file1_path, file2_path]:
-            
-            with zipfile.ZipFile(input_path, "r") as zip_ref:
-                zip_ref.extractall(work_dir)
-                mscx_files = [
-                    os.path.join(work_dir, f) for f in zip_ref.namelist() 
-                    if f.endswith(".mscx")
-                ]
-            both_mscx_files.append(mscx_files)
-
-        # Generate output path if not provided
-        if output_path is None:
-            base_name = os.path.splitext(os.path.basename(file1_path))[0]
-            output_path = f"diff-{base_name}.mscz"
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for info in source.infolist():
+            if info.filename in diffed:
+                zipf.writestr(info.filename, _mscx_bytes(diffed[info.filename]))
+            elif not info.filename.endswith(".mscx"):
+                copy_member(source, info, zipf)
+
+    with open(output_path, "wb") as f:
+        f.write(buffer.getbuffer())
+
+def _mscx_bytes(diffed: ET.ElementTree|bytes) -> bytes:
+    if isinstance(diffed, bytes):
+        return diffed
+    mscx = io.BytesIO()
+    diffed.write(mscx, encoding="UTF-8", xml_declaration=True)
+    return mscx.getvalue()
+
+def _diff_member(data1: bytes, data2: bytes, name1: str, name2: str, hashes: dict[str, ScoreHashes],
+                 element_diff: bool, context: int|None, memory: bool|None) -> tuple[bytes, list[dict]]:
+    """
+    Process pool task: diff two .mscx members whose fingerprints (`hashes`, by
+    content digest) the parent computed. Returns the serialized diff score
+    (trees don't pickle) and, unless `memory` is None, the stages it ran.
+    """
+    profiler = Profiler(memory=memory) if memory is not None else None
+    with stage(profiler, "load", file=name1):
+        score1 = LoadedScore.from_bytes(data1, name1)
+    with stage(profiler, "load", file=name2):
+        score2 = LoadedScore.from_bytes(data2, name2)
+    tree, _ = build_diff_score(score1, score2, cache=SharedHashes(entries=hashes), profiler=profiler,
+                               element_diff=element_diff, context=context)
+    return _mscx_bytes(tree), profiler.records if profiler is not None else []
+
+def compare_mscz_files(file1_path: str, file2_path: str, output_path: str|None = None,
+                       cache: MeasureHashCache|None = None, workers: int|None = None,
+                       profiler: Profiler|None = None, element_diff: bool = True,
+                       context: int|None = None) -> str:
+    """
+    Compare two .mscz files by processing their .mscx contents.
+
+    The .mscx members are read straight from the archives (nothing is extracted
+    to disk) and the diffed .mscx files replace them in the output archive, which
+    is assembled in memory. All other members of the first archive (META-INF,
+    thumbnails, styles, ...) are carried over with their compression method.
+
+    The main score and each part excerpt are paired by path (see `mscz.pair_members`).
+    Within a pass each distinct member content is hashed once (an excerpt left
+    untouched between the versions is hashed for one side only). With `workers`
+    > 1 the member pairs are diffed in a process pool of that size, each
+    with its staves diffed serially: the members are hashed in this process
+    first, and the tasks get their fingerprints and hand back their profiler
+    stages. Otherwise members are diffed one after the other, their staves by
+    `workers` processes (see `build_diff_score`).
+    """
+    # Generate output path if not provided
+    if output_path is None:
+        base_name = os.path.splitext(os.path.basename(file1_path))[0]
+        output_path = f"diff-{base_name}.mscz"
 
+    with zipfile.ZipFile(file1_path, "r") as zip1, zipfile.ZipFile(file2_path, "r") as zip2:
         # Process each .mscx file pair
-        output_files = []
-        for file1, file2 in zip(both_mscx_files[0], both_mscx_files[1]):
-            mscx_output = file1.replace(os.path.basename(file1), f"diff-{os.path.basename(file1)}")
-            compare_musescore_files(file1, file2, mscx_output)
-            output_files.append(mscx_output)
-            print(f"Processed: {os.path.basename(file1)}")
-
-        # Create output .mscz file
-        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for output_file in output_files:
-                arcname = os.path.relpath(output_file, os.path.dirname(output_file))
-                zipf.write(output_file, arcname)
-
-    
-    print(f"Diff .mscz file created: {output_path}")
+        diffed = {}
+        pairs = pair_mscx_members(zip1, zip2)
+        if workers is not None and workers > 1 and len(pairs) > 1:
+            shared = SharedHashes(cache)
+            with stage(profiler, "members", pairs=len(pairs), workers=workers), \
+                    ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {}
+                for info1, info2 in pairs:
+                    data1, data2 = zip1.read(info1), zip2.read(info2)
+                    hashes = {}
+                    for name, data in ((info1.filename, data1), (info2.filename, data2)):
+                        with stage(profiler, "hash", file=name):
+                            hashes[hashlib.sha256(data).hexdigest()] = shared.load_bytes(data)
+                    futures[info1.filename] = executor.submit(
+                        _diff_member, data1, data2, info1.filename, info2.filename, hashes, element_diff, context,
+                        profiler.memory if profiler is not None else None,
+                    )
+                for name, future in futures.items():
+                    diffed[name], records = future.result()
+                    if profiler is not None:
+                        # start_seconds of these records count from the start of their task
+                        profiler.add(records, member=name)
+                    logger.info("Processed: %s", name)
+        else:
+            shared = SharedHashes(cache)
+            for info1, info2 in pairs:
+                with stage(profiler, "load", file=info1.filename):
+                    score1 = LoadedScore.from_bytes(zip1.read(info1), info1.filename)
+                with stage(profiler, "load", file=info2.filename):
+                    score2 = LoadedScore.from_bytes(zip2.read(info2), info2.filename)
+                diffed[info1.filename], _ = build_diff_score(score1, score2, cache=shared, workers=workers,
+                                                             profiler=profiler, element_diff=element_diff,
+                                                             context=context)
+                logger.info("Processed: %s", info1.filename)
+
+        with stage(profiler, "write", file=output_path):
+            write_mscz(zip1, diffed, output_path)
+
+    logger.info("Diff .mscz file created: %s", output_path)
     return output_path
 
-def main():
-    """Main function to run the diff comparison."""
-    if len(sys.argv) not in [3, 4]:
-        print("Usage: python musescore_diff.py <old_score> <new_score> [output_path]")
-        print("Supports both .mscx and .mscz files")
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Visually compare two versions of a MuseScore score. Supports both .mscx and .mscz files",
+        epilog="Run with `signature <score>` first to save a score signature to compare against, "
+               "or `history <path>` for what changed in each commit of a score kept in git.",
+    )
+    parser.add_argument("old_score", help="old version, or its saved signature (.json, with --json)")
+    parser.add_argument("new_score")
+    parser.add_argument("output_path", nargs="?")
+    parser.add_argument("--cache-dir", help="measure hash cache directory (default: %(default)s)",
+                        default=default_cache_dir())
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the measure hash cache")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="processes used to diff staves (.mscz: score and part members) in parallel")
+    parser.add_argument("--json", action="store_true",
+                        help="only print which measures changed as JSON, without creating a diff score")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write a JSON trace of each stage's wall/CPU time and allocation peak to PATH")
+    parser.add_argument("--no-element-diff", action="store_true",
+                        help="only highlight modified measures, without coloring the notes/rests that changed")
+    parser.add_argument("-U", "--context", type=int, metavar="N",
+                        help="only keep the changed measures and N measures around them (changes-only output)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only log warnings and errors")
+    return parser.parse_args(argv)
+
+def _signature_main(argv) -> None:
+    parser = argparse.ArgumentParser(
+        prog="musescore-score-diff signature",
+        description="Save the measure hashes of a score, to diff later revisions against it with --json",
+    )
+    parser.add_argument("score", help=".mscx or .mscz file")
+    parser.add_argument("-o", "--output", help="signature path (default: <score>.json)")
+    parser.add_argument("--cache-dir", default=default_cache_dir(), help="measure hash cache directory (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the measure hash cache")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if not os.path.exists(args.score):
+        logger.error("Error: File %s not found", args.score)
         sys.exit(1)
+    cache = None if args.no_cache else MeasureHashCache(args.cache_dir)
+    output_path = args.output or os.path.splitext(args.score)[0] + ".json"
+    Signature.from_score(args.score, cache=cache).save(output_path)
+    logger.info("Signature saved as: %s", output_path)
 
-    file1_path = sys.argv[1]
-    file2_path = sys.argv[2]
-    output_path = sys.argv[3] if len(sys.argv) == 4 else file1_path
+def main(argv=None):
+    """
+    Main function to run the diff comparison (or `signature <score>` to save a score signature,
+    `history <path>` for the changes of a score kept in git, see `gitdriver`).
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "signature":
+        _signature_main(argv[1:])
+        return
+    if argv and argv[0] == "history":
+        # imported here, gitdriver imports this module
+        from .gitdriver import main as git_main
+        git_main(argv)
+        return
+    args = _parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(message)s")
+
+    file1_path = args.old_score
+    file2_path = args.new_score
+    output_path = args.output_path or file1_path
 
     if not os.path.exists(file1_path):
-        print(f"Error: File {file1_path} not found")
+        logger.error("Error: File %s not found", file1_path)
         sys.exit(1)
 
     if not os.path.exists(file2_path):
-        print(f"Error: File {file2_path} not found")
+        logger.error("Error: File %s not found", file2_path)
         sys.exit(1)
 
+    # the old side of a --json summary, a saved signature is loaded here
+    old_score = file1_path
+    if file1_path.endswith(SIGNATURE_SUFFIX):
+        if not args.json:
+            logger.error("Error: a signature has no measures to show, it can only be compared with --json")
+            sys.exit(1)
+        try:
+            old_score = Signature.load(file1_path)
+        except ValueError as e:
+            logger.error("Error: %s", e)
+            sys.exit(1)
+
+    cache = None if args.no_cache else MeasureHashCache(args.cache_dir)
+    profiler = Profiler(memory=True) if args.profile else None
+
+    if args.json:
+        try:
+            summary = summarize_diff(old_score, file2_path, cache=cache, workers=args.jobs, profiler=profiler)
+        except ValueError as e:
+            logger.error("Error: %s", e)
+            sys.exit(1)
+        print(json.dumps(summary, indent=2))
+        if profiler is not None:
+            profiler.write(args.profile)
+        return
+
     try:
         # Determine file type and process accordingly
         if file1_path.endswith('.mscz') and file2_path.endswith('.mscz'):
-            diff_file = compare_mscz_files(file1_path, file2_path, output_path)
+            diff_file = compare_mscz_files(file1_path, file2_path, output_path, cache=cache, workers=args.jobs,
+                                           profiler=profiler, element_diff=not args.no_element_diff,
+                                           context=args.context)
         elif file1_path.endswith('.mscx') and file2_path.endswith('.mscx'):
-            diff_file = compare_musescore_files(file1_path, file2_path, output_path)
+            diff_file = compare_musescore_files(file1_path, file2_path, output_path, cache=cache, workers=args.jobs,
+                                                profiler=profiler, element_diff=not args.no_element_diff,
+                                                context=args.context)
         else:
-            print("Error: Both files must be of the same type (.mscx or .mscz)")
+            logger.error("Error: Both files must be of the same type (.mscx or .mscz)")
             sys.exit(1)
             
-        print(f"Successfully created diff file: {diff_file}")
+        logger.info("Successfully created diff file: %s", diff_file)
+        if cache is not None:
+            logger.info("Measure hash cache: %d hits, %d misses", cache.hits, cache.misses)
+        if profiler is not None:
+            profiler.write(args.profile)
+            logger.info("Profile written to: %s", args.profile)
     except Exception as e:
-        print(f"Error creating diff: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error creating diff: %s", e)
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+"""
+Element-level diff inside a MODIFIED measure pair.
+
+Each voice is a sequence of events (chords, rests, ...) hashed like measures
+(`utils._hash_measure`, which works on any element); the voices of both measures are aligned
+by index and their event sequences diffed, a replaced event being MODIFIED.
+Inside a modified chord pair, only the notes that are not in the other chord
+are considered changed.
+
+Only measures the measure-level diff flagged MODIFIED go through this, so the
+cost follows the number of changes, not the size of the score.
+"""
+from difflib import SequenceMatcher
+
+from .utils import State, _hash_measure
+from .xmlbackend import ET
+
+# voice children that are diffed; spanner starts/ends (including our own highlights) are skipped
+IGNORED_EVENT_TAGS = ("Spanner",)
+# events that get a <color> of their own, chords are colored through their notes
+COLORED_TAGS = ("Rest", "Note")
+
+
+def _events(voice: ET.Element) -> list[ET.Element]:
+    return [child for child in voice if child.tag not in IGNORED_EVENT_TAGS]
+
+
+def _diff_sequences(elems1: list[ET.Element], elems2: list[ET.Element]) -> tuple[list[tuple[ET.Element, State]], list[tuple[ET.Element, State]]]:
+    states1, states2 = [], []
+    matcher = SequenceMatcher(None, [_hash_measure(e) for e in elems1], [_hash_measure(e) for e in elems2],
+                              autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            states1 += [(e, State.UNCHANGED) for e in elems1[i1:i2]]
+            states2 += [(e, State.UNCHANGED) for e in elems2[j1:j2]]
+            continue
+        # a replaced run is modified where the two sides overlap, the rest removed/inserted
+        paired = min(i2 - i1, j2 - j1) if op == "replace" else 0
+        states1 += [(e, State.MODIFIED if k < paired else State.REMOVED) for k, e in enumerate(elems1[i1:i2])]
+        states2 += [(e, State.MODIFIED if k < paired else State.INSERTED) for k, e in enumerate(elems2[j1:j2])]
+    return states1, states2
+
+
+def diff_measure_elements(measure1: ET.Element, measure2: ET.Element) -> tuple[list[tuple[ET.Element, State]], list[tuple[ET.Element, State]]]:
+    """
+    Per-event states of two versions of a measure, for each side a list of
+    (element, state) over all voices (events of a voice missing on the
+    other side are REMOVED / INSERTED).
+    """
+    voices1, voices2 = measure1.findall("voice"), measure2.findall("voice")
+    states1, states2 = [], []
+    for k in range(max(len(voices1), len(voices2))):
+        events1 = _events(voices1[k]) if k < len(voices1) else []
+        events2 = _events(voices2[k]) if k < len(voices2) else []
+        voice_states1, voice_states2 = _diff_sequences(events1, events2)
+        states1 += voice_states1
+        states2 += voice_states2
+    return states1, states2
+
+
+def set_color(elem: ET.Element, rgb: tuple[int, int, int]) -> None:
+    """Give `elem` a `<color>` (replacing its own), after its `<eid>` like MuseScore writes it."""
+    color = elem.find("color")
+    if color is None:
+        color = ET.Element("color")
+        elem.insert(1 if len(elem) and elem[0].tag == "eid" else 0, color)
+    color.attrib.clear()
+    color.set("r", str(rgb[0]))
+    color.set("g", str(rgb[1]))
+    color.set("b", str(rgb[2]))
+    color.set("a", "255")
+
+
+def _changed_notes(chord: ET.Element, other: ET.Element) -> list[ET.Element]:
+    """The notes of `chord` that `other` does not have (all of them if the notes are the same)."""
+    notes = chord.findall("Note")
+    other_hashes = [_hash_measure(note) for note in other.findall("Note")]
+    changed = []
+    for note in notes:
+        h = _hash_measure(note)
+        if h in other_hashes:
+            other_hashes.remove(h)
+        else:
+            changed.append(note)
+    # e.g. a duration change: the whole chord changed
+    return changed or notes
+
+
+def _color_event(elem: ET.Element, rgb: tuple[int, int, int], notes: list[ET.Element]|None = None) -> None:
+    if elem.tag == "Chord":
+        for note in notes if notes is not None else elem.findall("Note"):
+            set_color(note, rgb)
+    elif elem.tag in COLORED_TAGS:
+        set_color(elem, rgb)
+
+
+def color_measure_changes(measure1: ET.Element, measure2: ET.Element,
+                          color1: tuple[int, int, int], color2: tuple[int, int, int]) -> tuple[list[tuple[ET.Element, State]], list[tuple[ET.Element, State]]]:
+    """
+    Color the changed events of a MODIFIED measure pair: `color1` on
+    `measure1`'s modified/removed events, `color2` on `measure2`'s
+    modified/inserted ones. Returns the states of `diff_measure_elements`.
+    """
+    states1, states2 = diff_measure_elements(measure1, measure2)
+    modified1 = [elem for elem, state in states1 if state == State.MODIFIED]
+    modified2 = [elem for elem, state in states2 if state == State.MODIFIED]
+    partners = dict(zip(map(id, modified1), modified2)) | dict(zip(map(id, modified2), modified1))
+
+    for states, rgb in ((states1, color1), (states2, color2)):
+        for elem, state in states:
+            if state == State.UNCHANGED:
+                continue
+            partner = partners.get(id(elem))
+            if state == State.MODIFIED and elem.tag == "Chord" and partner is not None and partner.tag == "Chord":
+                _color_event(elem, rgb, _changed_notes(elem, partner))
+            else:
+                _color_event(elem, rgb)
+    return states1, states2
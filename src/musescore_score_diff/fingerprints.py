@@ -0,0 +1,122 @@
+"""
+Compact per-staff measure fingerprints.
+
+Each distinct measure hash of a score is stored once (`vocabulary`) and every
+staff is an `array` of 4-byte ids into it, instead of a list holding a 32-char
+hex string (and a tuple, and the measure element) per measure. Before diffing,
+`shared_ids` maps the ids of both versions into one table, so equal measures
+have equal ids and the diff engines compare small integers instead of strings.
+
+The similarity features of each distinct measure (see `similarity`) are
+computed along with its hash, so they are known however the score was read
+(parsed, streamed, or from the cache or a signature, which store them).
+"""
+from array import array
+
+from .similarity import measure_features
+from .utils import _hash_measure, stream_score_hashes
+from .xmlbackend import ET
+
+# array typecode of the measure ids (unsigned, at least 4 bytes)
+ID_TYPECODE = "I"
+
+
+class _Interner:
+    def __init__(self, vocabulary: list[str]|None = None):
+        self.vocabulary = vocabulary if vocabulary is not None else []
+        self.ids = {h: i for i, h in enumerate(self.vocabulary)}
+
+    def __call__(self, h: str) -> int:
+        i = self.ids.get(h)
+        if i is None:
+            i = self.ids[h] = len(self.vocabulary)
+            self.vocabulary.append(h)
+        return i
+
+
+class Fingerprints:
+    """
+    Measure hashes of each staff of a score, as arrays of ids into `vocabulary`,
+    and the `similarity.measure_features` of each vocabulary entry (None when
+    only the hashes are known).
+    """
+
+    def __init__(self, staves: list[array], vocabulary: list[str], features: list[frozenset[int]]|None = None):
+        self.staves = staves
+        self.vocabulary = vocabulary
+        self.features = features
+
+    @classmethod
+    def from_hashes(cls, hashes: list[list[str]], features: dict[str, list[int]]|None = None) -> "Fingerprints":
+        """From hex hashes, and the features by hash (see `feature_table`) if known."""
+        intern = _Interner()
+        staves = [array(ID_TYPECODE, map(intern, staff)) for staff in hashes]
+        if features is not None:
+            features = [frozenset(features[h]) for h in intern.vocabulary]
+        return cls(staves, intern.vocabulary, features)
+
+    @classmethod
+    def from_staves(cls, staves: list[ET.Element]) -> "Fingerprints":
+        """Hash the measures of parsed <Staff> elements (the elements are not kept)."""
+        intern = _Interner()
+        features = []
+        add_features = _feature_adder(features)
+        ids = []
+        for staff in staves:
+            ids.append(array(ID_TYPECODE))
+            for measure in staff.findall("Measure"):
+                i = intern(_hash_measure(measure))
+                ids[-1].append(i)
+                add_features(i, measure)
+        return cls(ids, intern.vocabulary, features)
+
+    @classmethod
+    def from_file(cls, source) -> tuple["Fingerprints", list[str|None]]:
+        """Stream `source` (see `utils.stream_score_hashes`), returning the fingerprints and staff keys."""
+        intern = _Interner()
+        features = []
+        staves, staff_keys = stream_score_hashes(source, intern, _feature_adder(features))
+        return cls(staves, intern.vocabulary, features), staff_keys
+
+    def __len__(self) -> int:
+        return len(self.staves)
+
+    def hashes(self) -> list[list[str]]:
+        """The hex hashes of each staff (e.g. to save them as JSON)."""
+        vocabulary = self.vocabulary
+        return [[vocabulary[i] for i in staff] for staff in self.staves]
+
+    def feature_table(self) -> dict[str, list[int]]|None:
+        """The features by hex hash (e.g. to save them as JSON), None if unknown."""
+        if self.features is None:
+            return None
+        return {h: sorted(features) for h, features in zip(self.vocabulary, self.features)}
+
+    def staff_features(self, staff: int) -> list[frozenset[int]]:
+        """The features of each measure of a staff (0-based), see `similarity.mark_similar`."""
+        features = self.features
+        return [features[i] for i in self.staves[staff]]
+
+
+def _feature_adder(features: list[frozenset[int]]):
+    # ids are handed out in order: a new id is the next entry of `features`
+    def add(i: int, measure: ET.Element) -> None:
+        if i == len(features):
+            features.append(frozenset(measure_features(measure)))
+    return add
+
+
+def shared_ids(*scores: Fingerprints) -> list[list[array]]:
+    """
+    The staves of each of `scores` with ids from a single table, so a measure
+    hash has the same id in every score. Only distinct hashes are looked up.
+    """
+    if not scores:
+        return []
+    # the first score's ids are kept as they are
+    intern = _Interner(list(scores[0].vocabulary))
+    shared = [scores[0].staves]
+    for score in scores[1:]:
+        remap = [intern(h) for h in score.vocabulary]
+        shared.append([array(ID_TYPECODE, (remap[i] for i in staff)) for staff in score.staves])
+    return shared
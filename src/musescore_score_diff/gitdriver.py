@@ -0,0 +1,258 @@
+"""
+Git integration: diff the revisions of a score kept in git without checking them out.
+
+`score_history` lists the commits that changed a score (oldest first, following
+first parents) with the blob id of the score in each, from a single `git log
+--raw`. A commit where the blob id stays the same (a mode change, ...) is
+skipped. Blobs are read through one long-lived `git cat-file --batch` process
+(`CatFile`). `diff_history` then hashes each revision once: its fingerprints
+are the new side of one commit's diff and the old side of the next one's, and
+.mscz members whose content did not change between the two are not hashed again.
+
+`python -m musescore_score_diff.gitdriver` (`history` is also a command of the main CLI):
+- `history <path> [<rev>]`: the changed measures of each commit that changed
+  the score at <path> (relative to the repository root), as JSON.
+- `textconv <file>`: one line per measure, so `git diff` shows which measures
+  changed. In .gitattributes `*.mscz diff=mscore`, then
+  `git config diff.mscore.textconv "python -m musescore_score_diff.gitdriver textconv"`.
+- `difftool <local> <remote> [<merged>]`: write a diff score for
+  `git difftool -x "python -m musescore_score_diff.gitdriver difftool"`.
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import zipfile
+
+from .cache import MeasureHashCache, default_cache_dir
+from .compute_diff import compute_staff_diff
+from .display_diff import compare_mscz_files, compare_musescore_files
+from .mscz import mscx_members, pair_members
+from .score import LoadedScore, ScoreHashes
+from .similarity import IGNORED_TAGS, event_tokens
+from .summary import identical_summary, score_hashes, summarize_members, summarize_staff_diff
+
+logger = logging.getLogger(__name__)
+
+# blob id git reports for the missing side of an added/deleted file
+_NULL_OID = "0" * 40
+
+
+class CatFile:
+    """Reads objects of the repository at `repo` through one `git cat-file --batch` process."""
+
+    def __init__(self, repo: str = "."):
+        self.process = subprocess.Popen(["git", "cat-file", "--batch"], cwd=repo,
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.reads = 0
+
+    def read(self, obj: str) -> bytes:
+        """Content of an object (a blob id, or anything `git rev-parse` takes, e.g. "HEAD:score.mscz")."""
+        self.process.stdin.write(obj.encode() + b"\n")
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().split()
+        # "<oid> <type> <size>", or "<obj> missing" / "<obj> ambiguous"
+        if len(header) != 3:
+            raise KeyError(obj)
+        data = self.process.stdout.read(int(header[2]))
+        self.process.stdout.read(1)  # the newline after the content
+        self.reads += 1
+        return data
+
+    def close(self) -> None:
+        self.process.stdin.close()
+        self.process.wait()
+        self.process.stdout.close()
+
+    def __enter__(self) -> "CatFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def score_history(repo: str, path: str, rev: str = "HEAD") -> list[tuple[str, str|None]]:
+    """
+    (commit, blob id) for each commit of `rev`'s first-parent history that
+    changed the blob at `path`, oldest first. The blob id is None where the
+    score was deleted.
+    """
+    # -z: paths are given as they are (not C-quoted) and each record ends with a NUL
+    log = subprocess.run(
+        ["git", "log", "--first-parent", "--reverse", "--no-renames", "--raw", "--no-abbrev", "-z",
+         "--format=commit %H", rev, "--", path],
+        cwd=repo, capture_output=True, encoding="utf-8", errors="surrogateescape", check=True,
+    ).stdout
+
+    history = []
+    previous = None
+    commit = None
+    records = iter(log.split("\0"))
+    for record in records:
+        record = record.lstrip("\n")
+        if record.startswith("commit "):
+            commit = record.split()[1]
+        elif record.startswith(":") and next(records, None) == path:
+            # ":<old mode> <new mode> <old blob> <new blob> <status>", then the path
+            blob = record.split()[3]
+            blob = None if blob == _NULL_OID else blob
+            if blob != previous:
+                history.append((commit, blob))
+            previous = blob
+    return history
+
+
+def _revision(data: bytes, path: str, cache: MeasureHashCache|None,
+              previous: dict[str, tuple[str, ScoreHashes]]|None = None) -> dict[str, tuple[str, ScoreHashes]]:
+    """
+    (content digest, fingerprints) of each score of a revision, by .mscx member
+    name (`path` itself for an .mscx). Members with the same content as in
+    `previous` reuse its fingerprints.
+    """
+    if path.endswith(".mscz"):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            members = {info.filename: archive.read(info) for info in mscx_members(archive)}
+    else:
+        members = {path: data}
+
+    reusable = {digest: hashes for digest, hashes in (previous or {}).values()}
+    revision = {}
+    for name, content in members.items():
+        digest = hashlib.sha256(content).hexdigest()
+        hashes = reusable.get(digest)
+        revision[name] = (digest, hashes if hashes is not None else score_hashes(content, cache))
+    return revision
+
+
+def _diff_revisions(old: dict[str, tuple[str, ScoreHashes]], new: dict[str, tuple[str, ScoreHashes]],
+                    path: str) -> dict:
+    members = {}
+    for name1, name2 in pair_members(list(old), list(new)):
+        (digest1, hashes1), (digest2, hashes2) = old[name1], new[name2]
+        if digest1 == digest2:
+            members[name1] = identical_summary(hashes1)
+        else:
+            members[name1] = summarize_staff_diff(*compute_staff_diff(hashes1, hashes2))
+    if path.endswith(".mscz"):
+        return summarize_members(members)
+    return members[path]
+
+
+def diff_history(repo: str, path: str, rev: str = "HEAD", cache: MeasureHashCache|None = None) -> dict:
+    """
+    What changed in the score at `path` (.mscx or .mscz) in each commit of
+    `rev` that changed it (see `score_history`):
+    {"path", "blobs_read", "commits": [{"commit", "blob", ...}]}, each commit
+    with the summary of its diff against the previous revision (see `summary`),
+    or "added": true / "deleted": true.
+    """
+    if not path.endswith((".mscx", ".mscz")):
+        raise ValueError("The score must be an .mscx or .mscz file")
+    commits = []
+    previous = None
+    with CatFile(repo) as cat_file:
+        for commit, blob in score_history(repo, path, rev):
+            entry = {"commit": commit, "blob": blob}
+            if blob is None:
+                entry["deleted"] = True
+                previous = None
+            else:
+                revision = _revision(cat_file.read(blob), path, cache, previous)
+                if previous is None:
+                    entry["added"] = True
+                else:
+                    entry.update(_diff_revisions(previous, revision, path))
+                previous = revision
+            commits.append(entry)
+        blobs_read = cat_file.reads
+    return {"path": path, "blobs_read": blobs_read, "commits": commits}
+
+
+def _describe_measure(measure) -> str:
+    voices = []
+    for voice in measure.findall("voice"):
+        voices.append(" ".join(
+            event_tokens(event)[0] for event in voice if event.tag not in IGNORED_TAGS
+        ))
+    return " | ".join(voices)
+
+
+def textconv(file_path: str) -> str:
+    """
+    A score as text, one "staff <s> measure <n>: <events>" line per measure
+    (prefixed with the member name in an .mscz; git passes a temporary copy of
+    the file, so its name is left out).
+    """
+    if file_path.endswith(".mscz"):
+        with zipfile.ZipFile(file_path, "r") as archive:
+            scores = {info.filename: LoadedScore.from_bytes(archive.read(info), info.filename)
+                      for info in mscx_members(archive)}
+    else:
+        scores = {None: LoadedScore.from_file(file_path)}
+
+    lines = []
+    for name, score in scores.items():
+        for s, staff in enumerate(score.staves, start=1):
+            for n, measure in enumerate(staff.findall("Measure"), start=1):
+                prefix = f"{name} " if name else ""
+                lines.append(f"{prefix}staff {s} measure {n}: {_describe_measure(measure)}")
+    return "\n".join(lines) + "\n"
+
+
+def difftool(local: str, remote: str, merged: str|None = None, output_path: str|None = None) -> str:
+    """Diff score of two checked out revisions, named after `merged` (the path in the work tree)."""
+    if output_path is None:
+        output_path = f"diff-{os.path.basename(merged or local)}"
+    if local.endswith(".mscz") and remote.endswith(".mscz"):
+        return compare_mscz_files(local, remote, output_path)
+    if local.endswith(".mscx") and remote.endswith(".mscx"):
+        return compare_musescore_files(local, remote, output_path)
+    raise ValueError("Both files must be of the same type (.mscx or .mscz)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="musescore-score-diff", description="Diff scores kept in git")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    history = commands.add_parser("history", help="changed measures of each commit that changed a score")
+    history.add_argument("path", help="path of the score in the repository")
+    history.add_argument("rev", nargs="?", default="HEAD")
+    history.add_argument("-C", "--repo", default=".", help="repository (default: current directory)")
+    history.add_argument("--cache-dir", default=default_cache_dir(), help="measure hash cache directory (default: %(default)s)")
+    history.add_argument("--no-cache", action="store_true", help="do not read or write the measure hash cache")
+
+    text = commands.add_parser("textconv", help="print a score as one line per measure (git textconv driver)")
+    text.add_argument("file")
+
+    tool = commands.add_parser("difftool", help="write a diff score of two revisions (git difftool -x)")
+    tool.add_argument("local")
+    tool.add_argument("remote")
+    tool.add_argument("merged", nargs="?")
+    tool.add_argument("-o", "--output", help="diff score path (default: diff-<merged name>)")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+
+    if args.command == "history":
+        cache = None if args.no_cache else MeasureHashCache(args.cache_dir)
+        try:
+            result = diff_history(args.repo, args.path, args.rev, cache=cache)
+        except subprocess.CalledProcessError as e:
+            logger.error("Error: %s", e.stderr.strip())
+            sys.exit(1)
+        except ValueError as e:
+            logger.error("Error: %s", e)
+            sys.exit(1)
+        print(json.dumps(result, indent=2))
+    elif args.command == "textconv":
+        sys.stdout.write(textconv(args.file))
+    else:
+        logger.info("Diff score created: %s", difftool(args.local, args.remote, args.merged, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Optional NumPy kernel for LCS table rows: the whole table of `compute_diff.lcs`
+and the rows `diff_engine.MyersEngine` regenerates when its trace grows too big.
+
+Row i+1 of the table only depends on row i: with
+t[j+1] = max(L[i][j+1], L[i][j] + (a[i] == b[j])) and t[0] = 0, row i+1 is the
+running maximum of t (L[i+1][j+1] = max(t[j+1], L[i+1][j])), so each row is a
+few vectorized operations instead of a Python loop over its cells. Hashes are
+mapped to integer ids first, so a row compares integers in one go.
+
+The table is a (n+1)x(m+1) array of the smallest integer type that fits the
+LCS length, indexed by `backtrack` like the list of lists; `next_row` gives
+one row at a time. They are used when NumPy is installed and the table has at
+least `MIN_CELLS` cells (smaller tables are faster in pure Python); set
+MUSESCORE_DIFF_NUMPY=0 to turn it off.
+"""
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ENV_VAR = "MUSESCORE_DIFF_NUMPY"
+# smallest table handed to NumPy, below that the per-row overhead dominates
+MIN_CELLS = 1 << 12
+ENABLED = np is not None and os.environ.get(ENV_VAR, "1") != "0"
+
+
+def use_numpy(n: int, m: int) -> bool:
+    """Whether the rows of an n x m table are computed with NumPy."""
+    return ENABLED and n * m >= MIN_CELLS
+
+
+def encode(seq1: list, seq2: list) -> tuple["np.ndarray", "np.ndarray"]:
+    """Both sequences as arrays of integer ids, equal items getting equal ids (needs NumPy)."""
+    ids = {}
+    a = np.fromiter((ids.setdefault(h, len(ids)) for h in seq1), dtype=np.int64, count=len(seq1))
+    b = np.fromiter((ids.setdefault(h, len(ids)) for h in seq2), dtype=np.int64, count=len(seq2))
+    return a, b
+
+
+def row_dtype(n: int, m: int) -> "np.dtype":
+    """The smallest integer type holding the LCS lengths of an n x m table."""
+    return np.dtype(np.uint16 if min(n, m) < 1 << 16 else np.int32)
+
+
+def _fill_row(prev: "np.ndarray", item: int, b: "np.ndarray", t: "np.ndarray", out: "np.ndarray") -> None:
+    # t[0] stays 0; `out` may not be `prev`
+    np.add(prev[:-1], b == item, out=t[1:], casting="unsafe")
+    np.maximum(t[1:], prev[1:], out=t[1:])
+    np.maximum.accumulate(t, out=out)
+
+
+def next_row(row: "np.ndarray", item: int, b: "np.ndarray") -> "np.ndarray":
+    """The table row after `row` for the next item of the first sequence (ids, see `encode`)."""
+    t = np.zeros_like(row)
+    _fill_row(row, item, b, t, t)
+    return t
+
+
+def lcs_table(seq1: list, seq2: list) -> "np.ndarray":
+    """The same LCS table as `compute_diff.lcs`, as a NumPy array (needs NumPy)."""
+    n, m = len(seq1), len(seq2)
+    a, b = encode(seq1, seq2)
+    dtype = row_dtype(n, m)
+    L = np.zeros((n + 1, m + 1), dtype=dtype)
+    t = np.zeros(m + 1, dtype=dtype)
+    for i in range(n):
+        _fill_row(L[i], a[i], b, t, L[i + 1])
+    return L
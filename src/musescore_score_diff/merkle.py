@@ -0,0 +1,154 @@
+"""
+Merkle fingerprint trees: score -> staff -> measure blocks -> measure hashes.
+
+Each staff's measure hashes are cut into blocks, and a block's digest covers the
+hashes in it. A staff's root covers its block digests, and the score root covers
+the staff roots. Blocks end after a measure whose hash has a CRC-32 with its
+low `BOUNDARY_BITS` bits unset, or after `MAX_BLOCK` measures. Boundaries depend on
+the content, not the position, so an insertion only changes the blocks around
+it and the blocks after it line up again.
+
+Comparing two trees:
+- equal staff roots mean identical staves, skipped in O(1);
+- otherwise `changed_ranges` matches the staves' block digests (a sequence
+  diff over blocks, not measures) and returns the measure ranges between
+  matched blocks. With `compute_diff(..., narrow=True)` only those ranges get
+  a measure-level sequence diff; the matched blocks are then kept as they are,
+  which the engine over the whole staff might not have done.
+
+A tree is JSON serializable (`save`/`load`) to be kept alongside a published
+score: comparing roots tells which staves of a new revision changed.
+"""
+import hashlib
+import json
+import zlib
+from difflib import SequenceMatcher
+
+from .cache import CACHE_VERSION
+from .fingerprints import Fingerprints
+
+TREE_FORMAT = "musescore-score-diff-merkle"
+TREE_VERSION = 1
+
+# blocks average 2**BOUNDARY_BITS measures, a run of repeated measures is cut every MAX_BLOCK
+BOUNDARY_BITS = 3
+MAX_BLOCK = 64
+# with narrowing, staves shorter than this are still diffed whole: not worth the block matching
+MIN_MEASURES = 128
+
+
+def _digest(parts: list[str]) -> str:
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def _is_boundary(h: str) -> bool:
+    return zlib.crc32(h.encode()) & ((1 << BOUNDARY_BITS) - 1) == 0
+
+
+class StaffTree:
+    """The measure blocks of a staff, as (digest, number of measures), and their root digest."""
+
+    def __init__(self, blocks: list[tuple[str, int]], root: str|None = None):
+        self.blocks = blocks
+        self.root = root if root is not None else _digest([digest for digest, _ in blocks])
+
+    @classmethod
+    def from_hashes(cls, hashes: list[str], boundaries: "list[bool]|None" = None) -> "StaffTree":
+        """Blocks of a staff's measure hashes (`boundaries[k]`: a block ends after measure k)."""
+        if boundaries is None:
+            boundaries = [_is_boundary(h) for h in hashes]
+        blocks = []
+        start = 0
+        for k in range(len(hashes)):
+            if boundaries[k] or k + 1 - start == MAX_BLOCK or k + 1 == len(hashes):
+                blocks.append((_digest(hashes[start:k + 1]), k + 1 - start))
+                start = k + 1
+        return cls(blocks)
+
+    def __len__(self) -> int:
+        """Number of measures."""
+        return sum(length for _, length in self.blocks)
+
+
+class ScoreTree:
+    """A `StaffTree` per staff, and the root digest over the staff roots."""
+
+    def __init__(self, staves: list[StaffTree], root: str|None = None):
+        self.staves = staves
+        self.root = root if root is not None else _digest([staff.root for staff in staves])
+
+    @classmethod
+    def from_fingerprints(cls, fingerprints: Fingerprints) -> "ScoreTree":
+        vocabulary = fingerprints.vocabulary
+        # each distinct hash is checked once
+        boundaries = [_is_boundary(h) for h in vocabulary]
+        return cls([
+            StaffTree.from_hashes([vocabulary[i] for i in staff], [boundaries[i] for i in staff])
+            for staff in fingerprints.staves
+        ])
+
+    @classmethod
+    def from_hashes(cls, hashes: list[list[str]]) -> "ScoreTree":
+        return cls.from_fingerprints(Fingerprints.from_hashes(hashes))
+
+    def to_dict(self) -> dict:
+        return {
+            "format": TREE_FORMAT,
+            "version": TREE_VERSION,
+            "hash_version": CACHE_VERSION,
+            "root": self.root,
+            "staves": [{"root": staff.root, "blocks": staff.blocks} for staff in self.staves],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ScoreTree":
+        if data.get("format") != TREE_FORMAT:
+            raise ValueError("Not a score fingerprint tree")
+        if data.get("version") != TREE_VERSION or data.get("hash_version") != CACHE_VERSION:
+            raise ValueError("Fingerprint tree made by another version, regenerate it")
+        staves = [StaffTree([tuple(block) for block in staff["blocks"]], staff["root"]) for staff in data["staves"]]
+        return cls(staves, data["root"])
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "ScoreTree":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def changed_staves(self, other: "ScoreTree") -> list[int]:
+        """Staff numbers (1-based) whose root differs from the staff at the same position in `other`."""
+        if self.root == other.root:
+            return []
+        return [
+            s for s in range(1, max(len(self.staves), len(other.staves)) + 1)
+            if s > len(self.staves) or s > len(other.staves) or self.staves[s - 1].root != other.staves[s - 1].root
+        ]
+
+
+def changed_ranges(tree1: StaffTree, tree2: StaffTree) -> list[tuple[int, int, int, int]]:
+    """
+    The measure ranges of two versions of a staff outside their matched blocks,
+    as (start1, end1, start2, end2): 0-based, end excluded, in staff order.
+    Empty for identical staves; one side of a range may be empty.
+    """
+    if tree1.root == tree2.root:
+        return []
+    digests1 = [digest for digest, _ in tree1.blocks]
+    digests2 = [digest for digest, _ in tree2.blocks]
+    offsets1, offsets2 = [0], [0]
+    for _, length in tree1.blocks:
+        offsets1.append(offsets1[-1] + length)
+    for _, length in tree2.blocks:
+        offsets2.append(offsets2[-1] + length)
+
+    ranges = []
+    i = j = 0
+    # the last matching block is a (len, len, 0) sentinel, closing the last range
+    for block_i, block_j, size in SequenceMatcher(None, digests1, digests2, autojunk=False).get_matching_blocks():
+        if block_i > i or block_j > j:
+            ranges.append((offsets1[i], offsets1[block_i], offsets2[j], offsets2[block_j]))
+        i, j = block_i + size, block_j + size
+    return ranges
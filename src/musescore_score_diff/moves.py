@@ -0,0 +1,135 @@
+"""
+Move detection: tell relocated measure blocks apart from edited measures.
+
+A block of measures cut from one place and pasted at another is reported by
+the sequence diff as changed measures (MODIFIED where the staves still line
+up, REMOVED/INSERTED where they don't). `find_moved_blocks` covers the new
+staff with runs of consecutive measure hashes found in the old staff (each old
+measure used once), through a dict of the old staff's runs, so it is near
+linear in the number of measures. Blocks that keep their order between the
+staves were only shifted by insertions or removals around them: the heaviest
+such chain is kept in place, the other blocks are the relocated ones.
+`mark_moves` then relabels the changed steps of a staff alignment that only
+hold found content, some of it relocated, as `State.MOVED`. A step keeps its sides: a moved measure found on one side only
+is still walked as a removed or an inserted one.
+"""
+from collections import defaultdict, deque
+
+from .utils import State
+
+# shortest run of consecutive measures treated as a moved block, single
+# measures repeat too often (rests, riffs) to be told apart from edits
+DEFAULT_MIN_LENGTH = 2
+
+
+def find_moved_blocks(hashes1: list[str], hashes2: list[str],
+                      min_length: int = DEFAULT_MIN_LENGTH) -> list[tuple[int, int, int]]:
+    """
+    Runs of at least `min_length` measures found in both staves, as
+    (old start, new start, length) with 0-based starts, in new staff order.
+    Each old measure is in at most one run; a run continuing the previous one
+    in the old staff is preferred over other occurrences.
+    """
+    n, m = len(hashes1), len(hashes2)
+    index = defaultdict(deque)
+    for i in range(n - min_length + 1):
+        index[tuple(hashes1[i:i + min_length])].append(i)
+
+    used = bytearray(n)
+    blocks = []
+    expected = 0
+    j = 0
+    while j <= m - min_length:
+        key = tuple(hashes2[j:j + min_length])
+        start = None
+        if expected <= n - min_length and not any(used[expected:expected + min_length]) \
+                and tuple(hashes1[expected:expected + min_length]) == key:
+            start = expected
+        else:
+            candidates = index.get(key, ())
+            while candidates and any(used[candidates[0]:candidates[0] + min_length]):
+                candidates.popleft()
+            if candidates:
+                start = candidates[0]
+        if start is None:
+            j += 1
+            continue
+
+        length = min_length
+        while start + length < n and j + length < m and not used[start + length] \
+                and hashes1[start + length] == hashes2[j + length]:
+            length += 1
+        used[start:start + length] = b"\x01" * length
+        blocks.append((start, j, length))
+        expected = start + length
+        j += length
+    return blocks
+
+
+def _in_order(blocks: list[tuple[int, int, int]]) -> set[int]:
+    """
+    Indexes of the heaviest chain of `blocks` (in new staff order) whose old
+    starts increase too: the content kept in order, only shifted by the
+    measures inserted or removed around it. O(k log k) through a Fenwick
+    tree of the best chain ending below each old start.
+    """
+    ranks = {start1: r for r, start1 in enumerate(sorted(start1 for start1, _, _ in blocks), start=1)}
+    tree = [(0, -1)] * (len(blocks) + 1)
+    weights, previous = [], []
+    for k, (start1, _, length) in enumerate(blocks):
+        best = (0, -1)
+        r = ranks[start1] - 1
+        while r > 0:
+            best = max(best, tree[r])
+            r -= r & -r
+        weights.append(best[0] + length)
+        previous.append(best[1])
+        r = ranks[start1]
+        while r <= len(blocks):
+            tree[r] = max(tree[r], (weights[k], k))
+            r += r & -r
+
+    chain = set()
+    k = max(range(len(blocks)), key=weights.__getitem__, default=-1)
+    while k != -1:
+        chain.add(k)
+        k = previous[k]
+    return chain
+
+
+def mark_moves(alignment: list[tuple[State, int|None, int|None]], hashes1: list[str], hashes2: list[str],
+               min_length: int = DEFAULT_MIN_LENGTH) -> list[tuple[State, int|None, int|None]]:
+    """
+    `alignment` (a staff's (state, old number, new number) steps, as returned
+    by the diff engines) with its changed steps relabelled MOVED when the
+    measures they hold are all part of a block found on both sides
+    (REMOVED: the old measure, INSERTED: the new one, MODIFIED: both), one of
+    them out of order. Blocks in the heaviest in-order chain (with the
+    UNCHANGED steps outside blocks as anchors) were only shifted, their
+    measures stay as the diff labelled them.
+    """
+    if all(state == State.UNCHANGED for state, _, _ in alignment):
+        return alignment
+    blocks = find_moved_blocks(hashes1, hashes2, min_length)
+    found1, found2 = set(), set()
+    for start1, start2, length in blocks:
+        found1.update(range(start1 + 1, start1 + length + 1))
+        found2.update(range(start2 + 1, start2 + length + 1))
+    anchors = [(old - 1, new - 1, 1) for state, old, new in alignment
+               if state == State.UNCHANGED and old not in found1 and new not in found2]
+    blocks = sorted(blocks + anchors, key=lambda block: block[1])
+    chain = _in_order(blocks)
+
+    moved1, moved2 = set(), set()
+    for k, (start1, start2, length) in enumerate(blocks):
+        if k not in chain:
+            moved1.update(range(start1 + 1, start1 + length + 1))
+            moved2.update(range(start2 + 1, start2 + length + 1))
+
+    marked = []
+    for state, old, new in alignment:
+        if state != State.UNCHANGED and (old is None or old in found1) and (new is None or new in found2) \
+                and (old in moved1 or new in moved2):
+            state = State.MOVED
+        marked.append((state, old, new))
+    return marked
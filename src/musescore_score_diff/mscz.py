@@ -0,0 +1,77 @@
+"""
+Helpers to work on .mscz archives in memory (no extraction to disk).
+"""
+import re
+import zipfile
+from collections import defaultdict, deque
+
+EXCERPTS_DIR = "Excerpts/"
+# index MuseScore puts in front of an excerpt's name, it changes when parts are reordered
+_EXCERPT_INDEX = re.compile(r"^\d+_")
+
+
+def mscx_members(archive: zipfile.ZipFile) -> list[zipfile.ZipInfo]:
+    """The .mscx members of an archive, in archive order."""
+    return [info for info in archive.infolist() if info.filename.endswith(".mscx")]
+
+
+def _excerpt_name(name: str) -> str|None:
+    """"Excerpts/0_Trumpet_in_Bb/0_Trumpet_in_Bb.mscx" -> "Trumpet_in_Bb", None for the main score."""
+    if not name.startswith(EXCERPTS_DIR):
+        return None
+    parts = name.split("/")
+    base = parts[1] if len(parts) > 2 else parts[-1].rsplit(".", 1)[0]
+    return _EXCERPT_INDEX.sub("", base)
+
+
+def pair_members(names1: list[str], names2: list[str]) -> list[tuple[str, str]]:
+    """
+    Pair up .mscx member names of two archives to be diffed, in `names1` order:
+    members with the same path, then the main scores (outside Excerpts/, the
+    file is named after the score) in order, then excerpts with the same name
+    but another index. Members without a partner are left out.
+    """
+    partners = {}
+    paths2 = set(names2)
+    unpaired2 = paths2 - set(names1)
+    for name in names1:
+        if name in paths2:
+            partners[name] = name
+
+    mains1 = [name for name in names1 if name not in partners and _excerpt_name(name) is None]
+    mains2 = [name for name in names2 if name in unpaired2 and _excerpt_name(name) is None]
+    partners.update(zip(mains1, mains2))
+
+    excerpts2 = defaultdict(deque)
+    for name in names2:
+        if name in unpaired2 and _excerpt_name(name) is not None:
+            excerpts2[_excerpt_name(name)].append(name)
+    for name in names1:
+        if name not in partners and _excerpt_name(name) is not None and excerpts2[_excerpt_name(name)]:
+            partners[name] = excerpts2[_excerpt_name(name)].popleft()
+
+    return [(name, partners[name]) for name in names1 if name in partners]
+
+
+def pair_mscx_members(archive1: zipfile.ZipFile, archive2: zipfile.ZipFile) -> list[tuple[zipfile.ZipInfo, zipfile.ZipInfo]]:
+    """Pair up the .mscx members of two archives to be diffed, see `pair_members`."""
+    names = pair_members(
+        [info.filename for info in mscx_members(archive1)],
+        [info.filename for info in mscx_members(archive2)],
+    )
+    return [(archive1.getinfo(name1), archive2.getinfo(name2)) for name1, name2 in names]
+
+
+def copy_member(src: zipfile.ZipFile, info: zipfile.ZipInfo, dst: zipfile.ZipFile) -> None:
+    """Copy a member from `src` to `dst`, keeping its name, date, attributes and compression method."""
+    dst.writestr(_copy_info(info), src.read(info))
+
+
+def _copy_info(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    new = zipfile.ZipInfo(info.filename, info.date_time)
+    new.compress_type = info.compress_type
+    new.external_attr = info.external_attr
+    new.create_system = info.create_system
+    # keep only the utf-8 name flag
+    new.flag_bits = info.flag_bits & 0x800
+    return new
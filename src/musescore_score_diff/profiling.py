@@ -0,0 +1,107 @@
+"""
+Per-stage instrumentation of the diff pipeline.
+
+Pass a `Profiler` as `profiler=` to `compare_musescore_files`,
+`compare_mscz_files`, `build_diff_score`, `compute_diff` or `summarize_diff`
+and every stage (load, hash, diff, merge, mark, write) is recorded with its
+wall time, CPU time and, with `memory=True`, its tracemalloc allocation peak,
+plus stage details (file, staff, measure counts, LCS cell counts, ...).
+A `callback` gets each record as soon as its stage ends.
+
+Stages nest (e.g. one "diff_staff" per staff inside "diff"), records are kept
+in the order the stages ended and have a `depth` and `start_seconds`.
+"""
+import contextlib
+import json
+import time
+import tracemalloc
+from typing import Callable
+
+
+class Profiler:
+    """Collects one record (a JSON-able dict) per pipeline stage."""
+
+    def __init__(self, memory: bool = False, callback: Callable[[dict], None]|None = None):
+        self.memory = memory
+        self.callback = callback
+        self.records: list[dict] = []
+        # [record, traced memory at start, highest peak seen by nested stages]
+        self._stack: list[list] = []
+        self._tracing = False
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **info):
+        """
+        Record the stage run in the `with` block. Yields the record, so the
+        block can add details it only knows at the end (e.g. counts).
+        """
+        record = {"stage": name, **info, "depth": len(self._stack)}
+        traced = 0
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing = True
+            traced, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # reset_peak below would lose the enclosing stage's peak so far
+                self._stack[-1][2] = max(self._stack[-1][2], peak)
+            tracemalloc.reset_peak()
+        frame = [record, traced, 0]
+        self._stack.append(frame)
+
+        record["start_seconds"] = round(time.perf_counter() - self._start, 6)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = round(time.perf_counter() - wall, 6)
+            record["cpu_seconds"] = round(time.process_time() - cpu, 6)
+            self._stack.pop()
+            if self.memory:
+                peak = max(tracemalloc.get_traced_memory()[1], frame[2])
+                record["peak_alloc_bytes"] = peak - traced
+                if self._stack:
+                    self._stack[-1][2] = max(self._stack[-1][2], peak)
+                elif self._tracing:
+                    tracemalloc.stop()
+                    self._tracing = False
+            self.records.append(record)
+            if self.callback is not None:
+                self.callback(record)
+
+    def add(self, records: list[dict], **info) -> None:
+        """Records of stages run elsewhere (e.g. by a worker process), nested in the current stage."""
+        depth = len(self._stack)
+        for record in records:
+            record = {**record, **info, "depth": record["depth"] + depth}
+            self.records.append(record)
+            if self.callback is not None:
+                self.callback(record)
+
+    def summary(self) -> dict[str, dict]:
+        """Totals per stage name: count, wall/CPU seconds and the highest allocation peak."""
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record["stage"], {"count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+            total["count"] += 1
+            total["wall_seconds"] = round(total["wall_seconds"] + record["wall_seconds"], 6)
+            total["cpu_seconds"] = round(total["cpu_seconds"] + record["cpu_seconds"], 6)
+            if "peak_alloc_bytes" in record:
+                total["peak_alloc_bytes"] = max(total.get("peak_alloc_bytes", 0), record["peak_alloc_bytes"])
+        return totals
+
+    def to_dict(self) -> dict:
+        return {"stages": self.records, "summary": self.summary()}
+
+    def write(self, path: str) -> None:
+        """Write the trace (`to_dict`) as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def stage(profiler: Profiler|None, name: str, **info):
+    """`profiler.stage(name, **info)`, or a no-op context (yielding a throwaway dict) without a profiler."""
+    if profiler is None:
+        return contextlib.nullcontext({})
+    return profiler.stage(name, **info)
@@ -0,0 +1,127 @@
+import hashlib
+import io
+
+from .fingerprints import Fingerprints
+from .utils import part_staff_keys
+from .xmlbackend import ET, parse
+
+
+class LoadedScore:
+    """
+    A .mscx file parsed once and shared between the diff and merge phases.
+
+    Staves, parts and the per-staff measure fingerprints are indexed up front /
+    on first use so neither phase needs to re-parse the file.
+
+    NOTE: the merge phase moves this score's staves into the diff score and the
+    mark phase edits them, so a LoadedScore should only be merged once.
+    """
+
+    def __init__(self, tree: ET.ElementTree, path: str|None = None, digest: str|None = None,
+                 name: str|None = None):
+        self.path = path
+        self.name = name or path
+        # SHA-256 of the file content, when it was loaded from memory
+        self.digest = digest
+        self.tree = tree
+        self.root = tree.getroot()
+        score = self.root.find("Score")
+        if score is None:
+            raise ValueError("No <Score> tag found in the XML.")
+        self.score = score
+        self.parts = score.findall("Part")
+        self.staves = score.findall("Staff")
+        self._fingerprints: Fingerprints|None = None
+
+    @classmethod
+    def from_file(cls, filename) -> "LoadedScore":
+        return cls(parse(filename), filename if isinstance(filename, str) else None)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, name: str|None = None) -> "LoadedScore":
+        """Parse an in-memory .mscx (e.g. read straight from an .mscz)."""
+        return cls(parse(io.BytesIO(data)), digest=hashlib.sha256(data).hexdigest(), name=name)
+
+    @property
+    def part_names(self) -> list[str]:
+        return [part.find("trackName").text for part in self.parts]
+
+    @property
+    def staff_keys(self) -> list[str|None]:
+        """Instrument identity of each staff (see `utils.part_staff_keys`), None if no part has it."""
+        keys = {}
+        for part in self.parts:
+            keys.update(part_staff_keys(part))
+        return [keys.get(staff.get("id")) for staff in self.staves]
+
+    @property
+    def fingerprints(self) -> Fingerprints:
+        """Per-staff measure hash ids (see `fingerprints`), computed once without keeping measure tuples."""
+        if self._fingerprints is None:
+            self._fingerprints = Fingerprints.from_staves(self.staves)
+        return self._fingerprints
+
+    @property
+    def hashes(self) -> list[list[str]]:
+        return self.fingerprints.hashes()
+
+    def shallow_copy(self) -> tuple[ET.ElementTree, ET.Element]:
+        """
+        Return a new tree whose root and <Score> are fresh elements holding
+        references to this score's children (no deepcopy).
+
+        Staff/Part children can then be removed/re-inserted in the copy without
+        touching this score's <Score> element. With lxml an element has a single
+        parent, so the children are moved instead and this score is left empty.
+        """
+        index = list(self.root).index(self.score)
+        root = _copy_element(self.root)
+        score = _copy_element(self.score)
+        root[index] = score
+        return ET.ElementTree(root), score
+
+
+class ScoreHashes:
+    """
+    Per-staff measure hashes of a score, without the XML tree.
+
+    Enough for `compute_diff`, which only compares hashes; they are kept as
+    `Fingerprints` (given as such, or as per-staff hash lists with the
+    features by hash, see `Fingerprints.feature_table`).
+    Without `staff_keys`, staves are matched between versions by position.
+    """
+
+    def __init__(self, hashes: "list[list[str]]|Fingerprints", path: str|None = None,
+                 staff_keys: list[str|None]|None = None, features: dict[str, list[int]]|None = None):
+        self.path = path
+        self.fingerprints = hashes if isinstance(hashes, Fingerprints) else Fingerprints.from_hashes(hashes, features)
+        self.staff_keys = staff_keys if staff_keys is not None else [None] * len(self.fingerprints)
+
+    @classmethod
+    def from_file(cls, source) -> "ScoreHashes":
+        """Hash `source` with `utils.stream_score_hashes` (bounded memory)."""
+        fingerprints, staff_keys = Fingerprints.from_file(source)
+        return cls(fingerprints, source if isinstance(source, str) else None, staff_keys)
+
+    @property
+    def hashes(self) -> list[list[str]]:
+        return self.fingerprints.hashes()
+
+    @property
+    def features(self) -> dict[str, list[int]]|None:
+        return self.fingerprints.feature_table()
+
+
+def _copy_element(elem: ET.Element) -> ET.Element:
+    new = ET.Element(elem.tag, dict(elem.attrib))
+    new.text = elem.text
+    new.tail = elem.tail
+    new.extend(list(elem))
+    return new
+
+
+def load_score(source: "str|LoadedScore") -> LoadedScore:
+    """Parse `source` unless it is already a LoadedScore."""
+    if isinstance(source, LoadedScore):
+        return source
+    return LoadedScore.from_file(source)
@@ -0,0 +1,172 @@
+"""
+Asyncio API for calling the diff from a service without blocking its event loop.
+
+`await compare_async(old, new, output_path)` runs `compare_musescore_files` /
+`compare_mscz_files` in an executor. A `DiffService` holds the executor, a
+concurrency limit (jobs waiting for a slot don't occupy the executor) and the
+jobs in flight: a request for the same pair of file contents (by SHA-256) as
+a running job waits for that job instead of diffing again, and gets a copy of
+its output when it asked for another output path.
+
+A timeout only stops waiting: a job can't be interrupted in its executor, so it
+runs to completion (keeping its slot) and its result goes to the other waiters.
+
+`python -m musescore_score_diff.service` is a stand-in server for testing: it
+reads JSON requests, one per line, on stdin ({"id", "old", "new", "output"})
+and writes one JSON response per line ({"id", "output"} or {"id", "error"})
+as each diff finishes.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import shutil
+import sys
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from .cache import MeasureHashCache, default_cache_dir, file_digest
+from .display_diff import compare_mscz_files, compare_musescore_files
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+def _compare_job(file1_path: str, file2_path: str, output_path: str|None, cache: MeasureHashCache|None) -> str:
+    """Executor task (picklable for process pools): diff two files like the CLI does."""
+    if file1_path.endswith(".mscz") and file2_path.endswith(".mscz"):
+        return compare_mscz_files(file1_path, file2_path, output_path, cache=cache)
+    if file1_path.endswith(".mscx") and file2_path.endswith(".mscx"):
+        return compare_musescore_files(file1_path, file2_path, output_path, cache=cache)
+    raise ValueError("Both files must be of the same type (.mscx or .mscz)")
+
+
+class DiffService:
+    """
+    Runs diff jobs in `executor` (the event loop's default thread pool if None),
+    at most `max_concurrency` at a time, deduplicating identical jobs in flight.
+    `timeout` is the default seconds a request waits for its job (None: no limit).
+    """
+
+    def __init__(self, executor: Executor|None = None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 timeout: float|None = None, cache: MeasureHashCache|None = None):
+        self.executor = executor
+        self.timeout = timeout
+        self.cache = cache
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._in_flight: dict[tuple[str, str], asyncio.Task] = {}
+        self.jobs = 0
+        self.deduplicated = 0
+
+    async def _run(self, file1_path: str, file2_path: str, output_path: str|None) -> str:
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            self.jobs += 1
+            return await loop.run_in_executor(
+                self.executor, _compare_job, file1_path, file2_path, output_path, self.cache
+            )
+
+    async def compare(self, file1_path: str, file2_path: str, output_path: str|None = None,
+                      timeout: float|None = None) -> str:
+        """
+        Diff two .mscx or .mscz files into `output_path` (see `compare_musescore_files`)
+        and return the output path. Raises TimeoutError past `timeout` seconds
+        (defaults to the service's timeout).
+        """
+        digest1, digest2 = await asyncio.gather(
+            asyncio.to_thread(file_digest, file1_path), asyncio.to_thread(file_digest, file2_path)
+        )
+        key = (digest1, digest2)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(file1_path, file2_path, output_path))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.deduplicated += 1
+
+        timeout = timeout if timeout is not None else self.timeout
+        # shielded: a waiter timing out or being cancelled leaves the job to the other waiters
+        result = await asyncio.wait_for(asyncio.shield(task), timeout)
+        if output_path is not None and output_path != result:
+            await asyncio.to_thread(shutil.copyfile, result, output_path)
+            return output_path
+        return result
+
+
+_default_services: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, DiffService]" = weakref.WeakKeyDictionary()
+
+
+async def compare_async(file1_path: str, file2_path: str, output_path: str|None = None,
+                        timeout: float|None = None, service: DiffService|None = None) -> str:
+    """
+    `DiffService.compare` on `service`, or on a default service of the running
+    event loop (thread pool executor, default concurrency limit, no cache).
+    """
+    if service is None:
+        loop = asyncio.get_running_loop()
+        service = _default_services.get(loop)
+        if service is None:
+            service = _default_services[loop] = DiffService()
+    return await service.compare(file1_path, file2_path, output_path, timeout=timeout)
+
+
+async def _handle(service: DiffService, line: str, write) -> None:
+    request_id = None
+    try:
+        request = json.loads(line)
+        request_id = request.get("id")
+        output = await service.compare(request["old"], request["new"], request.get("output"),
+                                       timeout=request.get("timeout"))
+        response = {"id": request_id, "output": output}
+    except Exception as e:
+        response = {"id": request_id, "error": str(e) or type(e).__name__}
+    write(response)
+
+
+async def serve_stdio(service: DiffService, stdin=None, stdout=None) -> None:
+    """Answer JSON line requests from `stdin` on `stdout` until end of input (see the module docstring)."""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+
+    def write(response: dict) -> None:
+        stdout.write(json.dumps(response) + "\n")
+        stdout.flush()
+
+    pending = set()
+    while True:
+        line = await asyncio.to_thread(stdin.readline)
+        if not line:
+            break
+        if not line.strip():
+            continue
+        task = asyncio.ensure_future(_handle(service, line, write))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*pending)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stand-in diff server: JSON requests on stdin, one per line")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="diffs run at the same time, each in its own process")
+    parser.add_argument("--timeout", type=float, help="seconds a request waits for its diff")
+    parser.add_argument("--cache-dir", default=default_cache_dir(), help="measure hash cache directory (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the measure hash cache")
+    args = parser.parse_args(argv)
+    # stdout carries the responses
+    logging.basicConfig(level=logging.WARNING, format="%(message)s", stream=sys.stderr)
+
+    async def run():
+        cache = None if args.no_cache else MeasureHashCache(args.cache_dir)
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            service = DiffService(executor, max_concurrency=args.jobs, timeout=args.timeout, cache=cache)
+            await serve_stdio(service)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
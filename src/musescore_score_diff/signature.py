@@ -0,0 +1,93 @@
+"""
+Score signatures: the per-staff measure hashes of a score, saved to a file.
+
+A signature stands in for the old side of a diff (see `compute_diff` and
+`summarize_diff`), so re-diffing edits against the same baseline only parses
+and hashes the new revision. It is a small JSON file:
+
+    {"format": "musescore-score-diff-signature", "version": 1,
+     "hash_version": <cache.CACHE_VERSION>, "source": "score.mscz",
+     "members": {"score.mscx": {"digest": <sha256>, "hashes": [[...], ...], "staff_keys": [...],
+                                  "features": {<hash>: [...], ...}}}}
+
+with one member per .mscx of an .mscz (the file name for an .mscx). The member
+digest lets a byte-identical revision be reported without parsing it.
+"""
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+from .cache import CACHE_VERSION, MeasureHashCache, file_digest
+from .mscz import mscx_members
+from .score import ScoreHashes
+
+SIGNATURE_FORMAT = "musescore-score-diff-signature"
+SIGNATURE_VERSION = 1
+SIGNATURE_SUFFIX = ".json"
+
+
+class Signature:
+    """Measure hashes (and content digest) of each .mscx member of a score."""
+
+    def __init__(self, members: dict[str, ScoreHashes], digests: dict[str, str], source: str|None = None):
+        self.members = members
+        self.digests = digests
+        self.source = source
+
+    @classmethod
+    def from_score(cls, path: str, cache: MeasureHashCache|None = None) -> "Signature":
+        """Hash an .mscx or .mscz file (streamed, or read from `cache`)."""
+        members = {}
+        digests = {}
+        if path.endswith(".mscz"):
+            with zipfile.ZipFile(path, "r") as archive:
+                for info in mscx_members(archive):
+                    data = archive.read(info)
+                    digests[info.filename] = hashlib.sha256(data).hexdigest()
+                    if cache is not None:
+                        members[info.filename] = cache.load_bytes(data)
+                    else:
+                        members[info.filename] = ScoreHashes.from_file(io.BytesIO(data))
+        else:
+            name = os.path.basename(path)
+            digests[name] = file_digest(path)
+            members[name] = cache.load(path) if cache is not None else ScoreHashes.from_file(path)
+        return cls(members, digests, os.path.basename(path))
+
+    @classmethod
+    def load(cls, path: str) -> "Signature":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != SIGNATURE_FORMAT:
+            raise ValueError(f"{path} is not a score signature")
+        if data.get("version") != SIGNATURE_VERSION or data.get("hash_version") != CACHE_VERSION:
+            raise ValueError(f"{path} was made by another version, regenerate it")
+        members = {
+            name: ScoreHashes(member["hashes"], path, member["staff_keys"], member["features"])
+            for name, member in data["members"].items()
+        }
+        digests = {name: member["digest"] for name, member in data["members"].items()}
+        return cls(members, digests, data.get("source"))
+
+    def save(self, path: str) -> None:
+        data = {
+            "format": SIGNATURE_FORMAT,
+            "version": SIGNATURE_VERSION,
+            "hash_version": CACHE_VERSION,
+            "source": self.source,
+            "members": {
+                name: {"digest": self.digests[name], "hashes": hashes.hashes, "staff_keys": hashes.staff_keys,
+                       "features": hashes.features}
+                for name, hashes in self.members.items()
+            },
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    def single(self) -> ScoreHashes:
+        """The hashes of a single-score signature (e.g. of an .mscx)."""
+        if len(self.members) != 1:
+            raise ValueError(f"Signature has {len(self.members)} scores, expected one")
+        return next(iter(self.members.values()))
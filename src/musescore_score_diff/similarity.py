@@ -0,0 +1,184 @@
+"""
+Similarity pairing: report an edited measure as MODIFIED, not REMOVED + INSERTED.
+
+The sequence diff only calls a measure MODIFIED when both versions still have
+the same measure number, so after an insertion shifts the numbering every
+edited measure becomes a REMOVED measure plus an INSERTED one.
+
+`measure_features` turns a measure into a set of shingles of its notes and
+rests. `find_similar_pairs` gives each measure a MinHash signature and indexes
+the inserted ones by bands of their signature (LSH), so a removed measure is
+only compared with the inserted measures sharing a band with it rather than
+with all of them. Candidates whose features overlap (Jaccard) at least
+`threshold` are paired, most similar first, without crossing an earlier pair:
+the pairs keep the order of both staves, like the aligned measures of a diff.
+`mark_similar` then replaces the REMOVED and the INSERTED step of each pair
+by one MODIFIED step aligning the two measures. Measures are only paired
+between the same two measures kept on both sides: a pair across one would
+reorder the staves.
+
+The features are computed once per distinct measure while the score is
+hashed (see `fingerprints.Fingerprints`) and kept with the hashes in the cache
+and in signatures, so every kind of input is paired alike.
+"""
+import bisect
+import random
+import zlib
+from collections import defaultdict
+
+from .utils import State
+from .xmlbackend import ET
+
+# minimum Jaccard similarity of the features of a removed and an inserted measure to pair them
+DEFAULT_THRESHOLD = 0.5
+# MinHash signature length, split into BANDS bands of NUM_PERM // BANDS rows: two
+# measures become candidates when a whole band matches, likely from a similarity of ~0.25 on
+NUM_PERM = 32
+BANDS = 16
+# inserted measures looked at per band of a removed measure, the nearest by number: repeated
+# content (rests, riffs) puts many measures in one bucket, this keeps the pairing near linear
+MAX_BUCKET_CANDIDATES = 16
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0)
+_COEFFICIENTS = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(NUM_PERM)]
+
+# voice children that are not musical content of the measure
+IGNORED_TAGS = ("Spanner", "eid", "linked", "linkedMain")
+
+
+def event_tokens(event: ET.Element) -> list[str]:
+    """The event itself, and for a chord each of its notes (so one changed note keeps the others)."""
+    duration = f"{event.findtext('durationType', '')}.{event.findtext('dots', '0')}"
+    if event.tag != "Chord":
+        return [f"{event.tag}:{duration}"]
+    pitches = sorted(note.findtext("pitch", "") for note in event.findall("Note"))
+    return [f"Chord:{duration}:{','.join(pitches)}"] + [f"Note:{duration}:{pitch}" for pitch in pitches]
+
+
+def measure_features(measure: ET.Element) -> set[int]:
+    """
+    Shingles of a measure's content, as 32-bit hashes: per voice, each event
+    (chord, rest, ...), each note of a chord and each pair of consecutive events.
+    """
+    tokens = []
+    for v, voice in enumerate(measure.findall("voice")):
+        previous = None
+        for event in voice:
+            if event.tag in IGNORED_TAGS:
+                continue
+            own = event_tokens(event)
+            tokens += [f"{v}|{token}" for token in own]
+            if previous is not None:
+                tokens.append(f"{v}|{previous}>{own[0]}")
+            previous = own[0]
+    return {zlib.crc32(token.encode()) for token in tokens}
+
+
+def minhash(features: set[int]) -> tuple[int, ...]:
+    """MinHash signature of a feature set (NUM_PERM values)."""
+    if not features:
+        return (_PRIME,) * NUM_PERM
+    return tuple(min((a * f + b) % _PRIME for f in features) for a, b in _COEFFICIENTS)
+
+
+def _bands(signature: tuple[int, ...]):
+    rows = NUM_PERM // BANDS
+    for band in range(BANDS):
+        yield band, signature[band * rows:(band + 1) * rows]
+
+
+def _jaccard(features1: set[int], features2: set[int]) -> float:
+    union = len(features1 | features2)
+    return len(features1 & features2) / union if union else 1.0
+
+
+def find_similar_pairs(removed: dict[int, set[int]], inserted: dict[int, set[int]],
+                       threshold: float = DEFAULT_THRESHOLD) -> list[tuple[int, int]]:
+    """
+    Pairs (old number, new number) of similar measures among the `removed`
+    and `inserted` measures (number -> `measure_features`), in staff order.
+    Each measure is in at most one pair and the pairs don't cross.
+    """
+    index = defaultdict(list)
+    for new in sorted(inserted):
+        for band in _bands(minhash(inserted[new])):
+            index[band].append(new)
+
+    candidates = []
+    for old, features in removed.items():
+        seen = set()
+        for band in _bands(minhash(features)):
+            bucket = index.get(band, ())
+            k = bisect.bisect(bucket, old)
+            half = MAX_BUCKET_CANDIDATES // 2
+            for new in bucket[max(0, k - half):k + half]:
+                if new in seen:
+                    continue
+                seen.add(new)
+                similarity = _jaccard(features, inserted[new])
+                if similarity >= threshold:
+                    # most similar first, then the closest, then in staff order
+                    candidates.append((-similarity, abs(old - new), old, new))
+    candidates.sort()
+
+    olds, news = [], []
+    for _, _, old, new in candidates:
+        k = bisect.bisect(olds, old)
+        if k and olds[k - 1] == old:
+            continue
+        # the pairs are sorted by old number, their new numbers must be sorted too
+        if (k and news[k - 1] >= new) or (k < len(news) and news[k] <= new):
+            continue
+        olds.insert(k, old)
+        news.insert(k, new)
+    return list(zip(olds, news))
+
+
+def _pair_gap(gap: list[tuple[State, int|None, int|None]], features1: list[frozenset[int]],
+              features2: list[frozenset[int]], threshold: float) -> list[tuple[State, int|None, int|None]]:
+    # the steps of a gap only have one side, the old ones and the new ones can be interleaved freely
+    removed = {old: features1[old - 1] for state, old, _ in gap if state == State.REMOVED}
+    inserted = {new: features2[new - 1] for state, _, new in gap if state == State.INSERTED}
+    if not removed or not inserted:
+        return gap
+    pairs = find_similar_pairs(removed, inserted, threshold)
+    olds = [step for step in gap if step[1] is not None]
+    news = [step for step in gap if step[2] is not None]
+    steps = []
+    k1 = k2 = 0
+    for old, new in pairs:
+        while olds[k1][1] != old:
+            steps.append(olds[k1])
+            k1 += 1
+        while news[k2][2] != new:
+            steps.append(news[k2])
+            k2 += 1
+        steps.append((State.MODIFIED, old, new))
+        k1 += 1
+        k2 += 1
+    return steps + olds[k1:] + news[k2:]
+
+
+def mark_similar(alignment: list[tuple[State, int|None, int|None]], features1: list[frozenset[int]],
+                 features2: list[frozenset[int]], threshold: float = DEFAULT_THRESHOLD) -> list[tuple[State, int|None, int|None]]:
+    """
+    `alignment` (a staff's (state, old number, new number) steps, as returned
+    by the diff engines) with each REMOVED step that pairs up with a similar
+    INSERTED step (`features1` and `features2` are the `measure_features` of
+    each measure of the staves, see `find_similar_pairs`) merged with it into
+    one MODIFIED step.
+    """
+    steps = []
+    gap = []
+    for step in alignment:
+        if step[1] is None or step[2] is None:
+            gap.append(step)
+            continue
+        if gap:
+            steps += _pair_gap(gap, features1, features2, threshold)
+            gap = []
+        steps.append(step)
+    if gap:
+        steps += _pair_gap(gap, features1, features2, threshold)
+    return steps
@@ -0,0 +1,103 @@
+"""
+Match the staves of two versions of a score.
+
+Staves are paired by instrument identity first (the staff keys of
+`utils.part_staff_keys`, in order when several staves share a key), then the
+staves left over are paired by the Jaccard similarity of their measure hash
+sets (renamed instruments, ...), best pairs first. Whatever is still unmatched
+was removed (old side) or added (new side).
+
+The similarity pass only compares staves that share at least one measure hash
+(found through an inverted index), so it stays close to linear in the number
+of measures instead of comparing every pair of staves.
+"""
+from collections import defaultdict, deque
+
+# least Jaccard similarity of the measure hash sets for two staves to be paired
+DEFAULT_THRESHOLD = 0.5
+
+
+class StaffMatch:
+    """Staff pairs (old, new) and the removed/added staves, all as 1-based staff numbers."""
+
+    def __init__(self, pairs: list[tuple[int, int]], removed: list[int], added: list[int]):
+        self.pairs = sorted(pairs)
+        self.removed = sorted(removed)
+        self.added = sorted(added)
+
+    @property
+    def positional(self) -> bool:
+        """Whether every staff is paired with the staff at the same position."""
+        return not self.removed and not self.added and all(old == new for old, new in self.pairs)
+
+    def to_dict(self) -> dict:
+        return {"pairs": self.pairs, "removed": self.removed, "added": self.added}
+
+
+def _jaccard_pairs(hashes1: list[list[str]], hashes2: list[list[str]], old: list[int], new: list[int],
+                   threshold: float) -> list[tuple[int, int]]:
+    sets1 = {i: set(hashes1[i]) for i in old}
+    sets2 = {j: set(hashes2[j]) for j in new}
+    index = defaultdict(list)
+    for j, hashes in sets2.items():
+        for h in hashes:
+            index[h].append(j)
+
+    candidates = []
+    for i, hashes in sets1.items():
+        shared = defaultdict(int)
+        for h in hashes:
+            for j in index.get(h, ()):
+                shared[j] += 1
+        for j, count in shared.items():
+            similarity = count / (len(hashes) + len(sets2[j]) - count)
+            if similarity >= threshold:
+                candidates.append((-similarity, abs(i - j), i, j))
+
+    pairs = []
+    used1, used2 = set(), set()
+    for _, _, i, j in sorted(candidates):
+        if i not in used1 and j not in used2:
+            used1.add(i)
+            used2.add(j)
+            pairs.append((i, j))
+    return pairs
+
+
+def match_staves(hashes1: list[list[str]], hashes2: list[list[str]],
+                 keys1: list[str|None]|None = None, keys2: list[str|None]|None = None,
+                 threshold: float = DEFAULT_THRESHOLD) -> StaffMatch:
+    """
+    Match the staves of two scores from their per-staff measure hashes and
+    staff keys. A staff without a key (or scores without keys at all) is
+    matched by its position instead.
+    """
+    keys1 = [key if key is not None else f"#{i}" for i, key in enumerate(keys1 or [None] * len(hashes1))]
+    keys2 = [key if key is not None else f"#{j}" for j, key in enumerate(keys2 or [None] * len(hashes2))]
+
+    by_key = defaultdict(deque)
+    for j, key in enumerate(keys2):
+        by_key[key].append(j)
+
+    pairs = []
+    unmatched1 = []
+    for i, key in enumerate(keys1):
+        if by_key[key]:
+            pairs.append((i, by_key[key].popleft()))
+        else:
+            unmatched1.append(i)
+    matched2 = {j for _, j in pairs}
+    unmatched2 = [j for j in range(len(hashes2)) if j not in matched2]
+
+    if unmatched1 and unmatched2:
+        similar = _jaccard_pairs(hashes1, hashes2, unmatched1, unmatched2, threshold)
+        pairs += similar
+        similar1, similar2 = {i for i, _ in similar}, {j for _, j in similar}
+        unmatched1 = [i for i in unmatched1 if i not in similar1]
+        unmatched2 = [j for j in unmatched2 if j not in similar2]
+
+    return StaffMatch(
+        [(i + 1, j + 1) for i, j in pairs],
+        [i + 1 for i in unmatched1],
+        [j + 1 for j in unmatched2],
+    )
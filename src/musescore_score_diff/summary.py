@@ -0,0 +1,157 @@
+"""
+Diff-only fast path: which measures changed, without building a diff score.
+
+Nothing is merged, marked or written, the inputs are only hashed (streamed,
+or read from the measure hash cache). Byte-identical inputs are not even
+parsed, and staves whose hash sequences match skip the sequence diff.
+The old side can also be a saved signature (see `signature`).
+"""
+import filecmp
+import hashlib
+import io
+import zipfile
+
+from .cache import MeasureHashCache, file_digest
+from .compute_diff import compute_staff_diff, count_states
+from .diff_engine import DiffEngine
+from .mscz import mscx_members, pair_members, pair_mscx_members
+from .profiling import Profiler, stage
+from .score import ScoreHashes
+from .signature import Signature
+from .staff_match import StaffMatch
+from .utils import State
+
+
+def summarize_staff_diff(match: StaffMatch, diffs: dict[int, dict[int, State]]) -> dict:
+    """The summary of a `compute_staff_diff` result (see `summarize_mscx`)."""
+    counts = count_states(diffs)
+    changed = counts["modified"] + counts["inserted"] + counts["removed"] + counts["moved"]
+    return {
+        "identical": changed == 0 and not match.added,
+        "changed_measures": changed,
+        "counts": counts,
+        # staves are keyed by old staff number, see `staff_match`
+        "staves": {
+            staff: {measure: state.name.lower() for measure, state in sorted(staff_diff.items())}
+            for staff, staff_diff in diffs.items()
+        },
+        "staff_pairs": {old: new for old, new in match.pairs},
+        "added_staves": match.added,
+        "removed_staves": match.removed,
+    }
+
+
+def identical_summary(hashes: ScoreHashes|None = None) -> dict:
+    """
+    The summary of two identical files, with every measure of `hashes` (their
+    fingerprints, when known) unchanged. Files that were not parsed get the
+    same keys, with zero counts and no staves.
+    """
+    staves = hashes.fingerprints.staves if hashes is not None else []
+    diffs = {s: {num: State.UNCHANGED for num in range(1, len(staff) + 1)} for s, staff in enumerate(staves, start=1)}
+    return summarize_staff_diff(StaffMatch([(s, s) for s in diffs], [], []), diffs)
+
+
+def score_hashes(data: bytes, cache: MeasureHashCache|None) -> ScoreHashes:
+    """Fingerprints of an .mscx content, streamed or read from the cache."""
+    if cache is not None:
+        return cache.load_bytes(data)
+    return ScoreHashes.from_file(io.BytesIO(data))
+
+
+def summarize_mscx(file1: str, file2: str, engine: str|DiffEngine|None = None,
+                   cache: MeasureHashCache|None = None, workers: int|None = None,
+                   profiler: Profiler|None = None) -> dict:
+    """
+    Per-staff measure states of two .mscx files plus aggregate counts:
+    {"identical", "changed_measures", "counts": {state: n}, "staves": {staff: {measure: state}}}
+    """
+    if filecmp.cmp(file1, file2, shallow=False):
+        return identical_summary()
+    match, diffs = compute_staff_diff(file1, file2, engine=engine, streaming=True, cache=cache, workers=workers,
+                                      profiler=profiler)
+    return summarize_staff_diff(match, diffs)
+
+
+def summarize_mscz(file1: str, file2: str, engine: str|DiffEngine|None = None,
+                   cache: MeasureHashCache|None = None, workers: int|None = None,
+                   profiler: Profiler|None = None) -> dict:
+    """
+    `summarize_mscx` for each paired .mscx member of two .mscz files:
+    {"identical", "changed_measures", "members": {name: summary}}
+    """
+    members = {}
+    with zipfile.ZipFile(file1, "r") as zip1, zipfile.ZipFile(file2, "r") as zip2:
+        for info1, info2 in pair_mscx_members(zip1, zip2):
+            data1 = zip1.read(info1)
+            data2 = zip2.read(info2)
+            if data1 == data2:
+                members[info1.filename] = identical_summary()
+                continue
+            with stage(profiler, "hash", file=info1.filename):
+                hashes1 = score_hashes(data1, cache)
+            with stage(profiler, "hash", file=info2.filename):
+                hashes2 = score_hashes(data2, cache)
+            members[info1.filename] = summarize_staff_diff(*compute_staff_diff(hashes1, hashes2, engine=engine,
+                                                                               workers=workers, profiler=profiler))
+
+    return summarize_members(members)
+
+
+def summarize_members(members: dict[str, dict]) -> dict:
+    """The summary of an .mscz from the summaries of its members (see `summarize_mscz`)."""
+    return {
+        "identical": all(member["identical"] for member in members.values()),
+        "changed_measures": sum(member["changed_measures"] for member in members.values()),
+        "members": members,
+    }
+
+
+def summarize_signature(signature: Signature, file2: str, engine: str|DiffEngine|None = None,
+                        cache: MeasureHashCache|None = None, workers: int|None = None,
+                        profiler: Profiler|None = None) -> dict:
+    """
+    Summary of `file2` against a signature of the old version (see
+    `signature`, `Signature.load` reads a saved one): only `file2` is hashed, and not even that if its content
+    digest matches the signature's. Same output as `summarize_mscx` for an
+    .mscx, as `summarize_mscz` for an .mscz.
+    """
+    if file2.endswith(".mscx"):
+        old = signature.single()
+        if file_digest(file2) == next(iter(signature.digests.values())):
+            return identical_summary(old)
+        return summarize_staff_diff(*compute_staff_diff(old, file2, engine=engine, streaming=True, cache=cache,
+                                                        workers=workers, profiler=profiler))
+
+    if not file2.endswith(".mscz"):
+        raise ValueError("A signature can only be compared with an .mscx or .mscz file")
+    members = {}
+    with zipfile.ZipFile(file2, "r") as zip2:
+        names2 = [info.filename for info in mscx_members(zip2)]
+        for name1, name2 in pair_members(list(signature.members), names2):
+            data2 = zip2.read(name2)
+            if hashlib.sha256(data2).hexdigest() == signature.digests[name1]:
+                members[name1] = identical_summary(signature.members[name1])
+                continue
+            with stage(profiler, "hash", file=name2):
+                hashes2 = score_hashes(data2, cache)
+            members[name1] = summarize_staff_diff(*compute_staff_diff(signature.members[name1], hashes2,
+                                                                      engine=engine, workers=workers,
+                                                                      profiler=profiler))
+    return summarize_members(members)
+
+
+def summarize_diff(file1: str|Signature, file2: str, engine: str|DiffEngine|None = None,
+                   cache: MeasureHashCache|None = None, workers: int|None = None,
+                   profiler: Profiler|None = None) -> dict:
+    """
+    Dispatch to `summarize_signature` (`file1` is a `Signature`), or to
+    `summarize_mscz` / `summarize_mscx` on the file extension.
+    """
+    if isinstance(file1, Signature):
+        return summarize_signature(file1, file2, engine=engine, cache=cache, workers=workers, profiler=profiler)
+    if file1.endswith(".mscz") and file2.endswith(".mscz"):
+        return summarize_mscz(file1, file2, engine=engine, cache=cache, workers=workers, profiler=profiler)
+    if file1.endswith(".mscx") and file2.endswith(".mscx"):
+        return summarize_mscx(file1, file2, engine=engine, cache=cache, workers=workers, profiler=profiler)
+    raise ValueError("Both files must be of the same type (.mscx or .mscz)")
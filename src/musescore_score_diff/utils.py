@@ -1,7 +1,11 @@
-import xml.etree.ElementTree as ET
 import hashlib
+import re
+from array import array
+from copy import deepcopy
 from enum import Enum
 
+from .xmlbackend import ET, LXML, iterparse, parse
+
 ALPHA_VALUE = 100
 
 class State(Enum):
@@ -9,18 +13,62 @@ class State(Enum):
     MODIFIED = 2
     INSERTED = 3
     REMOVED = 4
+    MOVED = 5
 
 # -- Compare Diff Utils --
 
+IGNORED_MEASURE_TAGS = ("eid", "linkedMain")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _escape(value: str) -> str:
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+def _write_canonical(elem: ET.Element, out: list[str]) -> None:
+    out.append("<" + elem.tag)
+    for name in sorted(elem.attrib):
+        out.append(f' {name}="{_escape(elem.attrib[name])}"')
+    out.append(">")
+    if elem.text:
+        out.append(_escape(_WHITESPACE.sub("", elem.text)))
+    for child in elem:
+        if child.tag in IGNORED_MEASURE_TAGS:
+            continue
+        _write_canonical(child, out)
+        if child.tail:
+            out.append(_escape(_WHITESPACE.sub("", child.tail)))
+    out.append("</" + elem.tag + ">")
+
+
+def canonical_measure_bytes(measure: ET.Element) -> bytes:
+    """
+    Canonical form of a measure, used for hashing (does not modify the measure).
+
+    The measure is written as XML with:
+    - every `<eid>` and `<linkedMain>` element (and its tail) left out,
+    - attributes sorted by name, written as ` name="value"`,
+    - all whitespace removed from text and tails,
+    - `&`, `<`, `>` and `"` escaped as entities in text and attribute values,
+    - every element written as `<tag ...>...</tag>` (never self-closing),
+    encoded as UTF-8.
+    e.g. `<Measure>\n <voice><Rest><eid>x</eid><durationType>measure</durationType></Rest></voice></Measure>`
+    becomes `<Measure><voice><Rest><durationType>measure</durationType></Rest></voice></Measure>`
+    """
+    out: list[str] = []
+    _write_canonical(measure, out)
+    return "".join(out).encode("utf-8")
+
+
 def _hash_measure(measure: ET.Element) -> str:
     """
     Return a stable hash of the measure's XML content.
     Allows for quick comparison
+
+    MD5 hex digest of `canonical_measure_bytes(measure)`.
     """
-    raw = ET.tostring(measure, encoding="utf-8")
-    # normalize whitespace
-    normalized = b"".join(raw.split())
-    return hashlib.md5(normalized).hexdigest()
+    return hashlib.md5(canonical_measure_bytes(measure)).hexdigest()
 
 def _sanitize_measure(measure: ET.Element) -> ET.Element:
     """ Remove all the useless (to us) junk from musescore measures"""
@@ -38,8 +86,7 @@ def _sanitize_measure(measure: ET.Element) -> ET.Element:
     return measure
 
 def get_staves(filename: str) -> list[ET.Element]:
-    parser = ET.XMLParser()
-    tree = ET.parse(filename, parser)
+    tree = parse(filename)
     root = tree.getroot()
     score = root.find("Score")
     if score is None:
@@ -50,17 +97,110 @@ def get_staves(filename: str) -> list[ET.Element]:
 
 def extract_measures(staff: ET.Element) -> list[tuple[int, str, ET.Element]]:
     """Parse uncompressed mcsx and return list of (number, hash, element)."""
-    
+    return [(i + 1, _hash_measure(m), m) for i, m in enumerate(staff.findall("Measure"))]
+
+
+def part_staff_keys(part: ET.Element) -> dict[str, str]:
+    """
+    Identity key of each staff of a <Part>, by staff id: "<instrument id>|<track name>|<n>"
+    for its n-th staff (0-based). Used to match staves between versions.
+    """
+    instrument = part.find("Instrument")
+    instrument_id = instrument.get("id", "") if instrument is not None else ""
+    name = part.findtext("trackName") or ""
+    return {staff.get("id"): f"{instrument_id}|{name}|{n}" for n, staff in enumerate(part.findall("Staff"))}
+
+
+def stream_measure_hashes(source) -> list[list[str]]:
+    """
+    Per-staff measure hashes of an .mscx file (path or binary file object),
+    read with iterparse so only the measure being hashed is kept in memory.
+
+    Gives the same hashes as `extract_measures` on the parsed file.
+    """
+    return stream_score_hashes(source)[0]
+
+
+def stream_score_hashes(source, intern=None, on_measure=None) -> tuple[list, list[str|None]]:
+    """
+    `stream_measure_hashes` plus the staff keys (see `part_staff_keys`) of the staves.
+    With `intern` (hash -> int), each staff is instead an `array("I")` of interned ids.
+    `on_measure(hash or id, measure)` is called with each measure before it is dropped.
+    """
+    if LXML:
+        return _stream_score_hashes_lxml(source, intern, on_measure)
+    staves: list = []
+    staff_ids: list[str|None] = []
+    keys: dict[str, str] = {}
+    stack: list[ET.Element] = []
+    # depth of the main <Staff> elements: museScore > Score > Staff
+    in_staff = False
+    for event, elem in iterparse(source, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            if len(stack) == 3 and elem.tag == "Staff" and stack[1].tag == "Score":
+                in_staff = True
+                staves.append([] if intern is None else array("I"))
+                staff_ids.append(elem.get("id"))
+            continue
+
+        stack.pop()
+        depth = len(stack)
+        if in_staff and depth == 3:
+            if elem.tag == "Measure":
+                h = _hash_measure(elem)
+                value = h if intern is None else intern(h)
+                staves[-1].append(value)
+                if on_measure is not None:
+                    on_measure(value, elem)
+            stack[-1].remove(elem)
+        elif depth == 2:
+            in_staff = False
+            if elem.tag == "Part" and stack[1].tag == "Score":
+                keys.update(part_staff_keys(elem))
+            stack[-1].remove(elem)
+
+    return staves, [keys.get(staff_id) for staff_id in staff_ids]
+
+
+def _is_score_child(elem: ET.Element) -> bool:
+    # museScore > Score > elem, e.g. not the <Staff> of a <Part>
+    score = elem.getparent()
+    return score is not None and score.tag == "Score" and score.getparent() is not None \
+        and score.getparent().getparent() is None
+
 
-    measures = []
-    score_measures = staff.findall("Measure")
-    for i in range(len(score_measures)):
-        m = _sanitize_measure(score_measures[i])
-        num = i+1
-        
-        h = _hash_measure(m)
-        measures.append((num, h, m))
-    return measures
+def _stream_score_hashes_lxml(source, intern=None, on_measure=None) -> tuple[list, list[str|None]]:
+    """`stream_score_hashes` with lxml: only Part/Staff/Measure events reach Python."""
+    staves: list = []
+    staff_ids: list[str|None] = []
+    keys: dict[str, str] = {}
+    for event, elem in iterparse(source, events=("start", "end"), tag=("Part", "Staff", "Measure")):
+        parent = elem.getparent()
+        if elem.tag == "Part":
+            if event == "end" and _is_score_child(elem):
+                keys.update(part_staff_keys(elem))
+        elif elem.tag == "Staff":
+            if not _is_score_child(elem):
+                continue
+            if event == "start":
+                staves.append([] if intern is None else array("I"))
+                staff_ids.append(elem.get("id"))
+            else:
+                elem.clear()
+                # drop the parts and staves already read
+                while elem.getprevious() is not None:
+                    del parent[0]
+        elif event == "end" and parent.tag == "Staff" and _is_score_child(parent):
+            h = _hash_measure(elem)
+            value = h if intern is None else intern(h)
+            staves[-1].append(value)
+            if on_measure is not None:
+                on_measure(value, elem)
+            elem.clear()
+            while elem.getprevious() is not None:
+                del parent[0]
+    return staves, [keys.get(staff_id) for staff_id in staff_ids]
 
 
 # -- Visualize Diff Utils
@@ -69,7 +209,7 @@ def _make_cutaway() -> ET.Element:
     """Create cutaway element (from your existing code)."""
     return ET.fromstring("<cutaway>1</cutaway>")
 
-def _make_empty_measure() -> ET.Element:
+def _build_empty_measure() -> ET.Element:
     measure = ET.Element("Measure")
     voice = ET.SubElement(measure, "voice")
     rest = ET.SubElement(voice, "Rest")
@@ -80,7 +220,7 @@ def _make_empty_measure() -> ET.Element:
 
     return measure
 
-def _make_highlight_begin(rgb: tuple[int, int, int], num_measures:int = 1) -> ET.Element:
+def _build_highlight_begin(rgb: tuple[int, int, int]) -> ET.Element:
     spanner = ET.Element("Spanner")
     spanner.attrib["type"] = "TextLine"
     textLine = ET.SubElement(spanner, "TextLine")
@@ -114,53 +254,76 @@ def _make_highlight_begin(rgb: tuple[int, int, int], num_measures:int = 1) -> ET
 
     nextElem = ET.SubElement(spanner, "next")
     location = ET.SubElement(nextElem, "location")
-    measures = ET.SubElement(location, "measures")
-    measures.text = f"{num_measures}"
+    ET.SubElement(location, "measures")
 
     return spanner
-    
-def _make_highlight_end(num_measures:int = 1):
+
+def _build_highlight_end() -> ET.Element:
     spanner = ET.Element("Spanner")
     spanner.attrib["type"] = "TextLine"
     prevElem = ET.SubElement(spanner, "prev")
     location = ET.SubElement(prevElem, "location")
-    measures = ET.SubElement(location, "measures")
-    measures.text = f"-{num_measures}"
+    ET.SubElement(location, "measures")
+
+    return spanner
+
+# the marked output is made of many copies of a few elements: build each once and clone it
+# (a deepcopy is cheaper than building the element again, most so with lxml)
+_EMPTY_MEASURE = _build_empty_measure()
+_HIGHLIGHT_END = _build_highlight_end()
+_HIGHLIGHT_BEGINS: dict[tuple[int, int, int], ET.Element] = {}
+
+def _make_empty_measure() -> ET.Element:
+    return deepcopy(_EMPTY_MEASURE)
 
+def _make_highlight_begin(rgb: tuple[int, int, int], num_measures:int = 1) -> ET.Element:
+    template = _HIGHLIGHT_BEGINS.get(rgb)
+    if template is None:
+        template = _HIGHLIGHT_BEGINS[rgb] = _build_highlight_begin(rgb)
+    spanner = deepcopy(template)
+    spanner.find("next/location/measures").text = f"{num_measures}"
     return spanner
 
-def _make_alt_highlight_end():
-    return ET.fromstring(
-"""
-<Spanner type="TextLine">
-    <prev>
-        <location>
-        <fractions>-1/1</fractions>
-        </location>
-        </prev>
-    </Spanner>
-"""
-    )
-
-def make_highlight_end_empty_measure():
-    m = _make_empty_measure()
-    voice = m.find("voice")
-    assert voice is not None
-    voice.insert(0, _make_highlight_end())
-    return m
-
-def highlight_measure(color: tuple[int, int, int],  measure: ET.Element, next_measure: ET.Element|None = None) -> ET.Element:
-    voice = measure.find("voice")
-    assert voice is not None
-    if voice[0].tag == "Spanner":
-        voice.insert(1, _make_highlight_end())
-    else:
-        voice.insert(0, _make_highlight_begin(color))
-
-    if next_measure is not None:
-        next_measure.find("voice").insert(0, _make_highlight_end())
-    else:
-        voice.insert(-1, _make_alt_highlight_end())
-           
-
-    return measure
\ No newline at end of file
+def _make_highlight_end(num_measures:int = 1):
+    spanner = deepcopy(_HIGHLIGHT_END)
+    spanner.find("prev/location/measures").text = f"-{num_measures}"
+    return spanner
+
+def _make_alt_highlight_end(num_measures:int = 1):
+    """End of a highlight over the last `num_measures` measures of a staff, placed before the last element."""
+    spanner = ET.Element("Spanner", type="TextLine")
+    location = ET.SubElement(ET.SubElement(spanner, "prev"), "location")
+    if num_measures > 1:
+        ET.SubElement(location, "measures").text = f"-{num_measures - 1}"
+    ET.SubElement(location, "fractions").text = "-1/1"
+    return spanner
+
+def highlight_runs(measures: list[ET.Element], colors: list["tuple[int, int, int]|None"]) -> None:
+    """
+    Highlight `measures` with the parallel list of `colors` (None: not highlighted).
+    A run of consecutive measures of the same color gets one spanner across the run,
+    begun in its first measure and ended in the measure after it (or before the
+    last element of the run when it ends the staff).
+    """
+    assert len(measures) == len(colors)
+    # highlight spanners already put at the start of each measure: an end goes before a begin
+    placed = [0] * len(measures)
+    i = 0
+    while i < len(measures):
+        color = colors[i]
+        if color is None:
+            i += 1
+            continue
+        j = i + 1
+        while j < len(measures) and colors[j] == color:
+            j += 1
+        length = j - i
+
+        measures[i].find("voice").insert(placed[i], _make_highlight_begin(color, length))
+        placed[i] += 1
+        if j < len(measures):
+            measures[j].find("voice").insert(placed[j], _make_highlight_end(length))
+            placed[j] += 1
+        else:
+            measures[j - 1].find("voice").insert(-1, _make_alt_highlight_end(length))
+        i = j
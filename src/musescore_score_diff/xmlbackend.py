@@ -0,0 +1,60 @@
+"""
+XML backend: lxml when it is installed, the standard library otherwise.
+
+`ET` is the ElementTree-compatible module every other module builds, parses and
+edits trees with (elements of the two libraries can't be mixed in one tree).
+lxml parses, serializes and deepcopies faster and lets `iterparse` filter on
+tags in C. Set MUSESCORE_DIFF_XML to "lxml" or "stdlib" to choose explicitly;
+the backend is fixed when the package is imported.
+
+Both backends give the same measure hashes (see `utils.canonical_measure_bytes`),
+so cached hashes stay valid when switching.
+"""
+import os
+import xml.etree.ElementTree as _stdlib_etree
+
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:
+    _lxml_etree = None
+
+BACKENDS = ("lxml", "stdlib")
+ENV_VAR = "MUSESCORE_DIFF_XML"
+
+
+def _choose_backend(name: str|None) -> str:
+    if not name:
+        return "lxml" if _lxml_etree is not None else "stdlib"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown XML backend {name!r} in {ENV_VAR}, expected one of {BACKENDS}")
+    if name == "lxml" and _lxml_etree is None:
+        raise ValueError(f"{ENV_VAR}=lxml but lxml is not installed")
+    return name
+
+
+BACKEND = _choose_backend(os.environ.get(ENV_VAR))
+LXML = BACKEND == "lxml"
+ET = _lxml_etree if LXML else _stdlib_etree
+
+
+def _lxml_options() -> dict:
+    # like the stdlib parser: no comments / processing instructions in the tree,
+    # and no libxml2 size limits (big scores have deep trees and long files)
+    return {"remove_comments": True, "remove_pis": True, "huge_tree": True}
+
+
+def parse(source):
+    """`ET.parse` of a path or binary file object."""
+    if LXML:
+        return ET.parse(source, ET.XMLParser(**_lxml_options()))
+    return ET.parse(source)
+
+
+def iterparse(source, events=("end",), tag=None):
+    """
+    `ET.iterparse`; with lxml, `tag` (a tag or tuple of tags) filters the
+    events in C. The stdlib backend ignores it, callers must check tags anyway.
+    """
+    if LXML:
+        return ET.iterparse(source, events=events, tag=tag, **_lxml_options())
+    return ET.iterparse(source, events=events)
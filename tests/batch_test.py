@@ -0,0 +1,61 @@
+import json
+import os
+import shutil
+
+from musescore_score_diff.batch import compare_pairs, compare_revisions, main
+from musescore_score_diff.compute_diff import compute_diff, count_states
+
+FILE1_MSCZ_PATH = "tests/fixtures/Test-Score.mscz"
+FILE2_MSCZ_PATH = "tests/fixtures/Test-Score-2.mscz"
+
+TEST_SCORE1_PATH = "tests/fixtures/single-staff/test-score/test-score.mscx"
+TEST_SCORE2_PATH = "tests/fixtures/single-staff/test-score2/test-score2.mscx"
+
+
+def test_compare_revisions_loads_each_revision_once(tmp_path):
+    revisions = [str(tmp_path / f"rev{i}.mscx") for i in range(3)]
+    for source, revision in zip([TEST_SCORE1_PATH, TEST_SCORE2_PATH, TEST_SCORE2_PATH], revisions):
+        shutil.copy(source, revision)
+    summary = compare_revisions(revisions, str(tmp_path / "out"))
+
+    assert summary["revisions_loaded"] == 3
+    assert [(r["old"], r["new"]) for r in summary["pairs"]] == [
+        (revisions[0], revisions[1]),
+        (revisions[1], revisions[2]),
+    ]
+    assert summary["pairs"][1]["changed_measures"] == 0
+    expected = count_states(compute_diff(TEST_SCORE1_PATH, TEST_SCORE2_PATH))
+    first = summary["pairs"][0]
+    assert first["states"] == expected
+    assert first["changed_measures"] == expected["modified"] + expected["inserted"] + expected["removed"]
+    for result in summary["pairs"]:
+        assert "error" not in result
+        assert os.path.exists(result["output"])
+
+
+def test_compare_pairs_in_parallel(tmp_path):
+    pairs = [(FILE1_MSCZ_PATH, FILE2_MSCZ_PATH), (FILE1_MSCZ_PATH, FILE2_MSCZ_PATH)]
+    serial = compare_pairs(pairs, str(tmp_path / "serial"))
+    parallel = compare_pairs(pairs, str(tmp_path / "parallel"), workers=2)
+
+    assert [r["states"] for r in parallel["pairs"]] == [r["states"] for r in serial["pairs"]]
+    assert parallel["revisions_loaded"] == 4
+
+
+def test_failed_pair_is_reported(tmp_path):
+    summary = compare_pairs([(TEST_SCORE1_PATH, FILE1_MSCZ_PATH), (TEST_SCORE1_PATH, TEST_SCORE2_PATH)], str(tmp_path))
+    assert "error" in summary["pairs"][0]
+    assert "error" not in summary["pairs"][1]
+
+
+def test_batch_cli_manifest(tmp_path):
+    shutil.copy(TEST_SCORE1_PATH, tmp_path / "a.mscx")
+    shutil.copy(TEST_SCORE2_PATH, tmp_path / "b.mscx")
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps([["a.mscx", "b.mscx"]]))
+
+    main(["--manifest", str(manifest), "-o", str(tmp_path / "out"), "--no-cache"])
+
+    summary = json.loads((tmp_path / "out" / "summary.json").read_text())
+    assert len(summary["pairs"]) == 1
+    assert summary["pairs"][0]["changed_measures"] > 0
@@ -0,0 +1,68 @@
+import os
+import shutil
+
+from musescore_score_diff.cache import MeasureHashCache, file_digest
+from musescore_score_diff.compute_diff import compute_diff
+from musescore_score_diff.display_diff import main
+from musescore_score_diff.xmlbackend import ET
+
+import pytest
+
+TEST_SCORE1_PATH = "tests/fixtures/single-staff/test-score/test-score.mscx"
+TEST_SCORE2_PATH = "tests/fixtures/single-staff/test-score2/test-score2.mscx"
+
+
+def test_cache_hits_skip_parsing(tmp_path, monkeypatch):
+    cache = MeasureHashCache(str(tmp_path / "cache"))
+    expected = compute_diff(TEST_SCORE1_PATH, TEST_SCORE2_PATH)
+
+    assert compute_diff(TEST_SCORE1_PATH, TEST_SCORE2_PATH, cache=cache) == expected
+    assert cache.stats() == {"hits": 0, "misses": 2}
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file parsed again")
+
+    monkeypatch.setattr(ET, "parse", fail)
+    monkeypatch.setattr(ET, "iterparse", fail)
+
+    # same content under another path is still a hit
+    copy_path = str(tmp_path / "copy.mscx")
+    shutil.copy(TEST_SCORE1_PATH, copy_path)
+    assert compute_diff(copy_path, TEST_SCORE2_PATH, cache=cache) == expected
+    assert cache.stats() == {"hits": 2, "misses": 2}
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = MeasureHashCache(str(tmp_path), max_bytes=400)  # room for two entries
+    hashes = [["0" * 32] * 3]
+    for i, digest in enumerate(["a", "b", "c"]):
+        cache.put(digest, hashes)
+        os.utime(tmp_path / f"{digest}.json", (i, i))
+        if digest == "b":
+            # touch "a" so "b" becomes the oldest
+            assert cache.get("a") == hashes
+
+    assert cache.get("a") == hashes
+    assert cache.get("b") is None
+    assert cache.get("c") == hashes
+
+
+def test_cache_ignores_other_versions(tmp_path):
+    cache = MeasureHashCache(str(tmp_path))
+    (tmp_path / "abc.json").write_text('{"version": 0, "hashes": [["x"]]}')
+    assert cache.get("abc") is None
+
+
+def test_file_digest_is_content_addressed(tmp_path):
+    copy_path = tmp_path / "copy.mscx"
+    shutil.copy(TEST_SCORE1_PATH, copy_path)
+    assert file_digest(str(copy_path)) == file_digest(TEST_SCORE1_PATH)
+    assert file_digest(TEST_SCORE1_PATH) != file_digest(TEST_SCORE2_PATH)
+
+
+@pytest.mark.parametrize("flags, entries", [([], 2), (["--no-cache"], 0)])
+def test_cli_cache_flags(tmp_path, flags, entries):
+    cache_dir = tmp_path / "cache"
+    main([TEST_SCORE1_PATH, TEST_SCORE2_PATH, str(tmp_path / "out.mscx"), "--cache-dir", str(cache_dir), *flags])
+    found = list(cache_dir.glob("*.json")) if cache_dir.exists() else []
+    assert len(found) == entries
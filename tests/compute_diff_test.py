@@ -1,7 +1,7 @@
 from musescore_score_diff.compute_diff import compute_diff
 from musescore_score_diff.utils import State
 
-from musescore_score_diff.utils import _hash_measure, _sanitize_measure
+from musescore_score_diff.utils import _hash_measure, _sanitize_measure, extract_measures
 
 import pytest
 
@@ -25,3 +25,53 @@ def test_diff_computes_correctly():
     assert res == {}
 
 
+
+
+def test_hash_measure_canonical_form():
+    import xml.etree.ElementTree as ET
+    from musescore_score_diff.utils import canonical_measure_bytes
+
+    measure = ET.fromstring(
+        '<Measure len="4/4" a="x &amp; y">\n  <eid>abc</eid>\n  <voice>\n    <Rest>'
+        '<linkedMain/><durationType>measure</durationType></Rest>\n  </voice>\n</Measure>'
+    )
+    assert canonical_measure_bytes(measure) == (
+        b'<Measure a="x &amp; y" len="4/4"><voice><Rest>'
+        b'<durationType>measure</durationType></Rest></voice></Measure>'
+    )
+    assert _hash_measure(measure) == "28868edd312499bc4997d99ebce9ee5b"
+    # hashing does not modify the measure
+    assert measure.find("eid") is not None
+
+
+def test_hashes_match_across_xml_backends():
+    import xml.etree.ElementTree as stdlib_etree
+    lxml_etree = pytest.importorskip("lxml.etree")
+    from musescore_score_diff.utils import get_staves
+
+    path = "tests/fixtures/Test-Score/Test-Score.mscx"
+    stdlib_staves = stdlib_etree.parse(path).getroot().find("Score").findall("Staff")
+    lxml_staves = lxml_etree.parse(path).getroot().find("Score").findall("Staff")
+    for stdlib_staff, lxml_staff in zip(stdlib_staves, lxml_staves, strict=True):
+        assert [h for (_, h, _) in extract_measures(stdlib_staff)] == [h for (_, h, _) in extract_measures(lxml_staff)]
+    assert len(get_staves(path)) == len(stdlib_staves)
+
+
+def test_stream_measure_hashes_matches_extract_measures():
+    from musescore_score_diff.utils import get_staves, extract_measures, stream_measure_hashes
+
+    for path in ["tests/fixtures/single-staff/test-score/test-score.mscx", "tests/fixtures/Test-Score/Test-Score.mscx"]:
+        expected = [[h for (_, h, _) in extract_measures(staff)] for staff in get_staves(path)]
+        assert stream_measure_hashes(path) == expected
+
+
+def test_streaming_compute_diff():
+    file1 = "tests/fixtures/Test-Score/Test-Score.mscx"
+    file2 = "tests/fixtures/Test-Score-2/Test-Score-2.mscx"
+    assert compute_diff(file1, file2, streaming=True) == compute_diff(file1, file2)
+
+
+def test_parallel_compute_diff_matches_serial():
+    file1 = "tests/fixtures/Test-Score/Test-Score.mscx"
+    file2 = "tests/fixtures/Test-Score-2/Test-Score-2.mscx"
+    assert compute_diff(file1, file2, workers=2) == compute_diff(file1, file2)
@@ -0,0 +1,52 @@
+from musescore_score_diff.compute_diff import compute_staff_alignment
+from musescore_score_diff.condense import condense_diff_score, hunks
+from musescore_score_diff.display_diff import build_diff_score
+from musescore_score_diff.utils import State
+from musescore_score_diff.xmlbackend import ET
+
+FILE1_UNCOMPRESSED_PATH = "tests/fixtures/Test-Score/Test-Score.mscx"
+FILE2_UNCOMPRESSED_PATH = "tests/fixtures/Test-Score-2/Test-Score-2.mscx"
+
+
+def _diff(changed: dict[int, State], length: int = 30) -> list[tuple[State, int, int]]:
+    return [(changed.get(num, State.UNCHANGED), num, num) for num in range(1, length + 1)]
+
+
+def test_hunks_merge_context_across_staves():
+    diffs = [_diff({5: State.MODIFIED}), _diff({8: State.MOVED, 20: State.REMOVED})]
+    assert hunks(diffs, 30, context=2) == [(3, 10), (18, 22)]
+    # the measure after a change is always kept, it ends the highlight
+    assert hunks(diffs, 30, context=0) == [(5, 6), (8, 9), (20, 21)]
+    assert hunks([_diff({})], 30) == []
+
+
+def _score(measures: int) -> ET.Element:
+    staff = "".join(
+        "<Measure><eid>m</eid><voice>" + ("<KeySig><eid>k</eid><concertKey>2</concertKey></KeySig>" if i == 3 else "")
+        + f"<Rest><durationType>measure</durationType><n>{i}</n></Rest></voice></Measure>"
+        for i in range(1, measures + 1)
+    )
+    return ET.fromstring(f"<Score><Staff id='1'>{staff}</Staff><Staff id='2'>{staff}</Staff></Score>")
+
+
+def test_condense_keeps_hunks_with_markers_and_signatures():
+    score = _score(20)
+    assert condense_diff_score(score, [_diff({10: State.MODIFIED}, 20)], context=1) == [(9, 11)]
+    for staff in score.findall("Staff"):
+        measures = staff.findall("Measure")
+        assert [m.findtext("voice/Rest/n") for m in measures] == ["9", "10", "11"]
+        # the key signature set in measure 3 is carried over, without its id
+        assert measures[0].find("voice/KeySig/concertKey").text == "2"
+        assert measures[0].find("voice/KeySig/eid") is None
+    top = score.find("Staff").findall("Measure")
+    assert top[0].findtext("voice/StaffText/text") == "@@ measures 9-11 @@"
+    assert top[-1].find("LayoutBreak/subtype").text == "line"
+    assert [child.tag for child in top[-1]][:2] == ["eid", "LayoutBreak"]
+
+
+def test_condensed_diff_score():
+    _, alignments = compute_staff_alignment(FILE1_UNCOMPRESSED_PATH, FILE2_UNCOMPRESSED_PATH)
+    condensed, _ = build_diff_score(FILE1_UNCOMPRESSED_PATH, FILE2_UNCOMPRESSED_PATH, context=1)
+    kept = sum(last - first + 1 for first, last in hunks(list(alignments.values()), 24, context=1))
+    for staff in condensed.getroot().find("Score").findall("Staff"):
+        assert len(staff.findall("Measure")) == kept < 24
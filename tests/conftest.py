@@ -0,0 +1,29 @@
+"""
+`--xml-backend lxml|stdlib` runs the suite under that XML backend (default:
+MUSESCORE_DIFF_XML, else lxml when installed). The backend is fixed when the
+package is imported, so one run covers one backend: `tox` runs both.
+"""
+import os
+import sys
+
+BACKENDS = ("lxml", "stdlib")
+ENV_VAR = "MUSESCORE_DIFF_XML"
+
+
+def pytest_addoption(parser):
+    parser.addoption("--xml-backend", choices=BACKENDS, help=f"XML backend to test (sets {ENV_VAR})")
+
+
+def pytest_configure(config):
+    backend = config.getoption("--xml-backend")
+    if backend is None:
+        return
+    if "musescore_score_diff.xmlbackend" in sys.modules and os.environ.get(ENV_VAR) != backend:
+        raise RuntimeError("--xml-backend is given after the package was imported")
+    os.environ[ENV_VAR] = backend
+
+
+def pytest_report_header(config):
+    from musescore_score_diff.xmlbackend import BACKEND
+
+    return f"xml backend: {BACKEND}"
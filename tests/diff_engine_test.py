@@ -0,0 +1,62 @@
+import random
+
+from musescore_score_diff.diff_engine import LCSTableEngine, MyersEngine, get_engine
+from musescore_score_diff.utils import get_staves, extract_measures
+
+import pytest
+
+TEST_SCORE1_PATH = "tests/fixtures/single-staff/test-score/test-score.mscx"
+TEST_SCORE2_PATH = "tests/fixtures/single-staff/test-score2/test-score2.mscx"
+
+
+def _as_measures(seq):
+    return [(i + 1, h, None) for i, h in enumerate(seq)]
+
+
+def _random_pair(rng):
+    alphabet = "abcd"[:rng.randint(1, 4)]
+    seq1 = [rng.choice(alphabet) for _ in range(rng.randint(0, 12))]
+    if rng.random() < 0.5:
+        return seq1, [rng.choice(alphabet) for _ in range(rng.randint(0, 12))]
+
+    seq2 = list(seq1)
+    for _ in range(rng.randint(0, 3)):
+        op = rng.random()
+        if op < 0.33 and seq2:
+            seq2.pop(rng.randrange(len(seq2)))
+        elif op < 0.66:
+            seq2.insert(rng.randint(0, len(seq2)), rng.choice(alphabet + "e"))
+        elif seq2:
+            seq2[rng.randrange(len(seq2))] = "z"
+    return seq1, seq2
+
+
+@pytest.mark.parametrize("engine", [
+    MyersEngine(),
+    MyersEngine(trace_budget=3, leaf_rows=2),  # forces the row fallback
+])
+def test_engine_matches_lcs_backtrack(engine):
+    rng = random.Random(1234)
+    reference = LCSTableEngine()
+    for _ in range(3000):
+        seq1, seq2 = _random_pair(rng)
+        m1, m2 = _as_measures(seq1), _as_measures(seq2)
+        expected = reference.diff(m1, m2)
+        res = engine.diff(m1, m2)
+        assert res == expected, f"{seq1} vs {seq2}"
+        assert list(res) == list(expected)
+
+
+def test_engine_matches_lcs_backtrack_on_fixture():
+    staff1 = get_staves(TEST_SCORE1_PATH)[0]
+    staff2 = get_staves(TEST_SCORE2_PATH)[0]
+    measures1, measures2 = extract_measures(staff1), extract_measures(staff2)
+
+    assert MyersEngine().diff(measures1, measures2) == LCSTableEngine().diff(measures1, measures2)
+
+
+def test_get_engine():
+    assert isinstance(get_engine(), MyersEngine)
+    assert isinstance(get_engine("lcs"), LCSTableEngine)
+    with pytest.raises(ValueError):
+        get_engine("nope")
@@ -1,4 +1,5 @@
 from musescore_score_diff import compare_musescore_files, compare_mscz_files
+from musescore_score_diff.profiling import Profiler
 
 from musescore_score_diff.display_diff import (
     merge_musescore_files_for_diff,
@@ -53,3 +54,150 @@ def test_mscx_single_staff_compare_visually():
 
 
 
+def test_mscz_compare_in_memory(tmp_path, monkeypatch):
+    import zipfile
+
+    def fail(*args, **kwargs):
+        raise AssertionError("archive extracted to disk")
+
+    monkeypatch.setattr(zipfile.ZipFile, "extractall", fail)
+    output_path = str(tmp_path / "diff.mscz")
+    compare_mscz_files(FILE1_MSCZ_PATH, FILE2_MSCZ_PATH, output_path)
+
+    with zipfile.ZipFile(output_path) as out, zipfile.ZipFile(FILE1_MSCZ_PATH) as src:
+        assert out.testzip() is None
+        assert out.namelist() == src.namelist()
+        for name in ["META-INF/container.xml", "Thumbnails/thumbnail.png"]:
+            assert out.read(name) == src.read(name)
+            assert out.getinfo(name).compress_size == src.getinfo(name).compress_size
+        assert b"<Spanner" in out.read("Test-Score.mscx")
+
+
+def test_mscz_members_in_parallel(tmp_path):
+    import zipfile
+
+    serial, parallel = str(tmp_path / "serial.mscz"), str(tmp_path / "parallel.mscz")
+    compare_mscz_files(FILE1_MSCZ_PATH, FILE2_MSCZ_PATH, serial)
+    profiler = Profiler()
+    compare_mscz_files(FILE1_MSCZ_PATH, FILE2_MSCZ_PATH, parallel, workers=2, profiler=profiler)
+    with zipfile.ZipFile(serial) as out1, zipfile.ZipFile(parallel) as out2:
+        assert out1.namelist() == out2.namelist()
+        for name in out1.namelist():
+            assert out1.read(name) == out2.read(name)
+    # the members are hashed here, the tasks report their own stages
+    members = [record["member"] for record in profiler.records if record["stage"] == "mark"]
+    assert sorted(members) == sorted(name for name in out1.namelist() if name.endswith(".mscx"))
+    hashed = [record["file"] for record in profiler.records if record["stage"] == "hash" and "member" not in record]
+    assert len(hashed) == 2 * len(members)
+
+
+def test_pair_members_by_path():
+    from musescore_score_diff.mscz import pair_members
+
+    names1 = ["Old.mscx", "Excerpts/0_Trumpet/0_Trumpet.mscx", "Excerpts/1_Piano/1_Piano.mscx",
+              "Excerpts/2_Drums/2_Drums.mscx"]
+    # piano part moved first, trumpet part deleted, a bass part added
+    names2 = ["New.mscx", "Excerpts/0_Piano/0_Piano.mscx", "Excerpts/1_Bass/1_Bass.mscx",
+              "Excerpts/2_Drums/2_Drums.mscx"]
+    assert pair_members(names1, names2) == [
+        ("Old.mscx", "New.mscx"),
+        ("Excerpts/1_Piano/1_Piano.mscx", "Excerpts/0_Piano/0_Piano.mscx"),
+        ("Excerpts/2_Drums/2_Drums.mscx", "Excerpts/2_Drums/2_Drums.mscx"),
+    ]
+
+
+def test_identical_members_hashed_once():
+    from musescore_score_diff.cache import SharedHashes
+    from musescore_score_diff.score import LoadedScore
+
+    shared = SharedHashes()
+    with open(TEST_SCORE1_PATH, "rb") as f:
+        data = f.read()
+    first = shared.load(LoadedScore.from_bytes(data))
+    assert shared.load(LoadedScore.from_bytes(data)) is first
+    assert shared.load_bytes(data) is first
+    assert (shared.hits, shared.misses) == (2, 1)
+
+
+def test_copy_member():
+    import io
+    import zipfile
+    from musescore_score_diff import mscz
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(FILE1_MSCZ_PATH) as src:
+        with zipfile.ZipFile(buffer, "w") as dst:
+            for name in ["META-INF/container.xml", "Thumbnails/thumbnail.png"]:
+                mscz.copy_member(src, src.getinfo(name), dst)
+            dst.writestr("after.txt", b"written after the copies")
+
+        with zipfile.ZipFile(buffer) as out:
+            assert out.testzip() is None
+            assert out.read("META-INF/container.xml") == src.read("META-INF/container.xml")
+            assert out.read("Thumbnails/thumbnail.png") == src.read("Thumbnails/thumbnail.png")
+            assert out.read("after.txt") == b"written after the copies"
+            for name in ["META-INF/container.xml", "Thumbnails/thumbnail.png"]:
+                assert out.getinfo(name).compress_type == src.getinfo(name).compress_type
+
+
+def test_mark_diffs_in_staff_pair():
+    from musescore_score_diff.xmlbackend import ET
+    from musescore_score_diff.display_diff import mark_diffs_in_staff_pair
+    from musescore_score_diff.utils import State
+
+    def staff(n):
+        s = ET.Element("Staff")
+        ET.SubElement(s, "VBox")
+        for i in range(n):
+            m = ET.SubElement(s, "Measure", num=str(i + 1))
+            ET.SubElement(ET.SubElement(m, "voice"), "Rest")
+        return s
+
+    staff1, staff2 = staff(3), staff(3)
+    alignment = [(State.UNCHANGED, 1, 1), (State.REMOVED, 2, None), (State.INSERTED, None, 2), (State.MODIFIED, 3, 3)]
+    mark_diffs_in_staff_pair(staff1, staff2, alignment)
+
+    assert staff1[0].tag == "VBox" and staff2[0].tag == "VBox"
+    measures1, measures2 = staff1.findall("Measure"), staff2.findall("Measure")
+    assert len(measures1) == len(measures2) == 4
+    # staff1: 1, 2 (removed), rest for the insert, 3 (modified)
+    assert [m.get("num") for m in measures1] == ["1", "2", None, "3"]
+    # staff2: rest, rest for the removal, 2 (inserted), 3 (modified)
+    assert [m.get("num") for m in measures2] == [None, None, "2", "3"]
+    assert measures1[1].find("voice")[0].tag == "Spanner"
+    assert measures2[3].find("voice")[0].tag == "Spanner"
+
+
+def test_mark_diffs_coalesces_runs_of_changed_measures():
+    from musescore_score_diff.xmlbackend import ET
+    from musescore_score_diff.display_diff import mark_diffs_in_staff_pair
+    from musescore_score_diff.utils import State
+
+    def staff(n):
+        s = ET.Element("Staff")
+        for i in range(n):
+            m = ET.SubElement(s, "Measure", num=str(i + 1))
+            ET.SubElement(ET.SubElement(m, "voice"), "Rest")
+        return s
+
+    def spanners(measure):
+        return [child for child in measure.find("voice") if child.tag == "Spanner"]
+
+    staff1, staff2 = staff(6), staff(6)
+    states = [State.UNCHANGED, State.MODIFIED, State.MODIFIED, State.MODIFIED, State.MOVED, State.MOVED]
+    alignment = [(state, num, num) for num, state in enumerate(states, start=1)]
+    mark_diffs_in_staff_pair(staff1, staff2, alignment, element_diff=False)
+
+    for marked in (staff1, staff2):
+        measures = marked.findall("Measure")
+        assert [len(spanners(m)) for m in measures] == [0, 1, 0, 0, 2, 1]
+        # one begin across the 3 modified measures, ended where the moved run begins
+        assert measures[1].find("voice/Spanner/next/location/measures").text == "3"
+        end, begin = spanners(measures[4])
+        assert end.find("prev/location/measures").text == "-3"
+        assert begin.find("next/location/measures").text == "2"
+        # the moved run ends the staff: ended before the last element of its last measure
+        last = spanners(measures[5])[0]
+        assert last.find("prev/location/measures").text == "-1"
+        assert last.find("prev/location/fractions").text == "-1/1"
+        assert measures[5].find("voice")[-1].tag == "Rest"
@@ -0,0 +1,84 @@
+from musescore_score_diff.display_diff import build_diff_score
+from musescore_score_diff.element_diff import color_measure_changes, diff_measure_elements, set_color
+from musescore_score_diff.utils import State
+from musescore_score_diff.xmlbackend import ET
+
+TEST_SCORE1_PATH = "tests/fixtures/single-staff/test-score/test-score.mscx"
+TEST_SCORE2_PATH = "tests/fixtures/single-staff/test-score2/test-score2.mscx"
+
+
+def _chord(*pitches, duration="quarter", eid="x") -> str:
+    notes = "".join(f"<Note><eid>{eid}{p}</eid><pitch>{p}</pitch></Note>" for p in pitches)
+    return f"<Chord><eid>{eid}</eid><durationType>{duration}</durationType>{notes}</Chord>"
+
+
+def _measure(*voices) -> ET.Element:
+    return ET.fromstring("<Measure>" + "".join(f"<voice>{''.join(v)}</voice>" for v in voices) + "</Measure>")
+
+
+REST = "<Rest><eid>r</eid><durationType>quarter</durationType></Rest>"
+
+
+def _states(states) -> list[tuple[str, State]]:
+    return [(elem.tag, state) for elem, state in states]
+
+
+def test_element_states():
+    m1 = _measure([_chord(60), _chord(64), REST, _chord(67)])
+    # chord 2 changed, the rest removed, a chord added; eids do not count
+    m2 = _measure([_chord(60, eid="y"), _chord(65), _chord(67), _chord(72)])
+    states1, states2 = diff_measure_elements(m1, m2)
+    assert _states(states1) == [
+        ("Chord", State.UNCHANGED), ("Chord", State.MODIFIED), ("Rest", State.REMOVED), ("Chord", State.UNCHANGED),
+    ]
+    assert _states(states2) == [
+        ("Chord", State.UNCHANGED), ("Chord", State.MODIFIED), ("Chord", State.UNCHANGED), ("Chord", State.INSERTED),
+    ]
+
+
+def test_extra_voice_is_inserted():
+    states1, states2 = diff_measure_elements(_measure([REST]), _measure([REST], [_chord(60)]))
+    assert _states(states1) == [("Rest", State.UNCHANGED)]
+    assert _states(states2) == [("Rest", State.UNCHANGED), ("Chord", State.INSERTED)]
+
+
+def test_only_changed_notes_are_colored():
+    m1 = _measure([_chord(60, 64, 67), REST])
+    m2 = _measure([_chord(60, 63, 67), _chord(62)])
+    color_measure_changes(m1, m2, (200, 0, 0), (0, 200, 0))
+
+    def colored(measure):
+        return [elem.findtext("pitch") or elem.tag for elem in measure.iter() if elem.find("color") is not None]
+
+    assert colored(m1) == ["64", "Rest"]
+    assert colored(m2) == ["63", "62"]
+    note = m2.find("voice/Chord/Note[pitch='63']")
+    # after the eid, like MuseScore writes it
+    assert [child.tag for child in note][:2] == ["eid", "color"]
+    assert note.find("color").attrib == {"r": "0", "g": "200", "b": "0", "a": "255"}
+
+
+def test_duration_change_colors_whole_chord():
+    m1 = _measure([_chord(60, 64)])
+    m2 = _measure([_chord(60, 64, duration="half")])
+    color_measure_changes(m1, m2, (200, 0, 0), (0, 200, 0))
+    assert len(m2.findall("voice/Chord/Note/color")) == 2
+
+
+def test_set_color_replaces_color():
+    rest = ET.fromstring(REST)
+    set_color(rest, (1, 2, 3))
+    set_color(rest, (4, 5, 6))
+    assert len(rest.findall("color")) == 1
+    assert rest.find("color").get("r") == "4"
+
+
+def test_diff_score_colors_modified_measures():
+    tree, diffs = build_diff_score(TEST_SCORE1_PATH, TEST_SCORE2_PATH)
+    assert State.MODIFIED in diffs[1].values()
+    assert tree.getroot().find(".//Measure/voice/Chord/Note/color") is not None
+
+    tree, _ = build_diff_score(TEST_SCORE1_PATH, TEST_SCORE2_PATH, element_diff=False)
+    # only the highlight spanners are colored
+    assert tree.getroot().find(".//Measure/voice/Chord/Note/color") is None
+    assert tree.getroot().find(".//Measure/voice/Rest/color") is None
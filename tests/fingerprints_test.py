@@ -0,0 +1,24 @@
+from musescore_score_diff.fingerprints import Fingerprints, shared_ids
+from musescore_score_diff.score import LoadedScore, ScoreHashes
+from musescore_score_diff.utils import extract_measures, get_staves
+
+FILE1_UNCOMPRESSED_PATH = "tests/fixtures/Test-Score/Test-Score.mscx"
+
+
+def test_distinct_hashes_stored_once():
+    fingerprints = Fingerprints.from_hashes([["a", "b", "a"], ["b", "c"]])
+    assert fingerprints.vocabulary == ["a", "b", "c"]
+    assert [list(staff) for staff in fingerprints.staves] == [[0, 1, 0], [1, 2]]
+    assert fingerprints.hashes() == [["a", "b", "a"], ["b", "c"]]
+
+
+def test_shared_ids():
+    ids1, ids2 = shared_ids(Fingerprints.from_hashes([["a", "b"]]), Fingerprints.from_hashes([["c", "b", "a"]]))
+    assert list(ids1[0]) == [0, 1]
+    assert list(ids2[0]) == [2, 1, 0]
+
+
+def test_fingerprints_match_extract_measures():
+    expected = [[h for (_, h, _) in extract_measures(staff)] for staff in get_staves(FILE1_UNCOMPRESSED_PATH)]
+    assert LoadedScore.from_file(FILE1_UNCOMPRESSED_PATH).hashes == expected
+    assert ScoreHashes.from_file(FILE1_UNCOMPRESSED_PATH).hashes == expected
@@ -0,0 +1,92 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from musescore_score_diff.gitdriver import CatFile, diff_history, difftool, score_history, textconv
+from musescore_score_diff.summary import summarize_diff
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+FILE1_MSCZ_PATH = "tests/fixtures/Test-Score.mscz"
+FILE2_MSCZ_PATH = "tests/fixtures/Test-Score-2.mscz"
+
+TEST_SCORE1_PATH = "tests/fixtures/single-staff/test-score/test-score.mscx"
+TEST_SCORE2_PATH = "tests/fixtures/single-staff/test-score2/test-score2.mscx"
+
+
+def _git(repo, *args) -> str:
+    return subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                          cwd=repo, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def _commit(repo, sources: list[str], name: str) -> list[str]:
+    """Commit each source in turn as `name`, returning the commits."""
+    commits = []
+    for source in sources:
+        shutil.copy(source, os.path.join(repo, name))
+        _git(repo, "add", name)
+        _git(repo, "commit", "-q", "--allow-empty", "-m", f"update {name}")
+        commits.append(_git(repo, "rev-parse", "HEAD"))
+    return commits
+
+
+@pytest.fixture
+def repo(tmp_path):
+    _git(tmp_path, "init", "-q")
+    return str(tmp_path)
+
+
+def test_cat_file_reads_blobs(repo):
+    _commit(repo, [TEST_SCORE1_PATH], "score.mscx")
+    with CatFile(repo) as cat_file:
+        with open(TEST_SCORE1_PATH, "rb") as f:
+            assert cat_file.read("HEAD:score.mscx") == f.read()
+        with pytest.raises(KeyError):
+            cat_file.read("HEAD:missing.mscx")
+        assert cat_file.reads == 1
+
+
+def test_history_of_a_non_ascii_path(repo):
+    commits = _commit(repo, [TEST_SCORE1_PATH, TEST_SCORE2_PATH], "Sinfonía.mscx")
+    assert [commit for commit, _ in score_history(repo, "Sinfonía.mscx")] == commits
+    assert len(diff_history(repo, "Sinfonía.mscx")["commits"]) == 2
+
+
+def test_history_of_an_mscx(repo):
+    # the third commit leaves the score as it is
+    commits = _commit(repo, [TEST_SCORE1_PATH, TEST_SCORE2_PATH, TEST_SCORE2_PATH, TEST_SCORE1_PATH], "score.mscx")
+    assert [commit for commit, _ in score_history(repo, "score.mscx")] == [commits[0], commits[1], commits[3]]
+
+    history = diff_history(repo, "score.mscx")
+    first, second, third = history["commits"]
+    assert first["added"]
+    assert history["blobs_read"] == 3
+    expected = summarize_diff(TEST_SCORE1_PATH, TEST_SCORE2_PATH)
+    assert second["changed_measures"] == expected["changed_measures"] > 0
+    assert second["counts"] == expected["counts"]
+    assert third["changed_measures"] == expected["changed_measures"]
+
+
+def test_history_of_an_mscz(repo):
+    _commit(repo, [FILE1_MSCZ_PATH, FILE2_MSCZ_PATH], "score.mscz")
+    os.remove(os.path.join(repo, "score.mscz"))
+    _git(repo, "commit", "-q", "-am", "remove the score")
+
+    commits = diff_history(repo, "score.mscz")["commits"]
+    assert [("added" in c, "deleted" in c) for c in commits] == [(True, False), (False, False), (False, True)]
+    assert commits[1]["members"].keys() == summarize_diff(FILE1_MSCZ_PATH, FILE2_MSCZ_PATH)["members"].keys()
+    assert commits[1]["changed_measures"] == summarize_diff(FILE1_MSCZ_PATH, FILE2_MSCZ_PATH)["changed_measures"]
+
+
+def test_textconv_and_difftool(tmp_path):
+    lines1 = textconv(TEST_SCORE1_PATH).splitlines()
+    lines2 = textconv(TEST_SCORE2_PATH).splitlines()
+    assert lines1[0].startswith("staff 1 measure 1: ")
+    assert lines1 != lines2
+    assert all(": " in line for line in textconv(FILE1_MSCZ_PATH).splitlines())
+
+    output = str(tmp_path / "diff.mscx")
+    assert difftool(TEST_SCORE1_PATH, TEST_SCORE2_PATH, "score.mscx", output) == output
+    assert os.path.getsize(output) > 0
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from musescore_score_diff import lcs_kernel
+from musescore_score_diff.compute_diff import backtrack, backtrack_alignment, lcs
+from musescore_score_diff.diff_engine import MyersEngine, _RowsOracle
+
+pytest.importorskip("numpy")
+
+
+def _python_lcs(seq1, seq2, monkeypatch):
+    monkeypatch.setattr(lcs_kernel, "ENABLED", False)
+    table = lcs(seq1, seq2)
+    monkeypatch.undo()
+    return table
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_numpy_table_matches_python(seed, monkeypatch):
+    rng = random.Random(seed)
+    seq1 = [str(rng.randrange(8)) for _ in range(rng.randrange(0, 120))]
+    seq2 = [h if rng.random() < 0.8 else "x" for h in seq1] + [str(rng.randrange(8)) for _ in range(rng.randrange(5))]
+    expected = _python_lcs(seq1, seq2, monkeypatch)
+    table = lcs_kernel.lcs_table(seq1, seq2)
+    assert table.tolist() == expected
+
+    m1 = [(i + 1, h, None) for i, h in enumerate(seq1)]
+    m2 = [(i + 1, h, None) for i, h in enumerate(seq2)]
+    assert backtrack(table, m1, m2) == backtrack(expected, m1, m2)
+
+
+def test_large_tables_use_numpy(monkeypatch):
+    monkeypatch.setattr(lcs_kernel, "ENABLED", True)
+    assert isinstance(lcs(["a"] * 100, ["a"] * 100), lcs_kernel.np.ndarray)
+    assert isinstance(lcs(["a"] * 3, ["a"] * 3), list)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_myers_fallback_rows_use_numpy(seed, monkeypatch):
+    rng = random.Random(seed)
+    seq1 = [str(rng.randrange(8)) for _ in range(300)]
+    seq2 = [h if rng.random() < 0.7 else "x" for h in seq1] + [str(rng.randrange(8)) for _ in range(20)]
+    m1 = [(i + 1, h, None) for i, h in enumerate(seq1)]
+    m2 = [(i + 1, h, None) for i, h in enumerate(seq2)]
+    expected = backtrack_alignment(_python_lcs(seq1, seq2, monkeypatch), m1, m2)
+
+    rows = []
+    next_row = lcs_kernel.next_row
+
+    def spy(row, item, b):
+        rows.append(row)
+        return next_row(row, item, b)
+
+    monkeypatch.setattr(lcs_kernel, "ENABLED", True)
+    monkeypatch.setattr(lcs_kernel, "next_row", spy)
+    # a tiny trace budget sends the middle to the table rows
+    assert MyersEngine(trace_budget=16).align(m1, m2) == expected
+    assert rows and all(isinstance(row, lcs_kernel.np.ndarray) for row in rows)
+
+    monkeypatch.setattr(lcs_kernel, "ENABLED", False)
+    assert MyersEngine(trace_budget=16).align(m1, m2) == expected
+    assert isinstance(_RowsOracle(seq1, seq2).length(len(seq1), len(seq2)), int)
@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+from musescore_score_diff.compute_diff import compute_diff
+from musescore_score_diff.diff_engine import MyersEngine, alignment_diff
+from musescore_score_diff.merkle import MIN_MEASURES, ScoreTree, changed_ranges
+from musescore_score_diff.score import ScoreHashes
+from musescore_score_diff.utils import State
+
+
+def _hashes(n: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [f"{rng.getrandbits(128):032x}" for _ in range(n)]
+
+
+def test_roots_and_serialization(tmp_path):
+    staff1, staff2 = _hashes(300), _hashes(200, seed=1)
+    tree = ScoreTree.from_hashes([staff1, staff2])
+    assert tree.root == ScoreTree.from_hashes([staff1, list(staff2)]).root
+    edited = ScoreTree.from_hashes([staff1, staff2[:50] + ["x"] + staff2[51:]])
+    assert edited.root != tree.root
+    assert tree.changed_staves(edited) == [2]
+    assert len(tree.staves[0]) == 300
+
+    path = str(tmp_path / "tree.json")
+    tree.save(path)
+    loaded = ScoreTree.load(path)
+    assert loaded.root == tree.root
+    assert loaded.changed_staves(edited) == [2]
+    assert changed_ranges(loaded.staves[1], edited.staves[1]) == changed_ranges(tree.staves[1], edited.staves[1])
+    with pytest.raises(ValueError):
+        ScoreTree.from_dict({"format": "something else"})
+
+
+def test_ranges_are_narrowed_around_edits():
+    old = _hashes(1000)
+    # an insertion shifts every measure after it, the blocks still line up again
+    new = old[:500] + ["inserted"] + old[500:900] + ["edited"] + old[901:]
+    tree1, tree2 = ScoreTree.from_hashes([old]), ScoreTree.from_hashes([new])
+    ranges = changed_ranges(tree1.staves[0], tree2.staves[0])
+    assert len(ranges) == 2
+    (start1, end1, start2, end2), (start3, end3, start4, end4) = ranges
+    assert start1 <= 500 < end1 and start2 <= 500 < end2 and end2 - start2 == end1 - start1 + 1
+    assert start3 <= 900 < end3 and end3 - start3 == end4 - start4
+    assert sum(end - start for start, end, _, _ in ranges) < 200
+    assert changed_ranges(tree1.staves[0], ScoreTree.from_hashes([list(old)]).staves[0]) == []
+
+
+def test_engine_only_sees_changed_ranges(monkeypatch):
+    old = _hashes(400)
+    new = old[:200] + ["edited"] + old[201:]
+    sizes = []
+    align = MyersEngine.align
+
+    def spy(self, measures1, measures2):
+        sizes.append((len(measures1), len(measures2)))
+        return align(self, measures1, measures2)
+
+    monkeypatch.setattr(MyersEngine, "align", spy)
+    states = compute_diff(ScoreHashes([old, old]), ScoreHashes([new, old]), narrow=True)
+    assert states[1] == {num: State.MODIFIED if num == 201 else State.UNCHANGED for num in range(1, 401)}
+    assert states[2] == {num: State.UNCHANGED for num in range(1, 401)}
+    # one call for the changed staff, on a few blocks around the edit
+    assert len(sizes) == 1 and sizes[0][0] < 100
+
+
+def _edited(old: list[str], rng: random.Random) -> list[str]:
+    new = list(old)
+    for _ in range(rng.randrange(1, 6)):
+        k = rng.randrange(len(new))
+        op = rng.choice(("insert", "remove", "edit", "copy"))
+        if op == "insert":
+            new.insert(k, f"inserted{rng.getrandbits(32)}")
+        elif op == "remove":
+            del new[k]
+        elif op == "edit":
+            new[k] = f"edited{rng.getrandbits(32)}"
+        else:
+            # a repeated block, which the block matching may line up elsewhere than the engine
+            new[k:k] = old[rng.randrange(len(old) - 8):][:8]
+    return new
+
+
+@pytest.mark.parametrize("n", [127, 128, 400])
+def test_diff_is_the_full_engine_diff_by_default(n):
+    rng = random.Random(n)
+    for _ in range(20):
+        old = _hashes(n, rng.getrandbits(32))
+        new = _edited(old, rng)
+        measures1 = [(k + 1, h, None) for k, h in enumerate(old)]
+        measures2 = [(k + 1, h, None) for k, h in enumerate(new)]
+        expected = alignment_diff(MyersEngine().align(measures1, measures2))
+        assert compute_diff(ScoreHashes([old]), ScoreHashes([new]), detect_moves=False)[1] == expected
+        if n < MIN_MEASURES:
+            # too short to be narrowed
+            assert compute_diff(ScoreHashes([old]), ScoreHashes([new]), detect_moves=False, narrow=True)[1] == expected
@@ -0,0 +1,80 @@
+from musescore_score_diff.compute_diff import compute_diff, compute_staff_alignment
+from musescore_score_diff.display_diff import mark_diffs_in_staff_pair
+from musescore_score_diff.moves import find_moved_blocks, mark_moves
+from musescore_score_diff.score import ScoreHashes
+from musescore_score_diff.utils import State
+from musescore_score_diff.xmlbackend import ET
+
+
+def test_find_moved_block():
+    old = list("abcdefgh")
+    # "bcd" cut and pasted after "g"
+    new = list("aefgbcdh")
+    assert find_moved_blocks(old, new) == [(4, 1, 3), (1, 4, 3)]
+
+
+def test_each_old_measure_used_once():
+    # one of two repeated choruses removed: only one is found in the new staff
+    assert find_moved_blocks(list("xyzxyz"), list("xyz")) == [(0, 0, 3)]
+    assert find_moved_blocks(list("ab"), list("ba")) == []
+
+
+def test_block_move_is_moved_not_modified():
+    old = list("abcdefgh")
+    new = list("aefgbcdh")
+    diff = compute_diff(ScoreHashes([old]), ScoreHashes([new]))[1]
+    assert set(diff[num] for num in range(2, 8)) == {State.MOVED}
+    assert compute_diff(ScoreHashes([old]), ScoreHashes([new]), detect_moves=False)[1][2] == State.MODIFIED
+
+
+def test_edits_inside_moved_range_stay_modified():
+    old = list("abcdefgh")
+    new = list("aefXbcdh")
+    diff = compute_diff(ScoreHashes([old]), ScoreHashes([new]))[1]
+    assert diff[4] == State.MODIFIED
+    assert diff[5] == State.MOVED
+
+
+def test_removed_and_inserted_block_is_moved():
+    hashes1, hashes2 = list("abcdefgh"), list("aefgbcdhij")
+    alignment = compute_staff_alignment(ScoreHashes([hashes1]), ScoreHashes([hashes2]), detect_moves=False)[1][1]
+    steps = [step for step in alignment if step[0] in (State.REMOVED, State.INSERTED)]
+    moved = mark_moves(steps, hashes1, hashes2)
+    # the inserted "ij" was not in the old staff; a moved step keeps its side
+    assert moved == [(State.INSERTED if new and new > 8 else State.MOVED, old, new) for _, old, new in steps]
+
+
+def _staff(n: int) -> ET.Element:
+    return ET.fromstring("<Staff>" + "<Measure><voice><Rest/></voice></Measure>" * n + "</Staff>")
+
+
+def test_moved_measures_are_highlighted_blue():
+    staff1, staff2 = _staff(2), _staff(2)
+    mark_diffs_in_staff_pair(staff1, staff2, [(State.MOVED, 1, 1), (State.MOVED, 2, 2)])
+    assert len(staff1.findall("Measure")) == len(staff2.findall("Measure")) == 2
+    assert staff1.find(".//Spanner//color").attrib["b"] == "200"
+
+
+def test_one_sided_moves_are_walked_on_their_side():
+    hashes1, hashes2 = list("abcde"), list("cdab")
+    alignment = compute_staff_alignment(ScoreHashes([hashes1]), ScoreHashes([hashes2]))[1][1]
+    moved, unchanged, removed = State.MOVED, State.UNCHANGED, State.REMOVED
+    assert [state for state, _, _ in alignment] == [moved, moved, unchanged, unchanged, removed, moved, moved]
+    assert alignment[0] == (moved, 1, None) and alignment[-1] == (moved, None, 4)
+    staff1, staff2 = _staff(5), _staff(4)
+    mark_diffs_in_staff_pair(staff1, staff2, alignment)
+    # every measure of each side is used once, and each side gets the other's missing measures as rests
+    assert len(staff1.findall("Measure")) == len(staff2.findall("Measure")) == len(alignment)
+
+
+def test_shifted_measures_are_not_moved():
+    # one measure inserted, one edited and one removed, nothing relocated
+    for n in (127, 128):
+        old = [f"m{i}" for i in range(n)]
+        new = old[:58] + ["inserted"] + old[58:]
+        new[80] = "edited"
+        del new[98]
+        moved = compute_diff(ScoreHashes([old]), ScoreHashes([new]))[1]
+        unmarked = compute_diff(ScoreHashes([old]), ScoreHashes([new]), detect_moves=False)[1]
+        assert State.MOVED not in moved.values()
+        assert moved == unmarked
@@ -0,0 +1,69 @@
+import json
+
+from musescore_score_diff import display_diff
+from musescore_score_diff.display_diff import compare_mscz_files, compare_musescore_files
+from musescore_score_diff.profiling import Profiler
+
+FILE1_MSCZ_PATH = "tests/fixtures/Test-Score.mscz"
+FILE2_MSCZ_PATH = "tests/fixtures/Test-Score-2.mscz"
+
+FILE1_UNCOMPRESSED_PATH = "tests/fixtures/Test-Score/Test-Score.mscx"
+FILE2_UNCOMPRESSED_PATH = "tests/fixtures/Test-Score-2/Test-Score-2.mscx"
+
+
+def test_nested_stages():
+    seen = []
+    profiler = Profiler(memory=True, callback=seen.append)
+    with profiler.stage("outer", file="a") as outer:
+        big = [0] * 100_000
+        del big
+        with profiler.stage("inner"):
+            pass
+        outer["items"] = 3
+
+    inner, outer = profiler.records
+    assert seen == profiler.records
+    assert (inner["stage"], inner["depth"]) == ("inner", 1)
+    assert (outer["stage"], outer["depth"], outer["file"], outer["items"]) == ("outer", 0, "a", 3)
+    # the nested stage reset the tracemalloc peak, the outer one must still see its own allocation
+    assert outer["peak_alloc_bytes"] >= 100_000 * 8
+    assert outer["wall_seconds"] >= inner["wall_seconds"]
+    assert profiler.summary()["inner"]["count"] == 1
+
+
+def test_compare_records_every_stage(tmp_path):
+    profiler = Profiler()
+    compare_musescore_files(FILE1_UNCOMPRESSED_PATH, FILE2_UNCOMPRESSED_PATH, str(tmp_path / "diff.mscx"),
+                            profiler=profiler)
+
+    stages = [record["stage"] for record in profiler.records]
+    assert stages.count("load") == 2
+    assert stages.count("hash") == 2
+    for name in ("diff", "merge", "mark", "write"):
+        assert stages.count(name) == 1
+
+    diff = next(record for record in profiler.records if record["stage"] == "diff")
+    staves = [record for record in profiler.records if record["stage"] == "diff_staff"]
+    assert len(staves) == diff["changed_staves"]
+    assert sum(record["lcs_cells"] for record in staves) == diff["lcs_cells"]
+
+
+def test_mscz_members_loaded_once(tmp_path):
+    profiler = Profiler()
+    compare_mscz_files(FILE1_MSCZ_PATH, FILE2_MSCZ_PATH, str(tmp_path / "diff.mscz"), profiler=profiler)
+
+    loads = [record["file"] for record in profiler.records if record["stage"] == "load"]
+    marks = [record for record in profiler.records if record["stage"] == "mark"]
+    assert len(loads) == 2 * len(marks)
+
+
+def test_cli_profile(tmp_path):
+    trace_path = tmp_path / "trace.json"
+    display_diff.main([
+        FILE1_MSCZ_PATH, FILE2_MSCZ_PATH, str(tmp_path / "diff.mscz"),
+        "--no-cache", "--quiet", "--profile", str(trace_path),
+    ])
+
+    trace = json.loads(trace_path.read_text())
+    assert {"load", "hash", "diff", "merge", "mark", "write"} <= set(trace["summary"])
+    assert all("peak_alloc_bytes" in record for record in trace["stages"])
@@ -0,0 +1,41 @@
+from musescore_score_diff.compute_diff import compute_diff
+from musescore_score_diff.display_diff import new_merge_musescore_files
+from musescore_score_diff.score import LoadedScore, load_score
+from musescore_score_diff.xmlbackend import ET, LXML
+
+TEST_SCORE1_PATH = "tests/fixtures/single-staff/test-score/test-score.mscx"
+TEST_SCORE2_PATH = "tests/fixtures/single-staff/test-score2/test-score2.mscx"
+
+
+def test_loaded_score_is_parsed_once(monkeypatch):
+    score1, score2 = load_score(TEST_SCORE1_PATH), load_score(TEST_SCORE2_PATH)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file parsed again")
+
+    monkeypatch.setattr(ET, "parse", fail)
+    assert load_score(score1) is score1
+    assert compute_diff(score1, score2) == compute_diff(score1, score2)
+    new_merge_musescore_files(score1, score2)
+
+
+def test_loaded_score_matches_paths():
+    expected = compute_diff(TEST_SCORE1_PATH, TEST_SCORE2_PATH)
+    assert compute_diff(LoadedScore.from_file(TEST_SCORE1_PATH), TEST_SCORE2_PATH) == expected
+
+
+def test_shallow_copy_leaves_original_score():
+    score = load_score(TEST_SCORE1_PATH)
+    children = list(score.score)
+    tree, diff_score = score.shallow_copy()
+
+    for staff in diff_score.findall("Staff"):
+        diff_score.remove(staff)
+
+    if LXML:
+        # an lxml element has one parent: the children were moved to the copy
+        assert list(diff_score) == [child for child in children if child.tag != "Staff"]
+    else:
+        assert list(score.score) == children
+    assert tree.getroot().find("Score") is diff_score
+    assert diff_score.find("Part") is score.parts[0]
@@ -0,0 +1,87 @@
+import asyncio
+import filecmp
+import io
+import json
+import threading
+
+import pytest
+
+from musescore_score_diff import service
+from musescore_score_diff.service import DiffService, compare_async, serve_stdio
+
+TEST_SCORE1_PATH = "tests/fixtures/single-staff/test-score/test-score.mscx"
+TEST_SCORE2_PATH = "tests/fixtures/single-staff/test-score2/test-score2.mscx"
+
+
+def test_compare_async(tmp_path):
+    output = str(tmp_path / "diff.mscx")
+    assert asyncio.run(compare_async(TEST_SCORE1_PATH, TEST_SCORE2_PATH, output)) == output
+    assert (tmp_path / "diff.mscx").stat().st_size > 0
+
+
+def test_identical_requests_in_flight_share_a_job(tmp_path, monkeypatch):
+    release = threading.Event()
+
+    def blocked_job(file1, file2, output, cache):
+        release.wait(5)
+        with open(output, "w") as f:
+            f.write(file1)
+        return output
+
+    monkeypatch.setattr(service, "_compare_job", blocked_job)
+    outputs = [str(tmp_path / "a.mscx"), str(tmp_path / "b.mscx")]
+
+    async def run():
+        diff_service = DiffService()
+        requests = [asyncio.ensure_future(diff_service.compare(TEST_SCORE1_PATH, TEST_SCORE2_PATH, output))
+                    for output in outputs]
+        while diff_service.jobs + diff_service.deduplicated < 2:
+            await asyncio.sleep(0.01)
+        release.set()
+        return diff_service, await asyncio.gather(*requests)
+
+    diff_service, results = asyncio.run(run())
+    assert results == outputs
+    assert diff_service.jobs == 1 and diff_service.deduplicated == 1
+    assert filecmp.cmp(*outputs, shallow=False)
+
+
+def test_timeout_and_concurrency_limit(tmp_path, monkeypatch):
+    release = threading.Event()
+    running = []
+
+    def slow_job(file1, file2, output, cache):
+        running.append(file1)
+        release.wait(5)
+        return output
+
+    monkeypatch.setattr(service, "_compare_job", slow_job)
+    # different contents, so no deduplication
+    (tmp_path / "x.mscx").write_text("x")
+
+    async def run():
+        diff_service = DiffService(max_concurrency=1)
+        with pytest.raises(TimeoutError):
+            await diff_service.compare(TEST_SCORE1_PATH, TEST_SCORE2_PATH, "out1", timeout=0.05)
+        second = asyncio.ensure_future(diff_service.compare(str(tmp_path / "x.mscx"), TEST_SCORE2_PATH, "out2"))
+        await asyncio.sleep(0.1)
+        # the first job still holds the only slot
+        assert len(running) == 1
+        release.set()
+        return await second
+
+    assert asyncio.run(run()) == "out2"
+    assert len(running) == 2
+
+
+def test_serve_stdio(tmp_path):
+    requests = [
+        {"id": 1, "old": TEST_SCORE1_PATH, "new": TEST_SCORE2_PATH, "output": str(tmp_path / "diff.mscx")},
+        {"id": 2, "old": TEST_SCORE1_PATH, "new": "missing.mscx"},
+    ]
+    stdin = io.StringIO("".join(json.dumps(request) + "\n" for request in requests))
+    stdout = io.StringIO()
+    asyncio.run(serve_stdio(DiffService(), stdin, stdout))
+    responses = {response["id"]: response for response in map(json.loads, stdout.getvalue().splitlines())}
+    assert responses[1] == {"id": 1, "output": str(tmp_path / "diff.mscx")}
+    assert "error" in responses[2]
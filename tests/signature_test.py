@@ -0,0 +1,86 @@
+import json
+import shutil
+
+from musescore_score_diff import display_diff
+from musescore_score_diff.compute_diff import compute_diff
+from musescore_score_diff.signature import Signature
+from musescore_score_diff.summary import identical_summary, summarize_diff
+from musescore_score_diff.xmlbackend import ET
+
+import pytest
+
+FILE1_MSCZ_PATH = "tests/fixtures/Test-Score.mscz"
+FILE2_MSCZ_PATH = "tests/fixtures/Test-Score-2.mscz"
+
+TEST_SCORE1_PATH = "tests/fixtures/single-staff/test-score/test-score.mscx"
+TEST_SCORE2_PATH = "tests/fixtures/single-staff/test-score2/test-score2.mscx"
+
+
+def test_compute_diff_against_signature(tmp_path):
+    signature_path = str(tmp_path / "old.json")
+    Signature.from_score(TEST_SCORE1_PATH).save(signature_path)
+
+    signature = Signature.load(signature_path)
+    assert compute_diff(signature, TEST_SCORE2_PATH) == compute_diff(TEST_SCORE1_PATH, TEST_SCORE2_PATH)
+
+
+def _with_signature_staves(summary, signature):
+    # members identical to the signature's are not parsed from the files, the signature has their staves
+    for name, member in summary.get("members", {}).items():
+        if member["identical"]:
+            summary["members"][name] = identical_summary(signature.members[name])
+    return summary
+
+
+@pytest.mark.parametrize("old, new", [(TEST_SCORE1_PATH, TEST_SCORE2_PATH), (FILE1_MSCZ_PATH, FILE2_MSCZ_PATH)])
+def test_summary_against_signature(tmp_path, old, new):
+    signature_path = str(tmp_path / "old.json")
+    Signature.from_score(old).save(signature_path)
+
+    signature = Signature.load(signature_path)
+    assert summarize_diff(signature, new) == _with_signature_staves(summarize_diff(old, new), signature)
+
+
+def test_identical_revision_is_not_parsed(tmp_path, monkeypatch):
+    signature_path = str(tmp_path / "old.json")
+    Signature.from_score(TEST_SCORE1_PATH).save(signature_path)
+    copy_path = str(tmp_path / "copy.mscx")
+    shutil.copy(TEST_SCORE1_PATH, copy_path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file parsed")
+
+    signature = Signature.load(signature_path)
+    monkeypatch.setattr(ET, "parse", fail)
+    monkeypatch.setattr(ET, "iterparse", fail)
+    summary = summarize_diff(signature, copy_path)
+    assert summary["identical"]
+    # the signature has the measures, all reported unchanged
+    assert summary["staves"] == {
+        staff: {num: "unchanged" for num in range(1, len(hashes) + 1)}
+        for staff, hashes in enumerate(signature.single().hashes, start=1)
+    }
+
+
+def test_signature_version_is_checked(tmp_path):
+    signature_path = tmp_path / "old.json"
+    Signature.from_score(TEST_SCORE1_PATH).save(str(signature_path))
+    data = json.loads(signature_path.read_text())
+    data["hash_version"] = 0
+    signature_path.write_text(json.dumps(data))
+
+    with pytest.raises(ValueError):
+        Signature.load(str(signature_path))
+
+
+def test_cli_signature(tmp_path, capsys):
+    score_path = str(tmp_path / "old.mscz")
+    shutil.copy(FILE1_MSCZ_PATH, score_path)
+    display_diff.main(["signature", score_path, "--no-cache"])
+
+    signature_path = str(tmp_path / "old.json")
+    assert "Test-Score.mscx" in Signature.load(signature_path).members
+    display_diff.main([signature_path, FILE2_MSCZ_PATH, "--json", "--no-cache"])
+    expected = _with_signature_staves(summarize_diff(FILE1_MSCZ_PATH, FILE2_MSCZ_PATH), Signature.load(signature_path))
+    expected = json.loads(json.dumps(expected))
+    assert json.loads(capsys.readouterr().out) == expected
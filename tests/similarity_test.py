@@ -0,0 +1,107 @@
+from musescore_score_diff.cache import MeasureHashCache
+from musescore_score_diff.compute_diff import compute_diff, count_states
+from musescore_score_diff.display_diff import build_diff_score
+from musescore_score_diff.score import LoadedScore
+from musescore_score_diff.signature import Signature
+from musescore_score_diff.summary import summarize_diff
+from musescore_score_diff.similarity import find_similar_pairs, measure_features
+from musescore_score_diff.utils import State
+from musescore_score_diff.xmlbackend import ET
+
+
+def _measure(*pitches: int) -> str:
+    chords = "".join(f"<Chord><durationType>quarter</durationType><Note><pitch>{p}</pitch></Note></Chord>"
+                     for p in pitches)
+    return f"<Measure><voice>{chords}</voice></Measure>"
+
+
+def _score_bytes(*measures: str) -> bytes:
+    return (f"<museScore><Score><Part id='1'><Staff id='1'/><trackName>Flute</trackName></Part>"
+            f"<Staff id='1'>{''.join(measures)}</Staff></Score></museScore>").encode()
+
+
+def _score(*measures: str) -> LoadedScore:
+    return LoadedScore.from_bytes(_score_bytes(*measures))
+
+
+def test_features_ignore_ids_and_spanners():
+    plain = ET.fromstring(_measure(60, 62))
+    marked = ET.fromstring(_measure(60, 62))
+    marked.find("voice").insert(0, ET.fromstring("<Spanner type='Slur'><next/></Spanner>"))
+    ET.SubElement(marked.find("voice/Chord"), "eid").text = "x"
+    assert measure_features(plain) == measure_features(marked)
+    assert measure_features(plain) != measure_features(ET.fromstring(_measure(60, 63)))
+
+
+def test_pairs_are_similar_and_do_not_cross():
+    a = measure_features(ET.fromstring(_measure(60, 62, 64, 65)))
+    a2 = measure_features(ET.fromstring(_measure(60, 62, 64, 66)))
+    b = measure_features(ET.fromstring(_measure(40, 41, 42, 43)))
+    b2 = measure_features(ET.fromstring(_measure(40, 41, 42, 44)))
+    other = measure_features(ET.fromstring(_measure(70, 75, 80, 85)))
+    assert find_similar_pairs({3: a, 4: b}, {5: a2, 6: b2, 7: other}) == [(3, 5), (4, 6)]
+    # b2 before a2: only one of the two pairs keeps the staff order
+    assert len(find_similar_pairs({3: a, 4: b}, {5: b2, 6: a2})) == 1
+    assert find_similar_pairs({3: a}, {5: other}) == []
+
+
+def test_edit_after_an_insertion_is_modified():
+    a, b, c = _measure(60, 62, 64, 65), _measure(67, 69, 71, 72), _measure(55, 57, 59, 60)
+    old = [a, b, c]
+    # two measures inserted in front shift the numbers, the last measure edited
+    new = [_measure(30, 31, 32, 33), _measure(40, 42, 44, 46), a, b, _measure(55, 57, 59, 61)]
+
+    unpaired = compute_diff(_score(*old), _score(*new), pair_similar=False)[1]
+    assert unpaired[3] == State.REMOVED and unpaired[5] == State.INSERTED
+    diff = compute_diff(_score(*old), _score(*new))
+    # one step for the pair, keyed by its old number
+    assert diff[1][3] == State.MODIFIED and 5 not in diff[1]
+    assert diff[1][1] == diff[1][2] == State.INSERTED
+    assert count_states(diff)["modified"] == 1
+
+
+def test_diff_score_with_insertions_before_edited_measures():
+    old = [_measure(40 + k, 50 + k, 60 + k, 70 + k) for k in range(12)]
+    new = list(old)
+    # one note edited in old measures 8 and 11, then two measures inserted at 3 and 5
+    new[7], new[10] = _measure(47, 57, 67, 90), _measure(50, 60, 70, 91)
+    new.insert(2, _measure(30, 31, 32, 33))
+    new.insert(4, _measure(34, 35, 36, 37))
+
+    tree, diffs = build_diff_score(_score(*old), _score(*new), element_diff=False)
+    counts = count_states(diffs)
+    assert counts["modified"] == 2 and counts["inserted"] == 2 and counts["removed"] == 0
+
+    def highlighted(staff):
+        return [k for k, measure in enumerate(staff.findall("Measure"), start=1)
+                if measure.find("voice/Spanner/next") is not None]
+
+    staff1, staff2 = tree.getroot().find("Score").findall("Staff")
+    assert len(staff1.findall("Measure")) == len(staff2.findall("Measure")) == 14
+    # old 8 and 11 side by side with new 10 and 13
+    assert highlighted(staff1) == [10, 13]
+    assert highlighted(staff2) == [3, 5, 10, 13]
+
+
+def test_pairing_does_not_depend_on_the_input(tmp_path):
+    a, b, c = _measure(60, 62, 64, 65), _measure(67, 69, 71, 72), _measure(55, 57, 59, 60)
+    old_path, new_path = str(tmp_path / "old.mscx"), str(tmp_path / "new.mscx")
+    with open(old_path, "wb") as f:
+        f.write(_score_bytes(a, b, c))
+    with open(new_path, "wb") as f:
+        f.write(_score_bytes(_measure(30, 31, 32, 33), a, b, _measure(55, 57, 59, 61)))
+
+    expected = compute_diff(LoadedScore.from_file(old_path), LoadedScore.from_file(new_path))
+    assert expected[1][3] == State.MODIFIED
+    assert compute_diff(old_path, new_path) == expected
+    assert compute_diff(old_path, new_path, streaming=True) == expected
+    cache = MeasureHashCache(str(tmp_path / "cache"))
+    for _ in range(2):  # a miss, then a hit
+        assert compute_diff(old_path, new_path, cache=cache) == expected
+    signature_path = str(tmp_path / "old.sig.json")
+    Signature.from_score(old_path).save(signature_path)
+    assert compute_diff(Signature.load(signature_path), new_path) == expected
+
+    summary = summarize_diff(old_path, new_path)
+    assert summary["counts"] == count_states(expected)
+    assert summarize_diff(old_path, new_path, cache=cache) == summary
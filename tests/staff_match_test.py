@@ -0,0 +1,144 @@
+import copy
+
+from musescore_score_diff.compute_diff import compute_diff, compute_staff_diff
+from musescore_score_diff.display_diff import build_diff_score
+from musescore_score_diff.score import LoadedScore, ScoreHashes
+from musescore_score_diff.staff_match import match_staves
+from musescore_score_diff.utils import State
+from musescore_score_diff.xmlbackend import ET
+
+TEST_SCORE1_PATH = "tests/fixtures/single-staff/test-score/test-score.mscx"
+TEST_SCORE2_PATH = "tests/fixtures/single-staff/test-score2/test-score2.mscx"
+FILE1_UNCOMPRESSED_PATH = "tests/fixtures/Test-Score/Test-Score.mscx"
+
+
+def test_match_by_instrument_identity():
+    hashes = [["a", "b"], ["c", "d"], ["e"]]
+    match = match_staves(hashes, [hashes[2], hashes[0], hashes[1]], ["x", "y", "z"], ["z", "x", "y"])
+    assert match.pairs == [(1, 2), (2, 3), (3, 1)]
+    assert not match.added and not match.removed and not match.positional
+
+
+def test_match_by_similarity_then_added_and_removed():
+    hashes1 = [["a", "b", "c", "d"], ["e", "f"], ["g", "h"]]
+    # staff 1 renamed and edited, staff 2 removed, staff 3 kept, a new staff added
+    hashes2 = [["a", "b", "c", "x"], ["g", "h"], ["y", "z"]]
+    match = match_staves(hashes1, hashes2, ["old-name", "b", "c"], ["new-name", "c", "new"])
+    assert match.pairs == [(1, 1), (3, 2)]
+    assert match.removed == [2]
+    assert match.added == [3]
+
+
+def test_no_keys_match_by_position():
+    match = match_staves([["a"], ["b"]], [["b"], ["a"], ["c"]])
+    assert match.pairs == [(1, 1), (2, 2)]
+    assert match.added == [3]
+
+
+def test_streamed_staff_keys_match_parsed():
+    for path in [TEST_SCORE1_PATH, FILE1_UNCOMPRESSED_PATH]:
+        keys = LoadedScore.from_file(path).staff_keys
+        assert ScoreHashes.from_file(path).staff_keys == keys
+        assert None not in keys
+    # the piano's two staves share a part
+    assert LoadedScore.from_file(FILE1_UNCOMPRESSED_PATH).staff_keys[2:4] == ["piano|Piano|0", "piano|Piano|1"]
+
+
+def _with_added_instrument(path: str) -> LoadedScore:
+    """The score with a copy of its first instrument (renamed, different measures) appended."""
+    loaded = LoadedScore.from_file(path)
+    part, staff = copy.deepcopy(loaded.parts[0]), copy.deepcopy(loaded.staves[0])
+    part.find("trackName").text = "Added Instrument"
+    part.find("Instrument").set("id", "added")
+    new_id = str(len(loaded.staves) + 1)
+    part.find("Staff").set("id", new_id)
+    staff.set("id", new_id)
+    for measure in staff.findall("Measure"):
+        ET.SubElement(measure, "added")
+    score = loaded.score
+    score.insert(list(score).index(loaded.parts[-1]) + 1, part)
+    score.insert(list(score).index(loaded.staves[-1]) + 1, staff)
+    return LoadedScore(loaded.tree)
+
+
+def test_added_instrument_is_reported():
+    expected = compute_diff(TEST_SCORE1_PATH, TEST_SCORE2_PATH)
+
+    match, diffs = compute_staff_diff(TEST_SCORE1_PATH, _with_added_instrument(TEST_SCORE2_PATH))
+    assert match.added == [2] and not match.removed
+    assert diffs == expected
+
+    match, diffs = compute_staff_diff(_with_added_instrument(TEST_SCORE1_PATH), TEST_SCORE2_PATH)
+    assert match.removed == [2] and not match.added
+    assert set(diffs[2].values()) == {State.REMOVED}
+
+
+def _highlights(staff: ET.Element) -> list[str]:
+    return [color.get("r") + "," + color.get("g") + "," + color.get("b") for color in staff.findall(".//Spanner//color")]
+
+
+def test_diff_score_shows_added_and_removed_staves():
+    tree, _ = build_diff_score(TEST_SCORE1_PATH, _with_added_instrument(TEST_SCORE2_PATH))
+    score = tree.getroot().find("Score")
+    staves = score.findall("Staff")
+    assert len(staves) == len(score.findall("Part")) == 3
+    # the added staff comes after the pair, green from end to end
+    assert set(_highlights(staves[2])) == {"0,200,0"}
+    assert score.findall("Part")[2].findtext("trackName") == "Added Instrument"
+
+    tree, diffs = build_diff_score(_with_added_instrument(TEST_SCORE1_PATH), TEST_SCORE2_PATH)
+    staves = tree.getroot().find("Score").findall("Staff")
+    assert len(staves) == 3 and set(diffs[2].values()) == {State.REMOVED}
+    assert set(_highlights(staves[2])) == {"200,0,0"}
+
+
+def test_diff_score_pairs_renamed_instruments():
+    renamed = LoadedScore.from_file(FILE1_UNCOMPRESSED_PATH)
+    renamed.parts[0].find("trackName").text = "Renamed Flute"
+    # still paired by its measures
+    match, _ = compute_staff_diff(FILE1_UNCOMPRESSED_PATH, renamed)
+    assert (1, 1) in match.pairs and not match.added and not match.removed
+    tree, _ = build_diff_score(FILE1_UNCOMPRESSED_PATH, renamed)
+    names = [part.findtext("trackName") for part in tree.getroot().find("Score").findall("Part")]
+    assert names[:2] == [names[0], "Renamed Flute"]
+
+
+def _horn_measure(pitch: int) -> str:
+    return f"<Measure><voice><Chord><durationType>whole</durationType><Note><pitch>{pitch}</pitch></Note></Chord></voice></Measure>"
+
+
+def _horns(edited: int|None = None) -> LoadedScore:
+    parts = "".join(f"<Part id='{i}'><Staff id='{i}'/><trackName>Horn</trackName><Instrument id='horn'/></Part>"
+                    for i in (1, 2))
+    staves = "".join(
+        f"<Staff id='{i}'>" + "".join(_horn_measure(40 + 10 * i + k + (k == edited and i == 2)) for k in range(1, 5))
+        + "</Staff>" for i in (1, 2)
+    )
+    return LoadedScore.from_bytes(f"<museScore><Score>{parts}{staves}</Score></museScore>".encode())
+
+
+def test_diff_score_with_duplicate_part_names():
+    tree, diffs = build_diff_score(_horns(), _horns(edited=3))
+    assert diffs[2][3] == State.MODIFIED and set(diffs[1].values()) == {State.UNCHANGED}
+    horn1, horn1_new, horn2, horn2_new = tree.getroot().find("Score").findall("Staff")
+    # the edit is shown on the second horn's pair only
+    assert _highlights(horn1) == _highlights(horn1_new) == []
+    assert set(_highlights(horn2)) == {"200,0,0"} and set(_highlights(horn2_new)) == {"0,200,0"}
+    assert horn2_new.findall("Measure")[2].findtext(".//pitch") == "64"
+
+
+def test_diff_score_keeps_multi_staff_parts_whole():
+    edited = LoadedScore.from_file(FILE1_UNCOMPRESSED_PATH)
+    # the piano's lower staff, third measure
+    ET.SubElement(edited.staves[3].findall("Measure")[2].find("voice"), "StaffText").text = "edited"
+    tree, diffs = build_diff_score(FILE1_UNCOMPRESSED_PATH, edited)
+    assert diffs[4][3] == State.MODIFIED
+    score = tree.getroot().find("Score")
+    staves = score.findall("Staff")
+    assert len(staves) == 12
+    # each part's staves, in order: old piano (5, 6) then new piano (7, 8)
+    assert [[staff.get("id") for staff in part.findall("Staff")] for part in score.findall("Part")][4:6] == \
+        [["5", "6"], ["7", "8"]]
+    assert [staff.get("id") for staff in staves] == [str(n) for n in range(1, 13)]
+    assert _highlights(staves[4]) == _highlights(staves[6]) == []
+    assert set(_highlights(staves[5])) == {"200,0,0"} and set(_highlights(staves[7])) == {"0,200,0"}
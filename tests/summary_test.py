@@ -0,0 +1,82 @@
+import json
+import shutil
+
+from musescore_score_diff import display_diff
+from musescore_score_diff.compute_diff import compute_diff
+from musescore_score_diff.summary import summarize_diff
+from musescore_score_diff.utils import State
+
+FILE1_MSCZ_PATH = "tests/fixtures/Test-Score.mscz"
+FILE2_MSCZ_PATH = "tests/fixtures/Test-Score-2.mscz"
+
+TEST_SCORE1_PATH = "tests/fixtures/single-staff/test-score/test-score.mscx"
+TEST_SCORE2_PATH = "tests/fixtures/single-staff/test-score2/test-score2.mscx"
+
+
+def _no_diff_score(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("diff score built")
+
+    monkeypatch.setattr(display_diff, "new_merge_musescore_files", fail)
+    monkeypatch.setattr(display_diff, "mark_diffs", fail)
+
+
+def test_summary_matches_compute_diff(monkeypatch):
+    _no_diff_score(monkeypatch)
+    summary = summarize_diff(TEST_SCORE1_PATH, TEST_SCORE2_PATH)
+    diffs = compute_diff(TEST_SCORE1_PATH, TEST_SCORE2_PATH)
+
+    assert not summary["identical"]
+    assert summary["staves"] == {
+        staff: {num: state.name.lower() for num, state in staff_diff.items()}
+        for staff, staff_diff in diffs.items()
+    }
+    changed = [s for d in diffs.values() for s in d.values() if s != State.UNCHANGED]
+    assert summary["changed_measures"] == len(changed)
+    assert json.loads(json.dumps(summary))
+
+
+def test_summary_identical_files_are_not_parsed(tmp_path, monkeypatch):
+    from musescore_score_diff.xmlbackend import ET
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file parsed")
+
+    copy_path = str(tmp_path / "copy.mscx")
+    shutil.copy(TEST_SCORE1_PATH, copy_path)
+    monkeypatch.setattr(ET, "parse", fail)
+    monkeypatch.setattr(ET, "iterparse", fail)
+
+    summary = summarize_diff(TEST_SCORE1_PATH, copy_path)
+    assert summary["identical"]
+    assert summary["changed_measures"] == 0
+    # same shape as the summary of a diff
+    assert summary["counts"] == {state.name.lower(): 0 for state in State}
+    assert set(summary) == {"identical", "changed_measures", "counts", "staves", "staff_pairs", "added_staves",
+                            "removed_staves"}
+
+
+def test_summary_mscz(monkeypatch):
+    _no_diff_score(monkeypatch)
+    summary = summarize_diff(FILE1_MSCZ_PATH, FILE2_MSCZ_PATH)
+    assert "Test-Score.mscx" in summary["members"]
+    assert summary["changed_measures"] == sum(m["changed_measures"] for m in summary["members"].values())
+
+    assert summarize_diff(FILE1_MSCZ_PATH, FILE1_MSCZ_PATH)["identical"]
+
+
+def test_matching_hash_sequences_skip_the_engine(monkeypatch):
+    from musescore_score_diff.diff_engine import MyersEngine
+
+    def fail(*args, **kwargs):
+        raise AssertionError("engine used")
+
+    expected = compute_diff(TEST_SCORE1_PATH, TEST_SCORE1_PATH, engine="lcs")
+    monkeypatch.setattr(MyersEngine, "diff", fail)
+    assert compute_diff(TEST_SCORE1_PATH, TEST_SCORE1_PATH) == expected
+
+
+def test_cli_json(capsys):
+    display_diff.main([TEST_SCORE1_PATH, TEST_SCORE2_PATH, "--json", "--no-cache"])
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["changed_measures"] > 0